@@ -1,128 +1,280 @@
 import os
+import json
 import logging
-from openai import OpenAI
-from models import Category
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from models import db, Category
+from category_index import get_category_index
+from classification_cache import ClassificationCache
+from circuit_breaker import CircuitBreaker
+from local_model import predict_category, LOCAL_MODEL_CONFIDENCE
 import re
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-client = None
+OPENAI_LATENCY_BUDGET = float(os.getenv('OPENAI_LATENCY_BUDGET', '5'))
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', '30'))
+OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', '0'))
+OPENAI_HEDGED = os.getenv('OPENAI_HEDGED', 'False').lower() == 'true'
+
+_client = None
+_client_lock = threading.Lock()
 openai_api_key = os.getenv('OPENAI_API_KEY')
+OPENAI_ENABLED = bool(openai_api_key)
 
-if openai_api_key:
-    client = OpenAI(api_key=openai_api_key)
-    logger.info("✓ OpenAI client initialized successfully with API key")
+if OPENAI_ENABLED:
+    logger.info("✓ OpenAI API key found - client will be created on first use")
 else:
     logger.warning("✗ No OPENAI_API_KEY found - will use keyword/TF-IDF fallback only")
 
+def get_openai_client():
+    """Create the OpenAI client on first use; importing the SDK costs a noticeable part of startup"""
+    global _client
+    if _client is None and OPENAI_ENABLED:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+                _client = OpenAI(api_key=openai_api_key, timeout=OPENAI_TIMEOUT, max_retries=OPENAI_MAX_RETRIES)
+                logger.info("✓ OpenAI client initialized successfully with API key")
+    return _client
+
+classification_cache = ClassificationCache()
+
+METHOD_OPENAI = 'AI (OpenAI)'
+METHOD_LOCAL_MODEL = 'Local model'
+METHOD_KEYWORDS = 'Keyword matching'
+
+OPENAI_BATCH_SIZE = int(os.getenv('OPENAI_BATCH_SIZE', '20'))
+
+openai_breaker = CircuitBreaker(
+    'openai',
+    failure_threshold=int(os.getenv('OPENAI_BREAKER_THRESHOLD', '5')),
+    cooldown=float(os.getenv('OPENAI_BREAKER_COOLDOWN', '60'))
+)
+_hedge_executor = ThreadPoolExecutor(max_workers=int(os.getenv('OPENAI_HEDGE_WORKERS', '4')), thread_name_prefix='openai-hedge')
+_counters = Counter()
+_counters_lock = threading.Lock()
+
+def _count(name, amount=1):
+    with _counters_lock:
+        _counters[name] += amount
+
+def get_openai_stats():
+    with _counters_lock:
+        counters = dict(_counters)
+    classified = counters.get('classifications', 0)
+    return {
+        'enabled': OPENAI_ENABLED,
+        'hedged': OPENAI_HEDGED,
+        'latency_budget_seconds': OPENAI_LATENCY_BUDGET,
+        'breaker': openai_breaker.stats(),
+        'counters': counters,
+        'fallback_rate': round(counters.get('fallbacks', 0) / classified, 4) if classified else 0.0,
+    }
+
+def _category_prompt(categories):
+    return "\n".join([
+        f"- {cat.name}: {cat.description} (Keywords: {cat.keywords})"
+        for cat in categories
+    ])
+
+def _match_category_name(answer, categories):
+    for cat in categories:
+        if cat.name.lower() in answer.lower():
+            return cat
+    return None
+
+def _request_openai_category(description, category_info, timeout=None):
+    """Ask GPT-4o-mini for a category name; raises on any API error or timeout"""
+    response = get_openai_client().chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {
+                "role": "system",
+                "content": "You are a ticket classification assistant. Based on the ticket description, classify it into one of the available categories. Respond with ONLY the category name, nothing else."
+            },
+            {
+                "role": "user",
+                "content": f"Available categories:\n{category_info}\n\nTicket description: {description}\n\nWhich category does this ticket belong to?"
+            }
+        ],
+        temperature=0.3,
+        max_tokens=50,
+        timeout=timeout if timeout is not None else OPENAI_LATENCY_BUDGET
+    )
+    return response.choices[0].message.content.strip()
+
+def _record_openai_outcome(future):
+    if future.cancelled() or future.exception() is not None:
+        openai_breaker.record_failure()
+        _count('openai_failures')
+    else:
+        openai_breaker.record_success()
+
 def classify_ticket_with_openai(description):
-    if not client:
+    if not OPENAI_ENABLED:
         logger.warning("OpenAI client not initialized - skipping AI classification")
         return None
     
-    categories = Category.query.all()
+    # Categories first: in half-open state allow() claims the single trial call, which must then record an outcome
+    categories = Category.query.order_by(Category.id).all()
     if not categories:
         logger.warning("No categories found in database")
         return None
     
-    category_info = "\n".join([
-        f"- {cat.name}: {cat.description} (Keywords: {cat.keywords})"
-        for cat in categories
-    ])
+    if not openai_breaker.allow():
+        logger.warning("OpenAI circuit breaker is open - skipping AI classification")
+        _count('breaker_skips')
+        return None
+    
+    category_info = _category_prompt(categories)
     
     try:
         logger.info(f"🤖 CALLING OpenAI GPT-4o-mini for ticket classification...")
         logger.info(f"   Ticket description: '{description[:100]}...'")
         
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a ticket classification assistant. Based on the ticket description, classify it into one of the available categories. Respond with ONLY the category name, nothing else."
-                },
-                {
-                    "role": "user",
-                    "content": f"Available categories:\n{category_info}\n\nTicket description: {description}\n\nWhich category does this ticket belong to?"
-                }
-            ],
-            temperature=0.3,
-            max_tokens=50
-        )
-        
-        classified_category = response.choices[0].message.content.strip()
+        classified_category = _request_openai_category(description, category_info)
+        openai_breaker.record_success()
         logger.info(f"✅ OpenAI response: '{classified_category}'")
         
-        for cat in categories:
-            if cat.name.lower() in classified_category.lower():
-                logger.info(f"✅ AI CLASSIFIED as: {cat.name} (using OpenAI GPT-4o-mini)")
-                return cat
+        cat = _match_category_name(classified_category, categories)
+        if cat:
+            logger.info(f"✅ AI CLASSIFIED as: {cat.name} (using OpenAI GPT-4o-mini)")
+            return cat
         
         logger.warning(f"OpenAI returned '{classified_category}' but no matching category found")
         return categories[0] if categories else None
     
     except Exception as e:
+        openai_breaker.record_failure()
+        _count('openai_failures')
         logger.error(f"❌ OpenAI classification error: {e}")
         logger.info("Will fallback to keyword-based classification")
         return None
 
-def classify_ticket_with_keywords(description):
-    categories = Category.query.all()
+def classify_ticket_hedged(description):
+    """Race OpenAI against the local classifier; use the local result if OpenAI misses the budget"""
+    if not OPENAI_ENABLED:
+        return classify_ticket_with_keywords(description), METHOD_KEYWORDS
+    
+    categories = Category.query.order_by(Category.id).all()
     if not categories:
+        return None, METHOD_KEYWORDS
+    
+    if not openai_breaker.allow():
+        _count('breaker_skips')
+        return classify_ticket_with_keywords(description), METHOD_KEYWORDS
+    
+    future = _hedge_executor.submit(_request_openai_category, description, _category_prompt(categories))
+    future.add_done_callback(_record_openai_outcome)
+    local_result = classify_ticket_with_keywords(description)
+    
+    try:
+        answer = future.result(timeout=OPENAI_LATENCY_BUDGET)
+    except FutureTimeoutError:
+        logger.warning(f"OpenAI missed the {OPENAI_LATENCY_BUDGET}s latency budget - using local classification")
+        _count('hedge_deadline_misses')
+        return local_result, METHOD_KEYWORDS
+    except Exception as e:
+        logger.error(f"❌ OpenAI classification error: {e}")
+        return local_result, METHOD_KEYWORDS
+    
+    cat = _match_category_name(answer, categories)
+    if cat:
+        return cat, METHOD_OPENAI
+    return local_result, METHOD_KEYWORDS
+
+def classify_ticket_with_keywords(description):
+    index = get_category_index()
+    if not len(index):
         return None
     
-    description_lower = description.lower()
-    best_match = None
-    max_matches = 0
-    
-    for category in categories:
-        if category.keywords:
-            keywords = [kw.strip().lower() for kw in category.keywords.split(',')]
-            matches = sum(1 for keyword in keywords if keyword in description_lower)
-            
-            if matches > max_matches:
-                max_matches = matches
-                best_match = category
-    
-    if best_match and max_matches > 0:
-        return best_match
-    
-    if categories:
-        category_texts = []
-        for cat in categories:
-            text = f"{cat.name} {cat.description} {cat.keywords or ''}"
-            category_texts.append(text)
-        
-        try:
-            vectorizer = TfidfVectorizer(stop_words='english')
-            all_texts = category_texts + [description]
-            tfidf_matrix = vectorizer.fit_transform(all_texts)
-            
-            similarities = cosine_similarity(tfidf_matrix[-1], tfidf_matrix[:-1])[0]
-            best_idx = similarities.argmax()
-            
-            if similarities[best_idx] > 0.1:
-                return categories[best_idx]
-        except:
-            pass
-    
-    return categories[0] if categories else None
+    category_id = index.keyword_match(description)
+    if category_id is None:
+        category_id = index.best_match(description)
+    if category_id is None:
+        category_id = index.default_category_id()
+    
+    return db.session.get(Category, category_id)
+
+def classify_ticket_with_local_model(description):
+    """Category from the locally trained model, or None when it is missing or not confident"""
+    predictions = predict_category([description])
+    if not predictions:
+        return None
+    category_id, confidence = predictions[0]
+    if category_id is None or confidence < LOCAL_MODEL_CONFIDENCE:
+        if category_id is not None:
+            logger.info(f"Local model confidence {confidence:.2f} below {LOCAL_MODEL_CONFIDENCE} - escalating")
+        return None
+    return db.session.get(Category, category_id)
 
 def classify_ticket(description):
+    """Classify a description; returns (category, classification method)"""
+    fingerprint = get_category_index().fingerprint
+    cached = classification_cache.get(description, fingerprint)
+    if cached:
+        category_id, method = cached
+        category = db.session.get(Category, category_id)
+        if category:
+            logger.info(f"♻️  USING CACHED CLASSIFICATION: {category.name}")
+            return category, method
+        classification_cache.discard(description)
+    
+    result, method = _classify_ticket_uncached(description)
+    # A keyword result caused by an OpenAI failure is not cached so the next ticket retries the AI
+    if result and (method != METHOD_KEYWORDS or not OPENAI_ENABLED):
+        classification_cache.put(description, fingerprint, result.id, method)
+    return result, method
+
+def warm_up_classifier():
+    """Pay the import and fitting costs up front instead of on the first ticket"""
+    get_openai_client()
+    get_category_index()
+    predict_category(['warm up'])
+
+def get_classification_cache_stats():
+    return classification_cache.stats()
+
+def _classify_ticket_uncached(description):
+    result, method = _classify_ticket_live(description)
+    _count('classifications')
+    if method == METHOD_OPENAI:
+        _count('ai_classified')
+    elif method == METHOD_LOCAL_MODEL:
+        _count('local_model_classified')
+    elif OPENAI_ENABLED:
+        _count('fallbacks')
+    return result, method
+
+def _classify_ticket_live(description):
     logger.info("="*60)
     logger.info("TICKET CLASSIFICATION STARTED")
     logger.info("="*60)
     
-    if client:
+    result = classify_ticket_with_local_model(description)
+    if result:
+        logger.info(f"🧠 USING LOCAL MODEL CLASSIFICATION: {result.name}")
+        logger.info("="*60)
+        return result, METHOD_LOCAL_MODEL
+    
+    if OPENAI_ENABLED and OPENAI_HEDGED:
+        logger.info("Racing OpenAI against local classification (hedged mode)...")
+        result, method = classify_ticket_hedged(description)
+        if result:
+            logger.info(f"{'✅ USING AI' if method == METHOD_OPENAI else '📝 USING KEYWORD'} CLASSIFICATION: {result.name}")
+        logger.info("="*60)
+        return result, method
+    
+    if OPENAI_ENABLED:
         logger.info("Attempting AI classification with OpenAI...")
         result = classify_ticket_with_openai(description)
         if result:
             logger.info(f"✅ USING AI CLASSIFICATION: {result.name}")
             logger.info("="*60)
-            return result, True
+            return result, METHOD_OPENAI
         else:
             logger.warning("OpenAI classification failed, falling back to keyword matching")
     else:
@@ -135,4 +287,121 @@ def classify_ticket(description):
     else:
         logger.warning("⚠️  No classification result")
     logger.info("="*60)
-    return result, False
+    return result, METHOD_KEYWORDS
+
+def classify_tickets_with_openai(descriptions, categories):
+    """Classify several descriptions per chat completion; returns a Category or None for each"""
+    results = [None] * len(descriptions)
+    if not OPENAI_ENABLED or not categories:
+        return results
+    
+    category_info = _category_prompt(categories)
+    for start in range(0, len(descriptions), OPENAI_BATCH_SIZE):
+        chunk = descriptions[start:start + OPENAI_BATCH_SIZE]
+        numbered = "\n".join(f"{i}. {desc}" for i, desc in enumerate(chunk, start=1))
+        if not openai_breaker.allow():
+            _count('breaker_skips')
+            continue
+        try:
+            logger.info(f"🤖 CALLING OpenAI GPT-4o-mini for a batch of {len(chunk)} tickets...")
+            response = get_openai_client().chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You are a ticket classification assistant. Classify each numbered ticket description into one of the available categories. Respond with ONLY a JSON array of category names, one per ticket, in the same order."
+                    },
+                    {
+                        "role": "user",
+                        "content": f"Available categories:\n{category_info}\n\nTicket descriptions:\n{numbered}\n\nWhich category does each ticket belong to?"
+                    }
+                ],
+                temperature=0.3,
+                max_tokens=20 * len(chunk) + 20,
+                timeout=OPENAI_TIMEOUT
+            )
+        except Exception as e:
+            openai_breaker.record_failure()
+            _count('openai_failures')
+            logger.error(f"❌ OpenAI batch classification error: {e}")
+            continue
+        openai_breaker.record_success()
+        
+        try:
+            content = response.choices[0].message.content.strip()
+            if content.startswith('```'):
+                content = content.strip('`').removeprefix('json').strip()
+            answers = json.loads(content)
+            if not isinstance(answers, list) or len(answers) != len(chunk):
+                raise ValueError(f"expected {len(chunk)} answers, got {answers!r}")
+        except ValueError as e:
+            logger.error(f"❌ Unusable OpenAI batch response: {e}")
+            continue
+        
+        for offset, answer in enumerate(answers):
+            results[start + offset] = _match_category_name(str(answer), categories)
+    return results
+
+def classify_tickets(descriptions, use_ai=True):
+    """Classify many descriptions at once, loading categories a single time.
+    
+    Returns a list of (category, classification method) tuples in input order.
+    """
+    index = get_category_index()
+    if not len(index):
+        return [(None, METHOD_KEYWORDS)] * len(descriptions)
+    
+    categories_by_id = {cat.id: cat for cat in Category.query.filter(Category.id.in_(index.category_ids)).all()}
+    categories = [categories_by_id[cid] for cid in index.category_ids if cid in categories_by_id]
+    results = [None] * len(descriptions)
+    
+    pending = []
+    for i, description in enumerate(descriptions):
+        cached = classification_cache.get(description, index.fingerprint)
+        if cached and cached[0] in categories_by_id:
+            results[i] = (categories_by_id[cached[0]], cached[1])
+        else:
+            pending.append(i)
+    
+    predictions = predict_category([descriptions[i] for i in pending]) if pending else None
+    if predictions:
+        unresolved = []
+        for i, (category_id, confidence) in zip(pending, predictions):
+            if category_id in categories_by_id and confidence >= LOCAL_MODEL_CONFIDENCE:
+                results[i] = (categories_by_id[category_id], METHOD_LOCAL_MODEL)
+                classification_cache.put(descriptions[i], index.fingerprint, category_id, METHOD_LOCAL_MODEL)
+            else:
+                unresolved.append(i)
+        pending = unresolved
+    
+    if use_ai and OPENAI_ENABLED and pending:
+        ai_results = classify_tickets_with_openai([descriptions[i] for i in pending], categories)
+        unresolved = []
+        for i, category in zip(pending, ai_results):
+            if category:
+                results[i] = (category, METHOD_OPENAI)
+                classification_cache.put(descriptions[i], index.fingerprint, category.id, METHOD_OPENAI)
+            else:
+                unresolved.append(i)
+        pending = unresolved
+    
+    tfidf_pending = []
+    for i in pending:
+        category_id = index.keyword_match(descriptions[i])
+        if category_id is None:
+            tfidf_pending.append(i)
+        else:
+            results[i] = (categories_by_id.get(category_id), METHOD_KEYWORDS)
+    
+    tfidf_ids = index.best_matches([descriptions[i] for i in tfidf_pending])
+    for i, category_id in zip(tfidf_pending, tfidf_ids):
+        if category_id is None:
+            category_id = index.default_category_id()
+        results[i] = (categories_by_id.get(category_id), METHOD_KEYWORDS)
+    
+    if not (use_ai and OPENAI_ENABLED):
+        for i in pending:
+            if results[i][0]:
+                classification_cache.put(descriptions[i], index.fingerprint, results[i][0].id, METHOD_KEYWORDS)
+    
+    return results
@@ -1,13 +1,30 @@
 import os
-from flask import Flask, render_template, redirect, url_for, flash, request, jsonify
+import csv
+import time
+import click
+import threading
+from flask import Flask, render_template, redirect, url_for, flash, request, jsonify, abort
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from itsdangerous import URLSafeTimedSerializer, SignatureExpired, BadSignature
 from datetime import datetime
-from models import db, User, Ticket, Category, TeamMember, Approval, TicketHistory
-from ai_classifier import classify_ticket
-from ticket_assignment import assign_ticket_to_team_member
+from sqlalchemy.orm import selectinload
+from models import db, User, Ticket, Category, TeamMember, TeamMemberWorkload, Approval, TicketHistory
+from ai_classifier import classify_ticket, classify_tickets, get_classification_cache_stats, get_openai_stats, warm_up_classifier, METHOD_LOCAL_MODEL
+from category_index import rebuild_category_index, CATEGORY_INDEX_PATH
+from local_model import train_local_model, learn_from_ticket, LOCAL_MODEL_PATH
+from similarity_index import find_similar_tickets, index_ticket, similar_ticket_clusters, OPEN_STATUSES, SIMILARITY_THRESHOLD
+from ticket_assignment import assign_ticket_to_team_member, track_workload_change, reconcile_workloads, ensure_workloads
 from email_service import send_approval_email, send_assignment_email, send_ticket_creation_email, send_approval_update_email, init_mail
+from task_queue import BackgroundTaskQueue
+from email_outbox import outbox_dispatcher, retry_dead_emails, OUTBOX_WORKERS
+from ticket_rebalancer import rebalance_tickets, RebalanceConflict, TEAM_MEMBER_CAPACITY
+from migrations import upgrade_database, migration_status
+from ticket_status import InvalidStatusTransition, TICKET_STATUS_CODES
+from approval_rules import get_approval_chain, create_approvals, set_category_approvers
+from ticket_archive import archive_closed_tickets, get_archived_ticket, ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE
+from ticket_search import search_tickets, search_backend, create_search_index
+from status_counts import dashboard_counts, adjust_status_counts, reconcile_status_counts, start_status_count_reconciler
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -31,15 +48,23 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
     'pool_pre_ping': True,
     'pool_recycle': 300,
-    'pool_size': 10,
-    'max_overflow': 20,
-    'connect_args': {
-        'connect_timeout': 10,
-    }
 }
+if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+    # sqlite3.connect() rejects connect_timeout, and in-memory SQLite pools reject pool sizing
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'].update({
+        'pool_size': 10,
+        'max_overflow': 20,
+        'connect_args': {
+            'connect_timeout': 10,
+        }
+    })
 
 db.init_app(app)
 
+ASYNC_CLASSIFICATION = os.getenv('ASYNC_CLASSIFICATION', 'False').lower() == 'true'
+classification_queue = BackgroundTaskQueue('classifier', workers=int(os.getenv('CLASSIFICATION_WORKERS', '2')))
+classification_queue.init_app(app)
+
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
@@ -54,16 +79,44 @@ def auto_initialize_database():
         try:
             db.create_all()
             
+            for version, name in upgrade_database():
+                print(f"Applied migration {version}: {name}")
+            
             if User.query.count() == 0:
                 print("Database is empty. Auto-seeding...")
                 from seed_data import seed_database
                 seed_database()
                 print("Database seeded successfully!")
+            
+            created = ensure_workloads()
+            if created:
+                print(f"Created workload counters for {created} team member(s)")
         except Exception as e:
             print(f"Auto-initialization error: {e}")
 
 auto_initialize_database()
 
+outbox_dispatcher.init_app(app)
+if OUTBOX_WORKERS > 0:
+    outbox_dispatcher.start()
+
+start_status_count_reconciler(app)
+
+def warm_up_classifier_in_background():
+    """Load OpenAI, scikit-learn and the fitted indexes without delaying worker boot"""
+    def run():
+        with app.app_context():
+            try:
+                started = time.perf_counter()
+                warm_up_classifier()
+                print(f"Classifier warmed up in {time.perf_counter() - started:.2f}s")
+            except Exception as e:
+                print(f"Classifier warm-up error: {e}")
+    threading.Thread(target=run, name='classifier-warmup', daemon=True).start()
+
+if os.getenv('CLASSIFIER_WARMUP', 'False').lower() == 'true':
+    warm_up_classifier_in_background()
+
 @app.route('/')
 def index():
     if current_user.is_authenticated:
@@ -169,6 +222,133 @@ def team_member_dashboard():
                          active_tickets=active_tickets,
                          completed_tickets=completed_tickets)
 
+def start_approval_chain(ticket, category, creator_name):
+    """Create the approval rows for the ticket's category and email the first approver"""
+    ticket_id = ticket.id
+    description = ticket.description
+    category_name = category.name if category else 'Uncategorized'
+    
+    chain = get_approval_chain(category.id)
+    approval_ids = create_approvals(ticket_id, chain)
+    
+    if approval_ids:
+        first_approver = chain[0].email
+        token = serializer.dumps({'approval_id': approval_ids[0], 'ticket_id': ticket_id}, salt='approval-token')
+        email_sent = send_approval_email(
+            ticket_id=ticket_id,
+            description=description,
+            category_name=category_name,
+            creator_name=creator_name,
+            approval_token=token,
+            approver_email=first_approver
+        )
+        if email_sent:
+            print(f"✓ Approval email queued for {first_approver} for ticket #{ticket_id}")
+        else:
+            print(f"✗ Failed to queue approval email to {first_approver} for ticket #{ticket_id}")
+    db.session.commit()
+
+def route_classified_ticket(ticket, category, creator):
+    """Start approvals and confirm creation once the ticket has a category"""
+    if category and get_approval_chain(category.id):
+        start_approval_chain(ticket, category, creator.name)
+    
+    creation_email_sent = send_ticket_creation_email(
+        ticket_id=ticket.id,
+        description=ticket.description,
+        category_name=category.name if category else 'Uncategorized',
+        creator_email=creator.email,
+        creator_name=creator.name
+    )
+    if creation_email_sent:
+        print(f"✓ Ticket creation email queued for {creator.email}")
+    else:
+        print(f"✗ Failed to queue ticket creation email to {creator.email}")
+    db.session.commit()
+
+def flag_possible_duplicates(ticket):
+    """Record open tickets that look like the same request and add this one to the similarity index"""
+    try:
+        matches = find_similar_tickets(ticket.description, exclude_id=ticket.id)
+        index_ticket(ticket)
+    except Exception as e:
+        app.logger.error(f"Duplicate detection failed for ticket #{ticket.id}: {e}")
+        return []
+    
+    if not matches:
+        return []
+    
+    # The index may lag closures made by other workers until its next rebuild
+    still_open = {t.id for t in Ticket.query.filter(Ticket.id.in_([tid for tid, _ in matches]), Ticket.status.in_(OPEN_STATUSES)).all()}
+    matches = [(tid, score) for tid, score in matches if tid in still_open]
+    if matches:
+        history = TicketHistory(
+            ticket_id=ticket.id,
+            action='Possible Duplicate',
+            details='Similar to open ticket(s) ' + ', '.join(f'#{tid} ({score:.0%})' for tid, score in matches)
+        )
+        db.session.add(history)
+        db.session.commit()
+    return matches
+
+def refresh_similarity_index(ticket):
+    try:
+        index_ticket(ticket)
+    except Exception as e:
+        app.logger.error(f"Similarity index update failed for ticket #{ticket.id}: {e}")
+
+def flash_possible_duplicates(duplicates):
+    if duplicates:
+        ticket_refs = ', '.join(f'#{tid}' for tid, _ in duplicates)
+        flash(f'This request looks similar to open ticket(s) {ticket_refs}. It has been flagged as a possible duplicate.', 'warning')
+
+def classify_ticket_in_background(ticket_id, base_url):
+    """Classify a ticket saved as 'Classifying' and hand it to the approval chain"""
+    ticket = db.session.get(Ticket, ticket_id)
+    if not ticket or ticket.status != 'Classifying':
+        return
+    
+    category, classification_method = classify_ticket(ticket.description)
+    
+    # Conditional update so a ticket re-queued after a restart is only routed once
+    claimed = Ticket.query.filter_by(id=ticket_id, status='Classifying').update({
+        'category_id': category.id if category else None,
+        'status': 'Pending Approval'
+    }, synchronize_session='fetch')
+    if not claimed:
+        db.session.rollback()
+        return
+    adjust_status_counts({'Classifying': -claimed, 'Pending Approval': claimed})
+    
+    history = TicketHistory(
+        ticket_id=ticket_id,
+        action='Ticket Classified',
+        details=f'Category auto-classified as: {category.name if category else "Uncategorized"} using {classification_method}'
+    )
+    db.session.add(history)
+    db.session.commit()
+    
+    with app.test_request_context(base_url=base_url):
+        route_classified_ticket(ticket, category, ticket.creator)
+
+def requeue_pending_classifications():
+    """Re-submit tickets left in 'Classifying' by a previous process"""
+    with app.app_context():
+        try:
+            ticket_ids = [t.id for t in Ticket.query.filter_by(status='Classifying').all()]
+        except Exception as e:
+            print(f"Could not load pending classifications: {e}")
+            return
+    
+    base_url = os.getenv('APP_BASE_URL', 'http://localhost:5000/')
+    for ticket_id in ticket_ids:
+        classification_queue.submit(classify_ticket_in_background, ticket_id, base_url)
+    if ticket_ids:
+        print(f"Re-queued {len(ticket_ids)} ticket(s) for background classification")
+
+if ASYNC_CLASSIFICATION:
+    requeue_pending_classifications()
+
 @app.route('/user/create-ticket', methods=['GET', 'POST'])
 @login_required
 def create_ticket():
@@ -179,7 +359,31 @@ def create_ticket():
             flash('Please provide a detailed description (at least 10 characters).', 'danger')
             return redirect(url_for('create_ticket'))
         
-        category, ai_used = classify_ticket(description)
+        if ASYNC_CLASSIFICATION:
+            ticket = Ticket(
+                description=description,
+                created_by=current_user.id,
+                status='Classifying'
+            )
+            db.session.add(ticket)
+            db.session.flush()
+            
+            history = TicketHistory(
+                ticket_id=ticket.id,
+                action='Ticket Created',
+                details='Ticket queued for automatic classification'
+            )
+            db.session.add(history)
+            db.session.commit()
+            
+            duplicates = flag_possible_duplicates(ticket)
+            classification_queue.submit(classify_ticket_in_background, ticket.id, request.host_url)
+            
+            flash('Ticket created successfully! It is being classified and will be sent for approval shortly.', 'success')
+            flash_possible_duplicates(duplicates)
+            return redirect(url_for('user_dashboard'))
+        
+        category, classification_method = classify_ticket(description)
         
         ticket = Ticket(
             description=description,
@@ -190,7 +394,6 @@ def create_ticket():
         db.session.add(ticket)
         db.session.commit()
         
-        classification_method = 'AI (OpenAI)' if ai_used else 'Keyword matching'
         history = TicketHistory(
             ticket_id=ticket.id,
             action='Ticket Created',
@@ -199,61 +402,11 @@ def create_ticket():
         db.session.add(history)
         db.session.commit()
         
-        if category and category.approvers:
-            ticket_id = ticket.id
-            description = ticket.description
-            category_name = category.name if category else 'Uncategorized'
-            creator_name = current_user.name
-            
-            approvers_data = category.approvers.split('|')
-            approval_ids = []
-            for idx, approver_info in enumerate(approvers_data, start=1):
-                parts = approver_info.strip().split(':')
-                approver_email = parts[0].strip()
-                approver_role = parts[1].strip() if len(parts) > 1 else 'Approver'
-                approver_name = parts[2].strip() if len(parts) > 2 else ''
-                
-                approval = Approval(
-                    ticket_id=ticket_id,
-                    approver_email=approver_email,
-                    approver_name=approver_name,
-                    approver_role=approver_role,
-                    approval_level=idx,
-                    status='Pending' if idx == 1 else 'Waiting'
-                )
-                db.session.add(approval)
-                approval_ids.append((approver_email, approver_role, approver_name, approval, idx))
-            db.session.commit()
-            
-            for approver_email, approver_role, approver_name, approval, idx in approval_ids:
-                if idx == 1:
-                    token = serializer.dumps({'approval_id': approval.id, 'ticket_id': ticket_id}, salt='approval-token')
-                    email_sent = send_approval_email(
-                        ticket_id=ticket_id,
-                        description=description,
-                        category_name=category_name,
-                        creator_name=creator_name,
-                        approval_token=token,
-                        approver_email=approver_email
-                    )
-                    if email_sent:
-                        print(f"✓ Approval email sent to {approver_email} for ticket #{ticket_id}")
-                    else:
-                        print(f"✗ Failed to send approval email to {approver_email} for ticket #{ticket_id}")
-        
-        creation_email_sent = send_ticket_creation_email(
-            ticket_id=ticket.id,
-            description=ticket.description,
-            category_name=category.name if category else 'Uncategorized',
-            creator_email=current_user.email,
-            creator_name=current_user.name
-        )
-        if creation_email_sent:
-            print(f"✓ Ticket creation email sent to {current_user.email}")
-        else:
-            print(f"✗ Failed to send ticket creation email to {current_user.email}")
+        duplicates = flag_possible_duplicates(ticket)
+        route_classified_ticket(ticket, category, current_user)
         
         flash('Ticket created successfully! Waiting for approval.', 'success')
+        flash_possible_duplicates(duplicates)
         return redirect(url_for('user_dashboard'))
     
     return render_template('create_ticket.html')
@@ -261,7 +414,9 @@ def create_ticket():
 @app.route('/user/ticket/<int:ticket_id>')
 @login_required
 def view_ticket(ticket_id):
-    ticket = Ticket.query.get_or_404(ticket_id)
+    ticket = db.session.get(Ticket, ticket_id)
+    if ticket is None:
+        return view_archived_ticket(ticket_id)
     
     history = TicketHistory.query.filter_by(ticket_id=ticket_id).order_by(TicketHistory.timestamp.desc()).all()
     approvals = Approval.query.filter_by(ticket_id=ticket_id).order_by(Approval.approval_level).all()
@@ -278,11 +433,7 @@ def view_ticket(ticket_id):
                 ticket.status == 'Pending Approval' and 
                 not any(a.status == 'Approved' for a in approvals))
     
-    classification_history = [h for h in history if h.action in ['Ticket Created', 'Ticket Edited'] and h.details and 'using' in h.details]
-    ai_classified = False
-    if classification_history:
-        latest_classification = classification_history[0]
-        ai_classified = 'AI' in latest_classification.details or 'OpenAI' in latest_classification.details
+    ai_classified, model_classified = classification_badges(history)
     
     test_mode_urls = []
     from email_service import get_email_configured
@@ -308,12 +459,53 @@ def view_ticket(ticket_id):
                          approvals=approvals, 
                          can_edit=can_edit,
                          ai_classified=ai_classified,
+                         model_classified=model_classified,
                          test_mode_urls=test_mode_urls,
                          current_user_approval=current_user_approval,
                          approval_token=approval_token,
                          is_assigned=is_assigned,
                          team_member=team_member)
 
+def classification_badges(history):
+    """(ai_classified, model_classified) for the latest classification entry in newest-first history"""
+    classification_history = [h for h in history if h.action in ['Ticket Created', 'Ticket Classified', 'Ticket Edited'] and h.details and 'using' in h.details]
+    if not classification_history:
+        return False, False
+    latest_classification = classification_history[0]
+    ai_classified = 'AI' in latest_classification.details or 'OpenAI' in latest_classification.details
+    return ai_classified, METHOD_LOCAL_MODEL in latest_classification.details
+
+def view_archived_ticket(ticket_id):
+    """Read-only view_ticket for a ticket moved to the archive tables"""
+    archived = get_archived_ticket(ticket_id)
+    if archived is None:
+        abort(404)
+    ticket, approvals, history = archived
+    
+    is_approver = any(a.approver_email == current_user.email for a in approvals)
+    team_member = TeamMember.query.filter_by(email=current_user.email).first()
+    is_assigned = team_member and ticket.assigned_to == team_member.id
+    
+    if not current_user.is_admin and ticket.created_by != current_user.id and not is_approver and not is_assigned:
+        flash('You do not have permission to view this ticket.', 'danger')
+        return redirect(url_for('user_dashboard'))
+    
+    ai_classified, model_classified = classification_badges(history)
+    
+    return render_template('view_ticket.html',
+                         ticket=ticket,
+                         history=history,
+                         approvals=approvals,
+                         can_edit=False,
+                         ai_classified=ai_classified,
+                         model_classified=model_classified,
+                         test_mode_urls=[],
+                         current_user_approval=None,
+                         approval_token=None,
+                         is_assigned=False,
+                         team_member=team_member,
+                         archived=True)
+
 @app.route('/user/ticket/<int:ticket_id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit_ticket(ticket_id):
@@ -338,11 +530,10 @@ def edit_ticket(ticket_id):
         old_description = ticket.description
         ticket.description = new_description
         
-        category, ai_used = classify_ticket(new_description)
+        category, classification_method = classify_ticket(new_description)
         old_category = ticket.category
         ticket.category_id = category.id if category else None
         
-        classification_method = 'AI (OpenAI)' if ai_used else 'Keyword matching'
         history = TicketHistory(
             ticket_id=ticket.id,
             action='Ticket Edited',
@@ -352,41 +543,10 @@ def edit_ticket(ticket_id):
         
         Approval.query.filter_by(ticket_id=ticket_id).delete()
         
-        if category and category.approvers:
-            approvers_data = category.approvers.split('|')
-            approval_list = []
-            for idx, approver_info in enumerate(approvers_data, start=1):
-                parts = approver_info.strip().split(':')
-                approver_email = parts[0].strip()
-                approver_role = parts[1].strip() if len(parts) > 1 else 'Approver'
-                approver_name = parts[2].strip() if len(parts) > 2 else ''
-                
-                approval = Approval(
-                    ticket_id=ticket_id,
-                    approver_email=approver_email,
-                    approver_name=approver_name,
-                    approver_role=approver_role,
-                    approval_level=idx,
-                    status='Pending' if idx == 1 else 'Waiting'
-                )
-                db.session.add(approval)
-                approval_list.append((approver_email, approval, idx))
-            
-            db.session.commit()
-            
-            for approver_email, approval, idx in approval_list:
-                if idx == 1:
-                    token = serializer.dumps({'approval_id': approval.id, 'ticket_id': ticket_id}, salt='approval-token')
-                    send_approval_email(
-                        ticket_id=ticket_id,
-                        description=new_description,
-                        category_name=category.name,
-                        creator_name=current_user.name,
-                        approval_token=token,
-                        approver_email=approver_email
-                    )
-        else:
-            db.session.commit()
+        if category and get_approval_chain(category.id):
+            start_approval_chain(ticket, category, current_user.name)
+        db.session.commit()
+        refresh_similarity_index(ticket)
         flash('Ticket updated successfully!', 'success')
         return redirect(url_for('view_ticket', ticket_id=ticket_id))
     
@@ -419,6 +579,7 @@ def cancel_ticket(ticket_id):
     )
     db.session.add(history)
     db.session.commit()
+    refresh_similarity_index(ticket)
     
     flash('Ticket cancelled successfully.', 'info')
     return redirect(url_for('user_dashboard'))
@@ -430,10 +591,12 @@ def admin_dashboard():
         flash('Access denied. Admin privileges required.', 'danger')
         return redirect(url_for('user_dashboard'))
     
-    total_tickets = Ticket.query.count()
-    pending_tickets = Ticket.query.filter_by(status='Pending Approval').count()
-    active_tickets = Ticket.query.filter(Ticket.status.in_(['Approved', 'Assigned', 'In Progress'])).count()
-    completed_tickets = Ticket.query.filter_by(status='Completed').count()
+    # One read of the rollup kept by status_counts, instead of a COUNT per card
+    counts = dashboard_counts()
+    total_tickets = sum(counts.values())
+    pending_tickets = counts['Pending Approval']
+    active_tickets = counts['Approved'] + counts['Assigned'] + counts['In Progress']
+    completed_tickets = counts['Completed']
     
     recent_tickets = Ticket.query.order_by(Ticket.created_at.desc()).limit(10).all()
     
@@ -490,15 +653,15 @@ def manage_categories():
         category = Category(
             name=name,
             description=description,
-            keywords=keywords,
-            approvers=approvers
+            keywords=keywords
         )
         db.session.add(category)
+        set_category_approvers(category, approvers)
         db.session.commit()
         flash(f'Category "{name}" created successfully!', 'success')
         return redirect(url_for('manage_categories'))
     
-    categories = Category.query.all()
+    categories = Category.query.options(selectinload(Category.approval_rules)).all()
     return render_template('manage_categories.html', categories=categories)
 
 @app.route('/admin/team-members', methods=['GET', 'POST'])
@@ -519,13 +682,15 @@ def manage_team_members():
             category_id=int(category_id)
         )
         db.session.add(team_member)
+        db.session.add(TeamMemberWorkload(member=team_member, category_id=team_member.category_id, active_ticket_count=0))
         db.session.commit()
         flash(f'Team member "{name}" added successfully!', 'success')
         return redirect(url_for('manage_team_members'))
     
     categories = Category.query.all()
     team_members = TeamMember.query.all()
-    return render_template('manage_team_members.html', categories=categories, team_members=team_members)
+    workloads = dict(db.session.query(TeamMemberWorkload.member_id, TeamMemberWorkload.active_ticket_count).all())
+    return render_template('manage_team_members.html', categories=categories, team_members=team_members, workloads=workloads)
 
 @app.route('/admin/tickets')
 @login_required
@@ -538,11 +703,75 @@ def admin_tickets():
     
     if status_filter == 'all':
         tickets = Ticket.query.order_by(Ticket.created_at.desc()).all()
-    else:
+    elif status_filter in TICKET_STATUS_CODES:
         tickets = Ticket.query.filter_by(status=status_filter).order_by(Ticket.created_at.desc()).all()
+    else:
+        tickets = []
     
     return render_template('admin_tickets.html', tickets=tickets, status_filter=status_filter)
 
+@app.route('/admin/search')
+@login_required
+def admin_search():
+    if not current_user.is_admin:
+        flash('Access denied. Admin privileges required.', 'danger')
+        return redirect(url_for('user_dashboard'))
+    
+    query = request.args.get('q', '').strip()
+    status_filter = request.args.get('status', 'all')
+    page = request.args.get('page', 1, type=int)
+    
+    status = status_filter if status_filter in TICKET_STATUS_CODES else None
+    hits, has_next = search_tickets(query, page=page, status=status) if query else ([], False)
+    
+    return render_template('admin_search.html', query=query, hits=hits, page=page, has_next=has_next,
+                         status_filter=status_filter, statuses=list(TICKET_STATUS_CODES))
+
+@app.route('/api/admin/search')
+@login_required
+def admin_search_api():
+    if not current_user.is_admin:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    query = request.args.get('q', '').strip()
+    status = request.args.get('status')
+    page = request.args.get('page', 1, type=int)
+    if status and status not in TICKET_STATUS_CODES:
+        return jsonify({'error': 'Invalid status'}), 400
+    
+    hits, has_next = search_tickets(query, page=page, status=status)
+    return jsonify({
+        'backend': search_backend(),
+        'page': page,
+        'has_next': has_next,
+        'results': [{
+            'id': hit.ticket.id,
+            'status': hit.ticket.status,
+            'category': hit.ticket.category.name if hit.ticket.category else None,
+            'created_at': hit.ticket.created_at.isoformat(),
+            'snippet': str(hit.snippet),
+            'url': url_for('view_ticket', ticket_id=hit.ticket.id)
+        } for hit in hits]
+    })
+
+@app.route('/admin/similar-tickets')
+@login_required
+def similar_tickets():
+    if not current_user.is_admin:
+        flash('Access denied. Admin privileges required.', 'danger')
+        return redirect(url_for('user_dashboard'))
+    
+    threshold = request.args.get('threshold', SIMILARITY_THRESHOLD, type=float)
+    threshold = min(max(threshold, 0.1), 1.0)
+    
+    clusters = similar_ticket_clusters(threshold)
+    ticket_ids = [tid for cluster in clusters for tid in cluster]
+    tickets_by_id = {t.id: t for t in Ticket.query.filter(Ticket.id.in_(ticket_ids)).all()} if ticket_ids else {}
+    clusters = [[tickets_by_id[tid] for tid in cluster if tid in tickets_by_id] for cluster in clusters]
+    clusters = [cluster for cluster in clusters if len(cluster) > 1]
+    
+    return render_template('similar_tickets.html', clusters=clusters, threshold=threshold)
+
 @app.route('/approve/<token>/<action>', methods=['GET', 'POST'])
 def approve_ticket(token, action):
     try:
@@ -576,6 +805,11 @@ def approve_ticket(token, action):
                              message=f'This approval has already been {approval.status.lower()}.',
                              ticket=ticket)
     
+    if ticket.status != 'Pending Approval':
+        return render_template('approval_result.html',
+                             message=f'This ticket is no longer awaiting approval (status: {ticket.status}).',
+                             ticket=ticket), 409
+    
     previous_level = approval.approval_level - 1
     if previous_level > 0:
         prev_approval = Approval.query.filter_by(
@@ -627,9 +861,9 @@ def approve_ticket(token, action):
             comment=comment
         )
         if update_email_sent:
-            print(f"✓ Approval update email sent to {ticket.creator.email}")
+            print(f"✓ Approval update email queued for {ticket.creator.email}")
         else:
-            print(f"✗ Failed to send approval update email to {ticket.creator.email}")
+            print(f"✗ Failed to queue approval update email to {ticket.creator.email}")
         
         next_level = approval.approval_level + 1
         next_approval = Approval.query.filter_by(ticket_id=ticket_id, approval_level=next_level).first()
@@ -648,9 +882,9 @@ def approve_ticket(token, action):
                 approver_email=next_approval.approver_email
             )
             if email_sent:
-                print(f"✓ Next level approval email sent to {next_approval.approver_email} for ticket #{ticket_id}")
+                print(f"✓ Next level approval email queued for {next_approval.approver_email} for ticket #{ticket_id}")
             else:
-                print(f"✗ Failed to send next level approval email to {next_approval.approver_email}")
+                print(f"✗ Failed to queue next level approval email to {next_approval.approver_email}")
         
         if all(a.status == 'Approved' for a in all_approvals):
             ticket.status = 'Approved'
@@ -677,9 +911,9 @@ def approve_ticket(token, action):
                     team_member_email=assigned_member.email
                 )
                 if email_sent:
-                    print(f"✓ Assignment email sent to {assigned_member.email} for ticket #{ticket.id}")
+                    print(f"✓ Assignment email queued for {assigned_member.email} for ticket #{ticket.id}")
                 else:
-                    print(f"✗ Failed to send assignment email to {assigned_member.email}")
+                    print(f"✗ Failed to queue assignment email to {assigned_member.email}")
         
         db.session.commit()
         message = f'Ticket approved successfully at Level {approval.approval_level}!'
@@ -701,6 +935,7 @@ def approve_ticket(token, action):
         )
         db.session.add(history)
         db.session.commit()
+        refresh_similarity_index(ticket)
         message = 'Ticket rejected.'
     
     else:
@@ -708,6 +943,49 @@ def approve_ticket(token, action):
     
     return render_template('approval_result.html', message=message, ticket=ticket)
 
+@app.route('/api/admin/classifier/stats')
+@login_required
+def classifier_stats():
+    if not current_user.is_admin:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return jsonify({'cache': get_classification_cache_stats(), 'openai': get_openai_stats()})
+
+@app.route('/api/admin/outbox/stats')
+@login_required
+def outbox_stats():
+    if not current_user.is_admin:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return jsonify(outbox_dispatcher.stats())
+
+@app.route('/api/admin/rebalance', methods=['POST'])
+@login_required
+def rebalance_tickets_api():
+    if not current_user.is_admin:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    category_id = data.get('category_id')
+    try:
+        category_ids = [int(category_id)] if category_id else None
+        capacity = int(data.get('capacity', TEAM_MEMBER_CAPACITY))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'category_id and capacity must be integers'}), 400
+    if capacity <= 0:
+        return jsonify({'error': 'capacity must be greater than 0'}), 400
+    
+    try:
+        results = rebalance_tickets(
+            category_ids=category_ids,
+            capacity=capacity,
+            dry_run=bool(data.get('dry_run', False))
+        )
+    except RebalanceConflict as e:
+        return jsonify({'error': str(e)}), 409
+    
+    return jsonify({'success': True, 'categories': results})
+
 @app.route('/api/ticket/<int:ticket_id>/status', methods=['POST'])
 @login_required
 def update_ticket_status(ticket_id):
@@ -722,7 +1000,16 @@ def update_ticket_status(ticket_id):
     
     if new_status in ['In Progress', 'Completed', 'Cancelled']:
         old_status = ticket.status
-        ticket.status = new_status
+        try:
+            ticket.status = new_status
+        except InvalidStatusTransition as e:
+            return jsonify({'error': str(e)}), 409
+        track_workload_change(ticket, old_status, ticket.assigned_to)
+        
+        # Outstanding approval links stop working once the ticket is cancelled
+        if new_status == 'Cancelled':
+            for approval in Approval.query.filter_by(ticket_id=ticket_id).filter(Approval.status.in_(['Pending', 'Waiting'])):
+                approval.status = 'Cancelled'
         
         if resolution_comment:
             ticket.resolution_comment = resolution_comment
@@ -740,6 +1027,13 @@ def update_ticket_status(ticket_id):
         )
         db.session.add(history)
         db.session.commit()
+        refresh_similarity_index(ticket)
+        
+        if new_status == 'Completed' and ticket.category_id:
+            try:
+                learn_from_ticket(ticket.description, ticket.category_id)
+            except Exception as e:
+                app.logger.error(f"Local model update failed for ticket #{ticket_id}: {e}")
         
         return jsonify({'success': True, 'status': new_status})
     
@@ -748,6 +1042,7 @@ def update_ticket_status(ticket_id):
 @app.cli.command()
 def init_db():
     db.create_all()
+    upgrade_database()
     
     admin = User.query.filter_by(email='admin@company.com').first()
     if not admin:
@@ -764,6 +1059,150 @@ def init_db():
     else:
         print('Database already initialized.')
 
+@app.cli.command('upgrade-db')
+@click.option('--status', is_flag=True, help='List migrations and whether they are applied, without applying any')
+def upgrade_db(status):
+    """Bring an existing database up to the current schema (new tables, columns and indexes)"""
+    if status:
+        for version, name, applied in migration_status():
+            print(f"{version:4d}  {'applied' if applied else 'pending':8s} {name}")
+        return
+    
+    db.create_all()
+    applied = upgrade_database()
+    for version, name in applied:
+        print(f'Applied migration {version}: {name}')
+    print(f'Database is up to date ({len(applied)} migration(s) applied)')
+
+@app.cli.command()
+def build_category_index():
+    index = rebuild_category_index()
+    print(f'Category index fitted over {len(index)} categories and saved to {CATEGORY_INDEX_PATH}')
+
+@app.cli.command()
+@click.option('--epochs', default=5, show_default=True, help='Passes over the training data')
+def train_classifier(epochs):
+    """Train the local ticket classifier from approved ticket history"""
+    category_ids = [cat.id for cat in Category.query.all()]
+    if not category_ids:
+        print('No categories found - nothing to train.')
+        return
+    
+    started = time.perf_counter()
+    model, examples = train_local_model(category_ids, epochs=epochs)
+    elapsed = time.perf_counter() - started
+    print(f'Trained local classifier on {examples} tickets across {len(category_ids)} categories in {elapsed:.2f}s')
+    print(f'Saved to {LOCAL_MODEL_PATH}')
+
+@app.cli.command('classify-tickets')
+@click.argument('input_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--output', '-o', type=click.Path(dir_okay=False), help='CSV file for the results (default: stdout)')
+@click.option('--no-ai', is_flag=True, help='Use only the local keyword/TF-IDF classifier')
+@click.option('--chunk-size', default=1000, show_default=True, help='Descriptions classified per batch')
+def classify_tickets_command(input_file, output, no_ai, chunk_size):
+    """Classify ticket descriptions from a text file (one per line) or a CSV with a 'description' column"""
+    with open(input_file, newline='', encoding='utf-8') as f:
+        if input_file.lower().endswith('.csv'):
+            descriptions = [row['description'] for row in csv.DictReader(f) if row.get('description')]
+        else:
+            descriptions = [line.strip() for line in f if line.strip()]
+    
+    started = time.perf_counter()
+    results = []
+    for start in range(0, len(descriptions), chunk_size):
+        results.extend(classify_tickets(descriptions[start:start + chunk_size], use_ai=not no_ai))
+    elapsed = time.perf_counter() - started
+    
+    out = open(output, 'w', newline='', encoding='utf-8') if output else click.get_text_stream('stdout')
+    try:
+        writer = csv.writer(out)
+        writer.writerow(['description', 'category', 'classification_method'])
+        for description, (category, classification_method) in zip(descriptions, results):
+            writer.writerow([description, category.name if category else 'Uncategorized', classification_method])
+    finally:
+        if output:
+            out.close()
+    
+    rate = len(descriptions) / elapsed if elapsed else float('inf')
+    click.echo(f'Classified {len(descriptions)} tickets in {elapsed:.2f}s ({rate:.1f} tickets/sec)', err=True)
+
+@app.cli.command('drain-outbox')
+@click.option('--retry-dead', is_flag=True, help='Re-queue dead-lettered emails before draining')
+def drain_outbox(retry_dead):
+    """Deliver every queued email that is due, without the background workers"""
+    if retry_dead:
+        print(f'Re-queued {retry_dead_emails()} dead-lettered email(s)')
+    sent, retried, dead, coalesced = outbox_dispatcher.drain()
+    print(f'Outbox drained: {sent} sent ({coalesced} merged into digests), {retried} scheduled for retry, {dead} dead-lettered')
+
+@app.cli.command('reconcile-workloads')
+@click.option('--dry-run', is_flag=True, help='Report drifted counters without fixing them')
+def reconcile_workloads_command(dry_run):
+    """Recount every team member's active tickets and repair counters that drifted"""
+    drifted = reconcile_workloads(fix=not dry_run)
+    for member, recorded, actual in drifted:
+        recorded_info = 'missing' if recorded is None else recorded
+        print(f'{member.name} (#{member.id}): counter {recorded_info}, actual {actual}')
+    action = 'found' if dry_run else 'fixed'
+    print(f'Workload counters checked: {len(drifted)} drifted counter(s) {action}')
+
+@app.cli.command('reconcile-status-counts')
+@click.option('--dry-run', is_flag=True, help='Report drifted counters without fixing them')
+def reconcile_status_counts_command(dry_run):
+    """Recount tickets per status and repair dashboard counters that drifted"""
+    drifted = reconcile_status_counts(fix=not dry_run)
+    for status, recorded, actual in drifted:
+        recorded_info = 'missing' if recorded is None else recorded
+        print(f'{status}: counter {recorded_info}, actual {actual}')
+    action = 'found' if dry_run else 'fixed'
+    print(f'Status counters checked: {len(drifted)} drifted counter(s) {action}')
+
+@app.cli.command('rebalance-tickets')
+@click.option('--category', 'category_names', multiple=True, help='Category name to rebalance (repeatable; default: all)')
+@click.option('--capacity', default=TEAM_MEMBER_CAPACITY, type=click.IntRange(min=1), show_default=True, help='Most active tickets per team member')
+@click.option('--dry-run', is_flag=True, help='Show the planned moves without applying them')
+def rebalance_tickets_command(category_names, capacity, dry_run):
+    """Assign the unassigned backlog and spread Assigned tickets evenly over available team members"""
+    category_ids = None
+    if category_names:
+        categories = Category.query.filter(Category.name.in_(category_names)).all()
+        unknown = set(category_names) - {c.name for c in categories}
+        if unknown:
+            raise click.BadParameter(f"Unknown category: {', '.join(sorted(unknown))}", param_hint='--category')
+        category_ids = [c.id for c in categories]
+    
+    for summary in rebalance_tickets(category_ids=category_ids, capacity=capacity, dry_run=dry_run):
+        verb = 'would move' if dry_run else 'moved'
+        print(f"{summary['category']}: {verb} {len(summary['moves'])} ticket(s) "
+              f"({summary['assigned']} from backlog, {summary['reassigned']} reassigned)")
+        for move in summary['moves']:
+            print(f"  #{move['ticket_id']}: {move['from'] or 'unassigned'} -> {move['to']}")
+        if summary['unplaced']:
+            print(f"  No capacity for: {', '.join(f'#{ticket_id}' for ticket_id in summary['unplaced'])}")
+        if summary['loads']:
+            print('  Loads: ' + ', '.join(f'{name} {load}' for name, load in summary['loads'].items()))
+
+@app.cli.command('archive-tickets')
+@click.option('--older-than-days', default=ARCHIVE_AFTER_DAYS, show_default=True, help='Archive closed tickets not updated for this many days')
+@click.option('--batch-size', default=ARCHIVE_BATCH_SIZE, show_default=True, help='Tickets moved per transaction')
+@click.option('--dry-run', is_flag=True, help='Only count the tickets that would be archived')
+def archive_tickets_command(older_than_days, batch_size, dry_run):
+    """Move old Completed/Rejected/Cancelled tickets with their approvals and history to the archive tables"""
+    started = time.perf_counter()
+    count = archive_closed_tickets(older_than_days=older_than_days, batch_size=batch_size, dry_run=dry_run)
+    if dry_run:
+        print(f"{count} closed ticket(s) older than {older_than_days} days would be archived")
+    else:
+        print(f"Archived {count} ticket(s) in {time.perf_counter() - started:.1f}s")
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Recreate the full-text search index from the tickets and history tables"""
+    started = time.perf_counter()
+    with db.engine.begin() as connection:
+        backend = create_search_index(connection)
+    print(f"Search index rebuilt ({backend}) in {time.perf_counter() - started:.1f}s")
+
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
@@ -0,0 +1,106 @@
+import os
+import time
+import threading
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy import insert
+from models import db, ApprovalRule, Approval, Category
+from session_hooks import register_commit_hook
+
+# Seconds before a worker re-reads the chains; commits in this process invalidate them at once
+APPROVAL_CHAIN_TTL = int(os.getenv('APPROVAL_CHAIN_TTL', '60'))
+
+ApprovalStep = namedtuple('ApprovalStep', ['level', 'email', 'role', 'name'])
+
+_chains = None
+_chains_loaded_at = 0.0
+_chains_dirty = False
+_chains_lock = threading.Lock()
+
+
+def parse_approvers(text):
+    """[(email, role, name)] from the 'email:Role:Name | email:Role:Name' format of the category form"""
+    steps = []
+    for entry in (text or '').split('|'):
+        parts = [part.strip() for part in entry.strip().split(':')]
+        if not parts[0]:
+            continue
+        role = parts[1] if len(parts) > 1 else 'Approver'
+        name = parts[2] if len(parts) > 2 else ''
+        steps.append((parts[0], role, name))
+    return steps
+
+
+def set_category_approvers(category, text):
+    """Replace the category's approval rules with the chain in `text` (and keep the text for the admin form)"""
+    category.approvers = text
+    if category.id is not None:
+        ApprovalRule.query.filter_by(category_id=category.id).delete(synchronize_session='fetch')
+    for level, (email, role, name) in enumerate(parse_approvers(text), start=1):
+        db.session.add(ApprovalRule(category=category, level=level, approver_email=email,
+                                    approver_role=role, approver_name=name))
+    db.session.info['approval_rules_changed'] = True
+
+
+def _step(rule):
+    return ApprovalStep(rule.level, rule.approver_email, rule.approver_role, rule.approver_name)
+
+
+def get_approval_chain(category_id):
+    """The category's approval steps ordered by level, from the in-process cache; () when it has none.
+
+    A category missing from the cache (e.g. created by another worker since
+    the last load) is read from the database rather than treated as having
+    no approvers.
+    """
+    global _chains, _chains_loaded_at, _chains_dirty
+
+    with _chains_lock:
+        now = time.monotonic()
+        if _chains is None or _chains_dirty or now - _chains_loaded_at >= APPROVAL_CHAIN_TTL:
+            chains = {}
+            for rule in ApprovalRule.query.order_by(ApprovalRule.category_id, ApprovalRule.level).all():
+                chains.setdefault(rule.category_id, []).append(_step(rule))
+            _chains = {category: tuple(steps) for category, steps in chains.items()}
+            _chains_loaded_at = now
+            _chains_dirty = False
+        chain = _chains.get(category_id)
+
+    if chain is None and category_id is not None:
+        chain = tuple(_step(rule) for rule in ApprovalRule.query.filter_by(category_id=category_id).order_by(ApprovalRule.level))
+        if chain:
+            with _chains_lock:
+                _chains[category_id] = chain
+    return chain or ()
+
+
+def invalidate_approval_chains():
+    global _chains_dirty
+    _chains_dirty = True
+
+
+def create_approvals(ticket_id, chain):
+    """Insert one Approval per step with a single statement; level 1 starts Pending. Returns the ids in level order"""
+    now = datetime.utcnow()
+    rows = [{
+        'ticket_id': ticket_id,
+        'approver_email': step.email,
+        'approver_name': step.name,
+        'approver_role': step.role,
+        'approval_level': step.level,
+        'status': 'Pending' if step.level == 1 else 'Waiting',
+        'created_at': now,
+    } for step in chain]
+    if not rows:
+        return []
+    return list(db.session.scalars(insert(Approval).returning(Approval.id, sort_by_parameter_order=True), rows))
+
+
+def categories_gated_by(approver_email):
+    """Categories whose approval chain includes this approver (uses ix_approval_rules_approver_email)"""
+    return Category.query.join(ApprovalRule).filter(
+        ApprovalRule.approver_email == approver_email
+    ).distinct().order_by(Category.name).all()
+
+
+register_commit_hook('approval_rules_changed', invalidate_approval_chains, models=(ApprovalRule,))
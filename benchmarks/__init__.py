@@ -0,0 +1 @@
+"""Performance benchmarks. Run from the repository root, e.g. `python -m benchmarks.startup_time`."""
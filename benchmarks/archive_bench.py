@@ -0,0 +1,131 @@
+"""Archiving closed tickets: throughput, and the hot queries before and after.
+
+Seeds a year of synthetic tickets (mostly Completed, with approvals and
+history), measures the queries that scan the whole tickets table
+(the admin dashboard count, the unfiltered admin listing), runs
+ticket_archive.archive_closed_tickets() and measures them again, together
+with the cost of reading one ticket back from the archive.
+
+The run fails (exit status 1) if any ticket, approval or history row is lost
+or duplicated by the move.
+
+Usage:
+
+    python -m benchmarks.archive_bench --tickets 100000 --older-than-days 90 --json archive.json
+    python -m benchmarks.archive_bench --database-url postgresql://localhost/tickets_bench
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import tempfile
+from datetime import datetime
+
+from benchmarks.harness import create_bench_app
+from benchmarks.query_plans import _seed
+
+
+def _row_counts():
+    from models import db, Ticket, Approval, TicketHistory, ArchivedTicket, ArchivedApproval, ArchivedTicketHistory
+
+    models = (Ticket, Approval, TicketHistory, ArchivedTicket, ArchivedApproval, ArchivedTicketHistory)
+    return {model.__tablename__: db.session.query(model).count() for model in models}
+
+
+def _measure(repeat):
+    from models import Ticket
+
+    queries = {
+        'admin dashboard: total count': lambda: Ticket.query.count(),
+        'admin: all tickets, newest first': lambda: Ticket.query.order_by(Ticket.created_at.desc()).all(),
+    }
+    results = {}
+    for name, query in queries.items():
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            query()
+            timings.append(time.perf_counter() - started)
+        results[name] = round(statistics.median(timings) * 1000, 3)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Archive closed tickets and measure the hot queries before and after')
+    parser.add_argument('--tickets', type=int, default=50000)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--members', type=int, default=20)
+    parser.add_argument('--older-than-days', type=int, default=90)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per query; the median is reported')
+    parser.add_argument('--database-url', help='Database to run against (default: a throw-away SQLite file); its tables are dropped')
+    parser.add_argument('--json', dest='json_path', help='Write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='archive-bench-'), 'archive.db')}"
+    app = create_bench_app(database_url)
+    with app.app_context():
+        from models import db, ArchivedTicket
+        from ticket_archive import archive_closed_tickets, get_archived_ticket
+
+        if args.database_url:
+            db.drop_all()
+            db.create_all()
+        _seed(args.tickets, args.users, args.members)
+        seeded = _row_counts()
+
+        before = _measure(args.repeat)
+        started = time.perf_counter()
+        archived = archive_closed_tickets(older_than_days=args.older_than_days, batch_size=args.batch_size)
+        archive_seconds = time.perf_counter() - started
+        after = _measure(args.repeat)
+        counts = _row_counts()
+
+        sample_ids = [row.id for row in db.session.query(ArchivedTicket.id).order_by(ArchivedTicket.id).limit(100)]
+        lookups = []
+        for ticket_id in sample_ids:
+            lookup_started = time.perf_counter()
+            get_archived_ticket(ticket_id)
+            lookups.append(time.perf_counter() - lookup_started)
+
+    results = {
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        'python': sys.version.split()[0],
+        'database': database_url.split(':', 1)[0],
+        'config': {k: v for k, v in vars(args).items() if k not in ('json_path', 'database_url')},
+        'archived': archived,
+        'archive_seconds': round(archive_seconds, 3),
+        'tickets_per_second': round(archived / archive_seconds, 1) if archive_seconds else None,
+        'rows': {'seeded': seeded, 'after': counts},
+        'queries_ms': {name: {'before': before[name], 'after': after[name]} for name in before},
+        'archived_lookup_p50_ms': round(statistics.median(lookups) * 1000, 3) if lookups else None,
+    }
+    print(f"Archived {archived} of {args.tickets} tickets in {archive_seconds:.2f}s "
+          f"({results['tickets_per_second']} /s, batches of {args.batch_size})")
+    for name, timings in results['queries_ms'].items():
+        speedup = timings['before'] / timings['after'] if timings['after'] else float('inf')
+        print(f"{name}: {timings['before']:.3f}ms -> {timings['after']:.3f}ms ({speedup:.1f}x)")
+    if lookups:
+        print(f"view_ticket archive lookup: p50 {results['archived_lookup_p50_ms']:.3f}ms")
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.json_path}")
+
+    failures = []
+    for hot, archive in (('tickets', 'archived_tickets'), ('approvals', 'archived_approvals'),
+                         ('ticket_history', 'archived_ticket_history')):
+        if counts[hot] + counts[archive] != seeded[hot]:
+            failures.append(f'{hot}: {seeded[hot]} seeded, {counts[hot]} + {counts[archive]} after archiving')
+    if counts['archived_tickets'] != archived:
+        failures.append(f"{archived} reported archived, {counts['archived_tickets']} in archived_tickets")
+    if failures:
+        print('FAILED: ' + '; '.join(failures), file=sys.stderr)
+        sys.exit(1)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""Concurrent ticket assignment: does the load stay balanced?
+
+Seeds categories with team members and a backlog of unassigned 'Approved'
+tickets, then assigns them from many threads at once, each doing what
+approve_ticket does: pick a member, hold the transaction open for a moment
+(history rows, notification) and commit.
+
+    counter  assign_ticket_to_team_member (atomic pick-and-increment)
+    naive    the earlier read-counts-then-write pick, kept for comparison
+
+The run fails (exit status 1) if any category ends up with a spread between
+its most and least loaded member above --max-spread, or if a workload counter
+disagrees with the tickets table. The naive strategy is expected to fail.
+
+Usage:
+
+    python -m benchmarks.assignment_stress --tickets 400 --members 5 --threads 16
+    python -m benchmarks.assignment_stress --database-url postgresql://localhost/tickets_bench
+"""
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+from collections import Counter
+
+from sqlalchemy import func, and_
+from benchmarks.harness import create_bench_app, latency_summary
+
+STRATEGIES = ('counter', 'naive')
+
+
+def _seed(categories, members, tickets):
+    from models import db, User, Category, TeamMember, TeamMemberWorkload, Ticket
+
+    creator = User(name='Stress Creator', email='stress@example.com', password='x', must_change_password=False)
+    db.session.add(creator)
+    category_ids = []
+    for i in range(categories):
+        category = Category(name=f'Stress Category {i}', keywords='stress', approvers='approver@example.com:Lead:Approver')
+        db.session.add(category)
+        db.session.flush()
+        category_ids.append(category.id)
+        for j in range(members):
+            member = TeamMember(name=f'Member {i}-{j}', email=f'member{i}-{j}@example.com', category_id=category.id)
+            db.session.add(member)
+            db.session.flush()
+            db.session.add(TeamMemberWorkload(member_id=member.id, category_id=category.id, active_ticket_count=0))
+    db.session.flush()
+    ticket_ids = []
+    for i in range(tickets):
+        ticket = Ticket(description=f'Stress ticket {i}', category_id=category_ids[i % categories],
+                        created_by=creator.id, status='Approved')
+        db.session.add(ticket)
+        db.session.flush()
+        ticket_ids.append(ticket.id)
+    db.session.commit()
+    return ticket_ids
+
+
+def _naive_pick(ticket):
+    """The pick as it was before the workload counters: count, then write in a later statement"""
+    from models import TeamMember, Ticket
+    from ticket_assignment import ACTIVE_STATUSES
+
+    return TeamMember.query.outerjoin(
+        Ticket,
+        and_(Ticket.assigned_to == TeamMember.id, Ticket.status.in_(ACTIVE_STATUSES))
+    ).filter(
+        TeamMember.category_id == ticket.category_id,
+        TeamMember.is_available == True
+    ).group_by(TeamMember.id).order_by(func.count(Ticket.id), TeamMember.id).first()
+
+
+def _worker(app, strategy, pending, hold, latencies, errors, lock):
+    from models import db, Ticket
+    from ticket_assignment import assign_ticket_to_team_member, track_workload_change
+
+    while True:
+        try:
+            ticket_id = pending.get_nowait()
+        except queue.Empty:
+            return
+        for attempt in range(5):
+            started = time.perf_counter()
+            with app.app_context():
+                try:
+                    ticket = db.session.get(Ticket, ticket_id)
+                    member = assign_ticket_to_team_member(ticket) if strategy == 'counter' else _naive_pick(ticket)
+                    ticket.assigned_to = member.id
+                    ticket.status = 'Assigned'
+                    if strategy == 'naive':
+                        track_workload_change(ticket, 'Approved', None)
+                    if hold:
+                        time.sleep(hold)
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    with lock:
+                        errors[type(e).__name__] += 1
+                    continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+            break
+
+
+def _distribution():
+    from models import db, TeamMember, Ticket
+    from ticket_assignment import reconcile_workloads
+
+    counts = dict(db.session.query(Ticket.assigned_to, func.count(Ticket.id)).filter(
+        Ticket.status == 'Assigned').group_by(Ticket.assigned_to).all())
+    per_category = {}
+    for member in TeamMember.query.order_by(TeamMember.id).all():
+        per_category.setdefault(member.category.name, {})[member.name] = counts.get(member.id, 0)
+    drifted = [(member.name, recorded, actual) for member, recorded, actual in reconcile_workloads(fix=False)]
+    return per_category, drifted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Stress concurrent ticket assignment and check the resulting balance')
+    parser.add_argument('--tickets', type=int, default=300)
+    parser.add_argument('--categories', type=int, default=2)
+    parser.add_argument('--members', type=int, default=5, help='Team members per category')
+    parser.add_argument('--threads', type=int, default=12)
+    parser.add_argument('--hold-ms', type=float, default=5.0,
+                        help='Time each assignment keeps its transaction open after picking a member')
+    parser.add_argument('--strategy', choices=STRATEGIES, default='counter')
+    parser.add_argument('--max-spread', type=int, default=1, help='Largest allowed gap between members of a category')
+    parser.add_argument('--database-url', help='Database to run against (default: a throw-away SQLite file)')
+    parser.add_argument('--json', dest='json_path', help='Write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='assignment-stress-'), 'stress.db')}"
+    app = create_bench_app(database_url)
+    with app.app_context():
+        from models import db
+        if args.database_url:
+            db.drop_all()
+            db.create_all()
+        ticket_ids = _seed(args.categories, args.members, args.tickets)
+
+    pending = queue.Queue()
+    for ticket_id in ticket_ids:
+        pending.put(ticket_id)
+    latencies, errors, lock = [], Counter(), threading.Lock()
+    threads = [threading.Thread(target=_worker, args=(app, args.strategy, pending, args.hold_ms / 1000, latencies, errors, lock))
+               for _ in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        per_category, drifted = _distribution()
+    spreads = {name: max(loads.values()) - min(loads.values()) for name, loads in per_category.items()}
+    summary = latency_summary(latencies, elapsed)
+    results = {
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        'python': sys.version.split()[0],
+        'database': database_url.split(':', 1)[0],
+        'config': {k: v for k, v in vars(args).items() if k not in ('json_path', 'database_url')},
+        'assignments': summary,
+        'retried_errors': dict(errors),
+        'loads': per_category,
+        'spread': spreads,
+        'counter_drift': drifted,
+    }
+
+    print(f"{args.strategy}: {summary['calls']} assignments from {args.threads} threads in {elapsed:.2f}s "
+          f"({summary['per_second']} /s), p50 {summary['p50_ms']:.1f}ms p95 {summary['p95_ms']:.1f}ms p99 {summary['p99_ms']:.1f}ms")
+    for name, loads in per_category.items():
+        print(f"  {name}: spread {spreads[name]}  " + ' '.join(str(load) for load in loads.values()))
+    if errors:
+        print(f"  retried after: {dict(errors)}")
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.json_path}")
+
+    failures = []
+    if summary['calls'] != len(ticket_ids):
+        failures.append(f"{len(ticket_ids) - summary['calls']} ticket(s) were not assigned")
+    if any(spread > args.max_spread for spread in spreads.values()):
+        failures.append(f'load spread above {args.max_spread}')
+    if drifted:
+        failures.append(f'{len(drifted)} workload counter(s) disagree with the tickets table')
+    if failures:
+        print('FAILED: ' + '; '.join(failures), file=sys.stderr)
+        sys.exit(1)
+    return results
+
+
+if __name__ == '__main__':
+    main()
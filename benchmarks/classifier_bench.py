@@ -0,0 +1,150 @@
+"""Throughput and latency of the ticket classification paths.
+
+Generates a synthetic corpus against synthetic categories in a throw-away
+SQLite database and runs each path against a local fake OpenAI server:
+
+    keywords  classify_ticket_with_keywords (compiled matcher + TF-IDF index)
+    openai    classify_ticket_with_openai
+    classify  classify_ticket (full tiered path, result cache disabled)
+    batch     classify_tickets over the whole corpus
+
+Usage:
+
+    python -m benchmarks.classifier_bench --tickets 2000 --categories 20 \\
+        --latency 0.2 --jitter 0.05 --error-rate 0.02 --json results.json
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+from datetime import datetime
+
+from benchmarks.fake_openai import FakeOpenAIServer
+from benchmarks.harness import create_bench_app, seed_synthetic_categories, generate_tickets, latency_summary
+
+PATHS = ('keywords', 'openai', 'classify', 'batch')
+
+
+def _run_single(func, tickets, expected_name):
+    latencies, correct = [], 0
+    started = time.perf_counter()
+    for description, expected in tickets:
+        call_started = time.perf_counter()
+        result = func(description)
+        latencies.append(time.perf_counter() - call_started)
+        if expected_name(result) == expected:
+            correct += 1
+    summary = latency_summary(latencies, time.perf_counter() - started)
+    summary['accuracy'] = round(correct / len(tickets), 4) if tickets else None
+    return summary
+
+
+def _run_batch(classify_tickets, tickets, batch_size):
+    descriptions = [d for d, _ in tickets]
+    latencies, results = [], []
+    started = time.perf_counter()
+    for start in range(0, len(descriptions), batch_size):
+        call_started = time.perf_counter()
+        results.extend(classify_tickets(descriptions[start:start + batch_size]))
+        latencies.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+    summary = latency_summary(latencies, elapsed)
+    summary['batch_size'] = batch_size
+    summary['tickets_per_second'] = round(len(descriptions) / elapsed, 2) if elapsed else None
+    correct = sum(1 for (category, _), (_, expected) in zip(results, tickets) if category and category.name == expected)
+    summary['accuracy'] = round(correct / len(tickets), 4) if tickets else None
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the ticket classification paths')
+    parser.add_argument('--tickets', type=int, default=1000, help='Synthetic tickets per path')
+    parser.add_argument('--categories', type=int, default=10)
+    parser.add_argument('--keywords-per-category', type=int, default=8)
+    parser.add_argument('--keyword-rate', type=float, default=0.8, help='Share of tickets that mention a keyword')
+    parser.add_argument('--latency', type=float, default=0.05, help='Fake OpenAI mean latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Std-dev of the fake latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of fake OpenAI requests that fail')
+    parser.add_argument('--budget', type=float, default=None, help='OPENAI_LATENCY_BUDGET override in seconds')
+    parser.add_argument('--hedged', action='store_true', help='Enable OPENAI_HEDGED for the classify path')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--paths', nargs='+', choices=PATHS, default=list(PATHS))
+    parser.add_argument('--openai-tickets', type=int, default=None,
+                        help='Cap tickets for the openai/classify paths (they are latency bound)')
+    parser.add_argument('--json', dest='json_path', help='Write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='classifier-bench-')
+    server = FakeOpenAIServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, seed=1).start()
+
+    # ai_classifier and its helpers read their configuration at import time
+    os.environ.update({
+        'OPENAI_API_KEY': 'sk-benchmark',
+        'OPENAI_BASE_URL': server.base_url,
+        'CLASSIFICATION_CACHE_SIZE': '0',
+        'CATEGORY_INDEX_PATH': os.path.join(workdir, 'category_index.pkl'),
+        'LOCAL_MODEL_PATH': os.path.join(workdir, 'no_local_model.pkl'),
+        'OPENAI_HEDGED': 'True' if args.hedged else 'False',
+    })
+    if args.budget is not None:
+        os.environ['OPENAI_LATENCY_BUDGET'] = str(args.budget)
+    import ai_classifier
+    from ai_classifier import (classify_ticket, classify_ticket_with_keywords,
+                               classify_ticket_with_openai, classify_tickets)
+    from category_index import get_category_index
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger('ai_classifier').setLevel(logging.CRITICAL)
+
+    app = create_bench_app(f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    results = {
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        'python': sys.version.split()[0],
+        'config': {k: v for k, v in vars(args).items() if k != 'json_path'},
+        'paths': {},
+    }
+
+    try:
+        with app.app_context():
+            categories = seed_synthetic_categories(args.categories, args.keywords_per_category)
+            tickets = generate_tickets(categories, args.tickets, keyword_rate=args.keyword_rate)
+            llm_tickets = tickets[:args.openai_tickets] if args.openai_tickets else tickets
+
+            started = time.perf_counter()
+            get_category_index()
+            results['index_build_seconds'] = round(time.perf_counter() - started, 4)
+
+            for path in args.paths:
+                ai_classifier.openai_breaker.record_success()
+                requests_before = server.requests
+                if path == 'keywords':
+                    summary = _run_single(classify_ticket_with_keywords, tickets, lambda c: c.name if c else None)
+                elif path == 'openai':
+                    summary = _run_single(classify_ticket_with_openai, llm_tickets, lambda c: c.name if c else None)
+                elif path == 'classify':
+                    summary = _run_single(classify_ticket, llm_tickets, lambda r: r[0].name if r[0] else None)
+                else:
+                    summary = _run_batch(classify_tickets, tickets, args.batch_size)
+                summary['openai_requests'] = server.requests - requests_before
+                results['paths'][path] = summary
+                rate = summary.get('tickets_per_second', summary['per_second']) or 0
+                print(f"{path:>9}: {summary['calls']:6d} calls  {rate:10.1f} tickets/s  "
+                      f"p50 {summary['p50_ms']:8.2f}ms  p95 {summary['p95_ms']:8.2f}ms  "
+                      f"p99 {summary['p99_ms']:8.2f}ms  acc {summary['accuracy']}")
+
+            results['openai'] = ai_classifier.get_openai_stats()
+            results['fake_server'] = {'requests': server.requests, 'injected_errors': server.errors}
+    finally:
+        server.stop()
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.json_path}")
+    return results
+
+
+if __name__ == '__main__':
+    main()
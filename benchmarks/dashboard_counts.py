@@ -0,0 +1,168 @@
+"""Admin dashboard counts: four COUNT queries vs. the status count rollup.
+
+Seeds synthetic tickets, builds the counter rows the way migration 6 does,
+and times the four COUNT queries admin_dashboard used to run against
+status_counts.dashboard_counts(). It then runs concurrent writer threads
+that walk tickets through status changes with the ORM (each change commits
+its counter update in the same transaction) and times those writes.
+
+The run fails (exit status 1) if status_counts.reconcile_status_counts()
+finds any counter that drifted from the tickets table during the writes.
+
+Usage:
+
+    python -m benchmarks.dashboard_counts --tickets 200000 --writers 8 --json dashboard.json
+    python -m benchmarks.dashboard_counts --database-url postgresql://localhost/tickets_bench
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import tempfile
+from datetime import datetime
+
+from benchmarks.harness import create_bench_app, latency_summary
+from benchmarks.query_plans import _seed
+
+# Status each writer moves a ticket to next
+NEXT_STATUS = {
+    'Pending Approval': 'Approved',
+    'Approved': 'In Progress',
+    'Assigned': 'In Progress',
+    'In Progress': 'Completed',
+    'Completed': 'In Progress',
+}
+
+
+def _count_queries():
+    from models import Ticket
+
+    return {
+        'total': Ticket.query.count(),
+        'pending': Ticket.query.filter_by(status='Pending Approval').count(),
+        'active': Ticket.query.filter(Ticket.status.in_(['Approved', 'Assigned', 'In Progress'])).count(),
+        'completed': Ticket.query.filter_by(status='Completed').count(),
+    }
+
+
+def _rollup():
+    from status_counts import dashboard_counts
+
+    counts = dashboard_counts()
+    return {
+        'total': sum(counts.values()),
+        'pending': counts['Pending Approval'],
+        'active': counts['Approved'] + counts['Assigned'] + counts['In Progress'],
+        'completed': counts['Completed'],
+    }
+
+
+def _time(fn, repeat):
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        call_started = time.perf_counter()
+        result = fn()
+        latencies.append(time.perf_counter() - call_started)
+    return latency_summary(latencies, time.perf_counter() - started), result
+
+
+def _writer(app, ticket_ids, changes, seed, latencies, errors):
+    from models import db, Ticket
+
+    rng = random.Random(seed)
+    with app.app_context():
+        for _ in range(changes):
+            started = time.perf_counter()
+            try:
+                ticket = db.session.get(Ticket, rng.choice(ticket_ids))
+                if ticket.status in NEXT_STATUS:
+                    ticket.status = NEXT_STATUS[ticket.status]
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                errors.append(str(e))
+                continue
+            latencies.append(time.perf_counter() - started)
+        db.session.remove()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Admin dashboard COUNT queries vs. the status count rollup')
+    parser.add_argument('--tickets', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--members', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=50, help='Dashboard reads per method')
+    parser.add_argument('--writers', type=int, default=4, help='Concurrent threads changing ticket statuses')
+    parser.add_argument('--changes', type=int, default=250, help='Status changes per writer')
+    parser.add_argument('--database-url', help='Database to run against (default: a throw-away SQLite file); its tables are dropped')
+    parser.add_argument('--json', dest='json_path', help='Write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='dashboard-bench-'), 'dashboard.db')}"
+    app = create_bench_app(database_url)
+    with app.app_context():
+        from models import db, Ticket
+        from status_counts import create_status_counts, reconcile_status_counts
+
+        if args.database_url:
+            db.drop_all()
+            db.create_all()
+        _seed(args.tickets, args.users, args.members)
+        with db.engine.begin() as connection:
+            create_status_counts(connection)
+
+        counting, counted = _time(_count_queries, args.repeat)
+        reading, read = _time(_rollup, args.repeat)
+        ticket_ids = [row.id for row in db.session.query(Ticket.id)]
+        db.session.remove()
+
+    latencies, errors = [], []
+    threads = [threading.Thread(target=_writer, args=(app, ticket_ids, args.changes, seed, latencies, errors))
+               for seed in range(args.writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writes = latency_summary(latencies, time.perf_counter() - started) if latencies else None
+
+    with app.app_context():
+        drifted = reconcile_status_counts(fix=False)
+
+    results = {
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        'python': sys.version.split()[0],
+        'database': database_url.split(':', 1)[0],
+        'config': {k: v for k, v in vars(args).items() if k not in ('json_path', 'database_url')},
+        'dashboard': {'count_queries': counting, 'rollup': reading},
+        'counts': {'count_queries': counted, 'rollup': read},
+        'writes': writes,
+        'write_errors': len(errors),
+        'drifted': [list(row) for row in drifted],
+    }
+    print(f"Dashboard counts over {args.tickets} tickets: 4 COUNT queries p50 {counting['p50_ms']:.2f}ms, "
+          f"rollup p50 {reading['p50_ms']:.3f}ms")
+    if writes:
+        print(f"Status changes from {args.writers} writer(s): p50 {writes['p50_ms']:.2f}ms p95 {writes['p95_ms']:.2f}ms "
+              f"({len(errors)} failed)")
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.json_path}")
+
+    failures = []
+    if counted != read:
+        failures.append(f'rollup {read} != COUNT queries {counted} after seeding')
+    failures += [f'{status}: counter {recorded}, actual {actual}' for status, recorded, actual in drifted]
+    if failures:
+        print('FAILED: ' + '; '.join(failures), file=sys.stderr)
+        sys.exit(1)
+    return results
+
+
+if __name__ == '__main__':
+    main()
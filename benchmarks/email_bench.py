@@ -0,0 +1,253 @@
+"""End-to-end email throughput and latency against a local SMTP sink.
+
+Starts benchmarks.smtp_sink, points the real app's Flask-Mail settings at it
+and drives the app through its HTTP routes against a throw-away SQLite
+database:
+
+    creation  N tickets created by a seeded user (creation + first approval emails)
+    approval  every approval level of those tickets approved through the emailed
+              links (update, next-level and assignment emails)
+
+The expected notifications are derived from the resulting approvals and
+assignments. The run fails (exit status 1) unless every one of them reaches
+the sink, even with injected relay latency, 451 failures and dropped
+connections.
+
+Usage:
+
+    python -m benchmarks.email_bench --tickets 200 --latency 0.02 \\
+        --connect-latency 0.1 --failure-rate 0.05 --json results.json
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+from datetime import datetime
+from collections import defaultdict, Counter
+
+from benchmarks.smtp_sink import SMTPSink
+from benchmarks.harness import latency_summary
+
+CREATOR_EMAIL = 'thbsaitest2@gmail.com'
+CREATOR_PASSWORD = 'password123'
+
+# Phrasings that the keyword classifier routes to the seeded categories
+DESCRIPTIONS = (
+    'Please install Microsoft Office on laptop {i} for the finance team',
+    'My timesheet for week {i} has the wrong hours, please correct it',
+    'Need a new monitor and keyboard for workstation {i}',
+    'Request access to the shared drive folder project-{i}',
+    'Travel authorization for client visit number {i} next month',
+)
+
+
+def _last_ticket_id(creator_id):
+    from models import Ticket
+
+    return Ticket.query.filter_by(created_by=creator_id).order_by(Ticket.id.desc()).first().id
+
+
+def _expected_notifications(ticket_ids, created_at, approved_at):
+    """[(recipient, subject, triggered_at, phase)] for every email the flows should have produced"""
+    from models import Ticket, Approval
+
+    expected = []
+    for ticket in Ticket.query.filter(Ticket.id.in_(ticket_ids)).all():
+        tid = ticket.id
+        expected.append((ticket.creator.email, f'Ticket Created Successfully - #{tid}', created_at[tid], 'creation'))
+        approvals = Approval.query.filter_by(ticket_id=tid).order_by(Approval.approval_level).all()
+        for approval in approvals:
+            level = approval.approval_level
+            if approval.status in ('Pending', 'Approved'):
+                if level == 1:
+                    expected.append((approval.approver_email, f'Ticket Approval Request - #{tid}', created_at[tid], 'creation'))
+                else:
+                    expected.append((approval.approver_email, f'Ticket Approval Request - #{tid}', approved_at[(tid, level - 1)], 'approval'))
+            if approval.status == 'Approved':
+                expected.append((ticket.creator.email, f'Ticket #{tid} - Approval Update', approved_at[(tid, level)], 'approval'))
+        if ticket.assignee and approvals:
+            expected.append((ticket.assignee.email, f'New Ticket Assigned - #{tid}', approved_at[(tid, approvals[-1].approval_level)], 'approval'))
+    return expected
+
+
+def _match(expected, messages):
+    """Pair expected notifications with arrivals per (recipient, subject) in order; returns (latencies by phase, missing, unexpected)"""
+    arrivals = defaultdict(list)
+    for message in messages:
+        recipient = message.rcpt_tos[0].lower() if message.rcpt_tos else ''
+        arrivals[(recipient, message.subject)].append(message.received_at)
+    wanted = defaultdict(list)
+    for recipient, subject, triggered_at, phase in expected:
+        wanted[(recipient.lower(), subject)].append((triggered_at, phase))
+
+    latencies, missing, unexpected = defaultdict(list), Counter(), Counter()
+    for key, triggers in wanted.items():
+        received = sorted(arrivals.pop(key, []))
+        for (triggered_at, phase), received_at in zip(sorted(triggers), received):
+            latencies[phase].append(received_at - triggered_at)
+        if len(triggers) > len(received):
+            missing[key] = len(triggers) - len(received)
+        elif len(received) > len(triggers):
+            unexpected[key] = len(received) - len(triggers)
+    for key, received in arrivals.items():
+        unexpected[key] += len(received)
+    return latencies, missing, unexpected
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark notification delivery against a local SMTP sink')
+    parser.add_argument('--tickets', type=int, default=100)
+    parser.add_argument('--flows', nargs='+', choices=('creation', 'approval'), default=['creation', 'approval'])
+    parser.add_argument('--latency', type=float, default=0.01, help='Sink delay per message in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Std-dev of the per-message delay')
+    parser.add_argument('--connect-latency', type=float, default=0.05,
+                        help='Sink delay before the greeting, standing in for TLS and login')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Share of messages answered with 451')
+    parser.add_argument('--disconnect-rate', type=float, default=0.0, help='Share of transactions where the sink drops the connection')
+    parser.add_argument('--workers', type=int, default=2, help='EMAIL_OUTBOX_WORKERS')
+    parser.add_argument('--pool-size', type=int, default=2, help='SMTP_POOL_SIZE')
+    parser.add_argument('--timeout', type=float, default=120, help='Seconds to wait for all messages per phase')
+    parser.add_argument('--verbose', action='store_true', help='Show the application output')
+    parser.add_argument('--json', dest='json_path', help='Write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='email-bench-')
+    sink = SMTPSink(latency=args.latency, jitter=args.jitter, connect_latency=args.connect_latency,
+                    failure_rate=args.failure_rate, disconnect_rate=args.disconnect_rate, seed=1).start()
+    host, port = sink.address
+
+    # app.py and the email modules read their configuration at import time
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'MAIL_SERVER': host,
+        'MAIL_PORT': str(port),
+        'MAIL_USE_TLS': 'False',
+        'MAIL_USE_SSL': 'False',
+        'MAIL_USERNAME': 'bench@example.com',
+        'MAIL_PASSWORD': '',
+        'MAIL_DEFAULT_SENDER': 'bench@example.com',
+        'EMAIL_OUTBOX_WORKERS': str(args.workers),
+        'EMAIL_OUTBOX_POLL_INTERVAL': '0.2',
+        'EMAIL_OUTBOX_BACKOFF_BASE': '0.2',
+        'EMAIL_OUTBOX_BACKOFF_MAX': '2',
+        'EMAIL_OUTBOX_MAX_ATTEMPTS': '50',
+        'EMAIL_DIGEST_WINDOW': '0',
+        'SMTP_POOL_SIZE': str(args.pool_size),
+        'ASYNC_CLASSIFICATION': 'False',
+        'OPENAI_API_KEY': '',
+        'CATEGORY_INDEX_PATH': os.path.join(workdir, 'category_index.pkl'),
+        'LOCAL_MODEL_PATH': os.path.join(workdir, 'no_local_model.pkl'),
+        'JINJA_BYTECODE_CACHE_DIR': os.path.join(workdir, 'jinja_cache'),
+    })
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+
+    results = {
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        'python': sys.version.split()[0],
+        'config': {k: v for k, v in vars(args).items() if k not in ('json_path', 'verbose')},
+        'phases': {},
+    }
+    ok = True
+    try:
+        with quiet:
+            import logging
+            import app as app_module
+            from models import Approval, User
+            from email_outbox import outbox_dispatcher
+            logging.getLogger().setLevel(logging.WARNING)
+            for name in ('ai_classifier', 'email_outbox', 'smtp_pool'):
+                logging.getLogger(name).setLevel(logging.CRITICAL)
+
+            app = app_module.app
+            client = app.test_client()
+            client.post('/login', data={'email': CREATOR_EMAIL, 'password': CREATOR_PASSWORD})
+            with app.app_context():
+                creator_id = User.query.filter_by(email=CREATOR_EMAIL).first().id
+
+            ticket_ids, created_at, approved_at = [], {}, {}
+            request_latencies = defaultdict(list)
+            for phase in ('creation', 'approval'):
+                if phase not in args.flows:
+                    continue
+                phase_started = time.perf_counter()
+                if phase == 'creation':
+                    for i in range(args.tickets):
+                        started = time.perf_counter()
+                        client.post('/user/create-ticket', data={'description': DESCRIPTIONS[i % len(DESCRIPTIONS)].format(i=i)})
+                        request_latencies[phase].append(time.perf_counter() - started)
+                        with app.app_context():
+                            ticket_id = _last_ticket_id(creator_id)
+                        ticket_ids.append(ticket_id)
+                        created_at[ticket_id] = started
+                else:
+                    # One level at a time across all tickets, as approvers work through their inboxes
+                    while True:
+                        with app.app_context():
+                            pending = Approval.query.filter(Approval.ticket_id.in_(ticket_ids), Approval.status == 'Pending').all()
+                            links = [(a.ticket_id, a.approval_level,
+                                      app_module.serializer.dumps({'approval_id': a.id, 'ticket_id': a.ticket_id}, salt='approval-token'))
+                                     for a in pending]
+                        if not links:
+                            break
+                        for ticket_id, level, token in links:
+                            started = time.perf_counter()
+                            client.post(f'/approve/{token}/approve', data={'comment': ''})
+                            request_latencies[phase].append(time.perf_counter() - started)
+                            approved_at[(ticket_id, level)] = started
+
+                with app.app_context():
+                    expected = _expected_notifications(ticket_ids, created_at, approved_at)
+                arrived = sink.wait_for(len(expected), args.timeout)
+                time.sleep(0.5)  # let stragglers and duplicates land before comparing
+                latencies, missing, unexpected = _match(expected, list(sink.messages))
+                phase_latencies = latencies.get(phase, [])
+                elapsed = (max(m.received_at for m in sink.messages) - phase_started) if sink.messages else 0.0
+                results['phases'][phase] = {
+                    'requests': latency_summary(request_latencies[phase], sum(request_latencies[phase])),
+                    'notifications': len(phase_latencies),
+                    'messages_per_second': round(len(phase_latencies) / elapsed, 2) if elapsed else None,
+                    'end_to_end': latency_summary(phase_latencies, elapsed),
+                    'missing': sum(missing.values()),
+                    'duplicates': sum(unexpected.values()),
+                }
+                if not arrived or missing:
+                    ok = False
+                    results['phases'][phase]['missing_examples'] = [f'{r}: {s}' for (r, s) in list(missing)[:10]]
+
+            with app.app_context():
+                results['outbox'] = outbox_dispatcher.stats()
+    finally:
+        sink.stop()
+
+    results['sink'] = {
+        'connections': sink.connections,
+        'messages': len(sink.messages),
+        'injected_failures': sink.injected_failures,
+        'injected_disconnects': sink.injected_disconnects,
+    }
+    for phase, summary in results['phases'].items():
+        e2e, req = summary['end_to_end'], summary['requests']
+        print(f"{phase:>9}: {summary['notifications']:5d} emails  {summary['messages_per_second'] or 0:8.1f} msg/s  "
+              f"e2e p50 {e2e['p50_ms']:8.1f}ms p95 {e2e['p95_ms']:8.1f}ms p99 {e2e['p99_ms']:8.1f}ms  "
+              f"request p95 {req['p95_ms']:6.1f}ms  missing {summary['missing']}  duplicates {summary['duplicates']}")
+    smtp = results['outbox']['smtp']
+    print(f"     smtp: {smtp['connections_opened']} connections, {smtp['messages_per_connection']} msgs/connection, "
+          f"handshake avg {smtp['handshake_ms_avg']}ms, {smtp['reconnects']} reconnects; "
+          f"sink saw {sink.injected_failures} injected failures, {sink.injected_disconnects} drops")
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.json_path}")
+    if not ok:
+        print('FAILED: not every expected notification reached the sink', file=sys.stderr)
+        sys.exit(1)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Rendering cost of the notification email templates.
+
+Measures template load time for a fresh worker with and without the Jinja
+bytecode cache, then renders a bulk notification run (HTML + plain text for
+every email kind) and reports per-render latency and renders per second.
+
+Usage:
+
+    python -m benchmarks.email_render_bench --count 5000 --json results.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from datetime import datetime
+from flask import Flask
+from jinja2 import FileSystemBytecodeCache
+
+from benchmarks.harness import latency_summary
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMPLATE_DIR = os.path.join(ROOT, 'templates')
+EMAIL_KINDS = ('approval_request', 'assignment', 'ticket_created', 'approval_update')
+
+
+def _context(kind, i):
+    description = f'Please install Microsoft Office <v365> & Teams on laptop LT-{i:05d}; needed for the client demo on Friday'
+    context = {
+        'ticket_id': i,
+        'description': description,
+        'category_name': 'Software Installation',
+        'creator_name': 'John Employee',
+    }
+    if kind == 'approval_request':
+        context.update(approve_url=f'https://tickets.example.com/approve/token{i}/approve',
+                       reject_url=f'https://tickets.example.com/approve/token{i}/reject')
+    elif kind == 'assignment':
+        context.update(team_member_name='Alice Support')
+    elif kind == 'approval_update':
+        context.update(approver_name='Sarah Employee', approver_role='Team Lead',
+                       approval_level=1 + i % 2, total_levels=2, comment='Approved, go ahead' if i % 3 else None)
+    return context
+
+
+def _make_app(bytecode_dir=None):
+    app = Flask('benchmarks', template_folder=TEMPLATE_DIR)
+    if bytecode_dir:
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(bytecode_dir)
+    return app
+
+
+def _load_all(app):
+    started = time.perf_counter()
+    for kind in EMAIL_KINDS:
+        app.jinja_env.get_template(f'email/{kind}.html')
+        app.jinja_env.get_template(f'email/{kind}.txt')
+    return time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark email template rendering')
+    parser.add_argument('--count', type=int, default=2000, help='Notifications rendered per email kind')
+    parser.add_argument('--json', dest='json_path', help='Write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    from email_service import render_email
+
+    bytecode_dir = tempfile.mkdtemp(prefix='email-render-bench-')
+    results = {
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        'python': sys.version.split()[0],
+        'config': {'count': args.count},
+        'template_load_ms': {},
+        'render': {},
+    }
+
+    results['template_load_ms']['no_bytecode_cache'] = round(_load_all(_make_app()) * 1000, 3)
+    _load_all(_make_app(bytecode_dir))
+    results['template_load_ms']['warm_bytecode_cache'] = round(_load_all(_make_app(bytecode_dir)) * 1000, 3)
+    print(f"template load: {results['template_load_ms']['no_bytecode_cache']:.2f}ms compiled, "
+          f"{results['template_load_ms']['warm_bytecode_cache']:.2f}ms from bytecode cache")
+
+    app = _make_app(bytecode_dir)
+    with app.app_context():
+        all_latencies = []
+        started_all = time.perf_counter()
+        for kind in EMAIL_KINDS:
+            latencies = []
+            started = time.perf_counter()
+            for i in range(args.count):
+                context = _context(kind, i)
+                call_started = time.perf_counter()
+                render_email(kind, **context)
+                latencies.append(time.perf_counter() - call_started)
+            summary = latency_summary(latencies, time.perf_counter() - started)
+            results['render'][kind] = summary
+            all_latencies.extend(latencies)
+            print(f"{kind:>17}: {summary['per_second']:10.1f} emails/s  p50 {summary['p50_ms']:.3f}ms  "
+                  f"p95 {summary['p95_ms']:.3f}ms  p99 {summary['p99_ms']:.3f}ms")
+        results['render']['all'] = latency_summary(all_latencies, time.perf_counter() - started_all)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.json_path}")
+    return results
+
+
+if __name__ == '__main__':
+    main()
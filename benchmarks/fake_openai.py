@@ -0,0 +1,139 @@
+"""Local stand-in for the OpenAI chat completions endpoint.
+
+Answers just enough of the API for ai_classifier: it reads the category list
+from the prompt and picks the category whose keywords overlap most with each
+ticket. Latency and error rate are tunable so brownouts can be simulated.
+"""
+import re
+import json
+import time
+import random
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+_category_line_re = re.compile(r'^- (?P<name>[^:]+): .*\(Keywords: (?P<keywords>.*)\)$')
+_numbered_line_re = re.compile(r'^\d+\. (?P<text>.*)$')
+
+
+def _parse_categories(prompt):
+    categories = []
+    for line in prompt.splitlines():
+        match = _category_line_re.match(line.strip())
+        if match:
+            keywords = {kw.strip().lower() for kw in match.group('keywords').split(',') if kw.strip()}
+            categories.append((match.group('name').strip(), keywords))
+    return categories
+
+
+def _pick(categories, text):
+    words = set(re.findall(r'\w+', text.lower()))
+    best_name, best_score = categories[0][0], -1
+    for name, keywords in categories:
+        score = len(words & keywords)
+        if score > best_score:
+            best_name, best_score = name, score
+    return best_name
+
+
+class FakeOpenAIServer:
+    """Threaded HTTP server answering POST /v1/chat/completions"""
+
+    def __init__(self, latency=0.05, jitter=0.0, error_rate=0.0, host='127.0.0.1', port=0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-openai', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _next_delay_and_failure(self):
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self._random.gauss(self.latency, self.jitter)) if self.jitter else self.latency
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+            return delay, failed
+
+    def _answer(self, payload):
+        messages = payload.get('messages', [])
+        system = next((m['content'] for m in messages if m.get('role') == 'system'), '')
+        prompt = next((m['content'] for m in reversed(messages) if m.get('role') == 'user'), '')
+        categories = _parse_categories(prompt)
+        if not categories:
+            return 'Unknown'
+
+        if 'JSON array' in system:
+            tickets = prompt.split('Ticket descriptions:', 1)[-1]
+            texts = [m.group('text') for m in map(_numbered_line_re.match, tickets.splitlines()) if m]
+            return json.dumps([_pick(categories, text) for text in texts])
+        description = prompt.split('Ticket description:', 1)[-1]
+        return _pick(categories, description)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status, body):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length) or b'{}')
+                delay, failed = server._next_delay_and_failure()
+                time.sleep(delay)
+
+                if not self.path.endswith('/chat/completions'):
+                    self._send_json(404, {'error': {'message': f'Unknown path {self.path}', 'type': 'invalid_request_error'}})
+                elif failed:
+                    self._send_json(500, {'error': {'message': 'Injected failure', 'type': 'server_error'}})
+                else:
+                    self._send_json(200, {
+                        'id': f'chatcmpl-fake-{server.requests}',
+                        'object': 'chat.completion',
+                        'created': int(time.time()),
+                        'model': payload.get('model', 'gpt-4o-mini'),
+                        'choices': [{
+                            'index': 0,
+                            'finish_reason': 'stop',
+                            'message': {'role': 'assistant', 'content': server._answer(payload)},
+                        }],
+                        'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+                    })
+
+        return Handler
@@ -0,0 +1,93 @@
+"""Shared helpers for the benchmark scripts."""
+import math
+import random
+import statistics
+from flask import Flask
+from models import db, Category
+
+FILLER_WORDS = (
+    'please', 'help', 'urgent', 'today', 'team', 'issue', 'request', 'asap', 'since', 'morning',
+    'again', 'office', 'colleague', 'working', 'need', 'problem', 'update', 'still', 'after', 'week',
+)
+
+
+def create_bench_app(database_uri):
+    """Minimal Flask app bound to the shared SQLAlchemy instance, without routes or seeding"""
+    app = Flask('benchmarks')
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def _word(rng, length=7):
+    return ''.join(rng.choice('bcdfghjklmnpqrstvwxz') + rng.choice('aeiou') for _ in range(length // 2 + 1))
+
+
+def seed_synthetic_categories(count, keywords_per_category=8, seed=42):
+    """Insert `count` categories with distinct synthetic keywords; returns [(name, [keywords])]"""
+    rng = random.Random(seed)
+    used = set()
+    categories = []
+    for i in range(1, count + 1):
+        keywords = []
+        while len(keywords) < keywords_per_category:
+            word = _word(rng)
+            if word not in used:
+                used.add(word)
+                keywords.append(word)
+        name = f'Category {i:03d}'
+        db.session.add(Category(
+            name=name,
+            description=f'Requests about {" ".join(keywords[:3])}',
+            keywords=', '.join(keywords),
+            approvers=f'approver{i}@example.com:Team Lead:Approver {i}'
+        ))
+        categories.append((name, keywords))
+    db.session.commit()
+    return categories
+
+
+def generate_tickets(categories, count, keyword_rate=0.8, seed=7):
+    """Synthetic (description, expected category name) pairs.
+
+    With probability `keyword_rate` a ticket mentions its category keywords
+    directly; otherwise it only shares words with the category description,
+    which exercises the TF-IDF fallback.
+    """
+    rng = random.Random(seed)
+    tickets = []
+    for _ in range(count):
+        name, keywords = rng.choice(categories)
+        if rng.random() < keyword_rate:
+            topical = rng.sample(keywords, k=min(len(keywords), rng.randint(1, 3)))
+        else:
+            topical = rng.sample(keywords[:3], k=1)
+        words = topical + rng.sample(FILLER_WORDS, k=rng.randint(4, 10))
+        rng.shuffle(words)
+        tickets.append((' '.join(words), name))
+    return tickets
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+def latency_summary(latencies, elapsed):
+    """p50/p95/p99 in milliseconds plus throughput for per-call latencies in seconds"""
+    ordered = sorted(latencies)
+    return {
+        'calls': len(ordered),
+        'elapsed_seconds': round(elapsed, 4),
+        'per_second': round(len(ordered) / elapsed, 2) if elapsed else None,
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3) if ordered else 0.0,
+        'p50_ms': round(percentile(ordered, 50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 99) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3) if ordered else 0.0,
+    }
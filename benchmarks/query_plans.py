@@ -0,0 +1,182 @@
+"""Query plans and latency of the hot query paths before and after migration 2.
+
+Builds a database at the pre-index schema (current tables with the
+composite indexes from migration 2 dropped), fills it with synthetic
+tickets, approvals and history, then for each query the app runs on its
+dashboards, approval links and ticket pages records the query plan and
+the median latency. It then applies the migrations with
+migrations.upgrade_database() and measures again.
+
+Usage:
+
+    python -m benchmarks.query_plans --tickets 50000 --json plans.json
+    python -m benchmarks.query_plans --database-url postgresql://localhost/tickets_bench
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert
+from benchmarks.harness import create_bench_app
+
+STATUSES = ('Pending Approval', 'Approved', 'Assigned', 'In Progress', 'Completed', 'Rejected', 'Cancelled')
+STATUS_WEIGHTS = (10, 2, 10, 8, 60, 5, 5)
+
+
+def _seed(tickets, users, members, seed=11):
+    from models import db, User, Category, TeamMember, Ticket, Approval, TicketHistory
+
+    rng = random.Random(seed)
+    category = Category(name='Bench Category', keywords='bench', approvers='lead@example.com:Lead:Lead')
+    db.session.add(category)
+    db.session.flush()
+    db.session.execute(insert(User), [
+        {'name': f'User {i}', 'email': f'user{i}@example.com', 'password': 'x', 'is_admin': False, 'must_change_password': False}
+        for i in range(users)
+    ])
+    db.session.execute(insert(TeamMember), [
+        {'name': f'Member {i}', 'email': f'member{i}@example.com', 'category_id': category.id, 'is_available': True}
+        for i in range(members)
+    ])
+    user_ids = [row[0] for row in db.session.query(User.id).all()]
+    member_ids = [row[0] for row in db.session.query(TeamMember.id).all()]
+
+    started = datetime.utcnow() - timedelta(days=365)
+    ticket_rows, approval_rows, history_rows = [], [], []
+    for i in range(1, tickets + 1):
+        status = rng.choices(STATUSES, STATUS_WEIGHTS)[0]
+        created_at = started + timedelta(minutes=i * 10)
+        assigned = rng.choice(member_ids) if status in ('Assigned', 'In Progress', 'Completed') else None
+        ticket_rows.append({'id': i, 'description': f'Synthetic ticket {i}', 'category_id': category.id,
+                            'created_by': rng.choice(user_ids), 'assigned_to': assigned, 'status': status,
+                            'created_at': created_at, 'updated_at': created_at})
+        for level in (1, 2):
+            approval_status = 'Pending' if status == 'Pending Approval' and level == 1 else (
+                'Waiting' if status == 'Pending Approval' else 'Approved')
+            approval_rows.append({'ticket_id': i, 'approver_email': f'approver{rng.randrange(50)}@example.com',
+                                  'approval_level': level, 'status': approval_status, 'created_at': created_at})
+        for step in range(3):
+            history_rows.append({'ticket_id': i, 'action': 'Status Changed', 'details': f'step {step}',
+                                 'timestamp': created_at + timedelta(minutes=step)})
+    for model, rows in ((Ticket, ticket_rows), (Approval, approval_rows), (TicketHistory, history_rows)):
+        for start in range(0, len(rows), 5000):
+            db.session.execute(insert(model), rows[start:start + 5000])
+    db.session.commit()
+
+
+def _queries():
+    """(name, statement) for the queries behind the dashboards, approval links and ticket pages"""
+    from models import db, Ticket, Approval, TicketHistory, TeamMember
+    from ticket_assignment import ACTIVE_STATUSES
+
+    return [
+        ('user dashboard: own tickets',
+         db.select(Ticket).where(Ticket.created_by == 7).order_by(Ticket.created_at.desc())),
+        ('user dashboard: pending approvals',
+         db.select(Ticket).join(Approval).where(Approval.approver_email == 'approver7@example.com',
+                                                Approval.status == 'Pending').order_by(Ticket.created_at.desc())),
+        ('team dashboard: assigned tickets',
+         db.select(Ticket).where(Ticket.assigned_to == 3).order_by(Ticket.created_at.desc())),
+        ('active ticket count per member',
+         db.select(func.count(Ticket.id)).where(Ticket.assigned_to == 3, Ticket.status.in_(ACTIVE_STATUSES))),
+        ('admin: tickets by status',
+         db.select(Ticket).where(Ticket.status == 'Pending Approval').order_by(Ticket.created_at.desc())),
+        ('admin: status count',
+         db.select(func.count(Ticket.id)).where(Ticket.status == 'In Progress')),
+        ('approval link: next level',
+         db.select(Approval).where(Approval.ticket_id == 1234, Approval.approval_level == 2)),
+        ('ticket page: history',
+         db.select(TicketHistory).where(TicketHistory.ticket_id == 1234).order_by(TicketHistory.timestamp.desc())),
+        ('login: team member by email',
+         db.select(TeamMember).where(TeamMember.email == 'member3@example.com')),
+    ]
+
+
+def _plan(connection, statement):
+    sql = str(statement.compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True}))
+    if connection.dialect.name == 'sqlite':
+        return [row[3] for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}')]
+    return [row[0] for row in connection.exec_driver_sql(f'EXPLAIN {sql}')]
+
+
+def _measure(repeat):
+    from models import db
+
+    results = {}
+    with db.engine.connect() as connection:
+        connection.exec_driver_sql('ANALYZE')
+        for name, statement in _queries():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                connection.execute(statement).fetchall()
+                timings.append(time.perf_counter() - started)
+            results[name] = {'plan': _plan(connection, statement), 'median_ms': round(statistics.median(timings) * 1000, 3)}
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Query plans of the hot paths before and after the index migration')
+    parser.add_argument('--tickets', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--members', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=20, help='Runs per query; the median is reported')
+    parser.add_argument('--database-url', help='Database to run against (default: a throw-away SQLite file); its tables are dropped')
+    parser.add_argument('--json', dest='json_path', help='Write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='query-plans-'), 'plans.db')}"
+    app = create_bench_app(database_url)
+    with app.app_context():
+        from models import db
+        from migrations import upgrade_database, schema_migrations
+
+        # Roll the schema back to before migration 2
+        with db.engine.begin() as connection:
+            if args.database_url:
+                db.metadata.drop_all(connection)
+                db.metadata.create_all(connection)
+            for table in ('tickets', 'approvals', 'ticket_history', 'team_members'):
+                for index in db.metadata.tables[table].indexes:
+                    index.drop(connection, checkfirst=True)
+            schema_migrations.drop(connection, checkfirst=True)
+        _seed(args.tickets, args.users, args.members)
+
+        before = _measure(args.repeat)
+        started = time.perf_counter()
+        applied = upgrade_database()
+        migration_seconds = time.perf_counter() - started
+        after = _measure(args.repeat)
+
+    results = {
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        'python': sys.version.split()[0],
+        'database': database_url.split(':', 1)[0],
+        'config': {k: v for k, v in vars(args).items() if k not in ('json_path', 'database_url')},
+        'migrations_applied': [f'{version}: {name}' for version, name in applied],
+        'migration_seconds': round(migration_seconds, 3),
+        'queries': {name: {'before': before[name], 'after': after[name]} for name in before},
+    }
+    print(f"Applied {len(applied)} migration(s) in {migration_seconds:.2f}s over {args.tickets} tickets")
+    for name, result in results['queries'].items():
+        b, a = result['before'], result['after']
+        speedup = b['median_ms'] / a['median_ms'] if a['median_ms'] else float('inf')
+        print(f"\n{name}: {b['median_ms']:.3f}ms -> {a['median_ms']:.3f}ms ({speedup:.1f}x)")
+        print('  before: ' + ' | '.join(b['plan']))
+        print('  after:  ' + ' | '.join(a['plan']))
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote {args.json_path}")
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""Ticket search latency: full-text index vs. the LIKE fallback.
+
+Seeds synthetic tickets (descriptions from the classifier benchmark
+generator, a resolution on the closed ones, and history entries), builds the
+index the way migration 5 does, then runs rare-term, common-term, two-term
+and prefix queries through ticket_search.search_tickets() on the full-text
+backend and on the LIKE fallback. It also times ticket and history inserts
+with the sync triggers in place.
+
+The run fails (exit status 1) if a ticket written after the index was built
+cannot be found, which means the triggers are not keeping it in sync.
+
+Usage:
+
+    python -m benchmarks.search_bench --tickets 1000000 --like-repeat 1 --json search.json
+    python -m benchmarks.search_bench --database-url postgresql://localhost/tickets_bench
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+from benchmarks.harness import create_bench_app, seed_synthetic_categories, generate_tickets, latency_summary
+
+
+def _seed(tickets, categories, seed=5):
+    from models import db, User, Category, Ticket, TicketHistory
+
+    rng = random.Random(seed)
+    synthetic = seed_synthetic_categories(categories)
+    category_ids = {category.name: category.id for category in Category.query.all()}
+    creator = User(name='Search Bench', email='search@example.com', password='x', must_change_password=False)
+    db.session.add(creator)
+    db.session.flush()
+
+    started = datetime.utcnow() - timedelta(days=365)
+    for start in range(0, tickets, 10000):
+        generated = generate_tickets(synthetic, min(10000, tickets - start), seed=seed + start)
+        ticket_rows, history_rows = [], []
+        for offset, (description, category_name) in enumerate(generated):
+            ticket_id = start + offset + 1
+            closed = rng.random() < 0.7
+            created_at = started + timedelta(seconds=ticket_id * 30)
+            ticket_rows.append({'id': ticket_id, 'description': description, 'category_id': category_ids[category_name],
+                                'created_by': creator.id, 'status': 'Completed' if closed else 'In Progress',
+                                'resolution_comment': f'Resolved: {description.split()[0]} reconfigured' if closed else None,
+                                'created_at': created_at, 'updated_at': created_at})
+            history_rows.append({'ticket_id': ticket_id, 'action': 'Ticket Created',
+                                 'details': f'Category auto-classified as: {category_name} using keywords', 'timestamp': created_at})
+        db.session.execute(insert(Ticket), ticket_rows)
+        db.session.execute(insert(TicketHistory), history_rows)
+    db.session.commit()
+    return synthetic
+
+
+def _run_queries(queries, repeat):
+    from ticket_search import search_tickets
+
+    results = {}
+    for name, query in queries:
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(repeat):
+            call_started = time.perf_counter()
+            hits, _ = search_tickets(query)
+            latencies.append(time.perf_counter() - call_started)
+        results[name] = dict(latency_summary(latencies, time.perf_counter() - started), hits=len(hits))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Full-text ticket search vs. the LIKE fallback')
+    parser.add_argument('--tickets', type=int, default=200000)
+    parser.add_argument('--categories', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=50, help='Runs per query on the full-text backend')
+    parser.add_argument('--like-repeat', type=int, default=3, help='Runs per query on the LIKE fallback')
+    parser.add_argument('--writes', type=int, default=500, help='Tickets (each with a history entry) inserted after the build')
+    parser.add_argument('--database-url', help='Database to run against (default: a throw-away SQLite file); its tables are dropped')
+    parser.add_argument('--json', dest='json_path', help='Write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='search-bench-'), 'search.db')}"
+    app = create_bench_app(database_url)
+    with app.app_context():
+        from models import db, Ticket, TicketHistory
+        import ticket_search
+
+        if args.database_url:
+            db.drop_all()
+            db.create_all()
+        synthetic = _seed(args.tickets, args.categories)
+
+        started = time.perf_counter()
+        with db.engine.begin() as connection:
+            backend = ticket_search.create_search_index(connection)
+        build_seconds = time.perf_counter() - started
+
+        keywords = synthetic[0][1]
+        queries = [
+            ('rare term', keywords[3]),
+            ('common term', 'please'),
+            ('two terms', f'{keywords[0]} urgent'),
+            ('prefix', keywords[1][:4]),
+            ('resolution', 'reconfigured'),
+        ]
+        indexed = _run_queries(queries, args.repeat)
+        ticket_search._backend = 'like'
+        like = _run_queries(queries, args.like_repeat)
+        ticket_search._backend = None
+
+        write_latencies = []
+        started = time.perf_counter()
+        for i in range(args.writes):
+            write_started = time.perf_counter()
+            ticket = Ticket(description=f'Synthetic write {i} needs a zyxwordprobe{i} license', created_by=1, status='Classifying')
+            db.session.add(ticket)
+            db.session.flush()
+            db.session.add(TicketHistory(ticket_id=ticket.id, action='Ticket Created', details=f'historyprobe{i} queued'))
+            db.session.commit()
+            write_latencies.append(time.perf_counter() - write_started)
+        writes = latency_summary(write_latencies, time.perf_counter() - started)
+        last = args.writes - 1
+        missing = [probe for probe in (f'zyxwordprobe{last}', f'historyprobe{last}')
+                   if args.writes and not ticket_search.search_tickets(probe)[0]]
+
+    results = {
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        'python': sys.version.split()[0],
+        'database': database_url.split(':', 1)[0],
+        'config': {k: v for k, v in vars(args).items() if k not in ('json_path', 'database_url')},
+        'backend': backend,
+        'build_seconds': round(build_seconds, 3),
+        'queries': {name: {backend: indexed[name], 'like': like[name]} for name, _ in queries},
+        'writes': writes,
+        'missing_after_write': missing,
+    }
+    print(f"Built the {backend} index over {args.tickets} tickets in {build_seconds:.2f}s")
+    for name, query in queries:
+        fast, slow = indexed[name], like[name]
+        print(f"{name} ({query!r}): {backend} p50 {fast['p50_ms']:.2f}ms p95 {fast['p95_ms']:.2f}ms | "
+              f"like p50 {slow['p50_ms']:.2f}ms ({fast['hits']} / {slow['hits']} hits on page 1)")
+    print(f"Ticket + history insert with sync triggers: p50 {writes['p50_ms']:.2f}ms p95 {writes['p95_ms']:.2f}ms")
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.json_path}")
+
+    if missing:
+        print(f"FAILED: search does not find {', '.join(missing)} after writing it", file=sys.stderr)
+        sys.exit(1)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""Local SMTP server that accepts and records every message.
+
+Speaks enough ESMTP for smtplib/Flask-Mail without TLS or AUTH. Connection
+setup, per-message latency, temporary failures (451 after DATA) and dropped
+connections can be injected to model a slow or flaky relay.
+"""
+import time
+import random
+import threading
+import socketserver
+from email import message_from_bytes
+from email.header import decode_header, make_header
+
+
+class SinkMessage:
+    def __init__(self, mail_from, rcpt_tos, data, received_at):
+        self.mail_from = mail_from
+        self.rcpt_tos = rcpt_tos
+        self.data = data
+        self.received_at = received_at
+        parsed = message_from_bytes(data)
+        self.subject = str(make_header(decode_header(parsed.get('Subject', ''))))
+
+
+class SMTPSink:
+    """Threaded SMTP sink; messages land in .messages with a perf_counter() receive time"""
+
+    def __init__(self, latency=0.0, jitter=0.0, connect_latency=0.0, failure_rate=0.0,
+                 disconnect_rate=0.0, host='127.0.0.1', port=0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.connect_latency = connect_latency
+        self.failure_rate = failure_rate
+        self.disconnect_rate = disconnect_rate
+        self.messages = []
+        self.connections = 0
+        self.injected_failures = 0
+        self.injected_disconnects = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._arrived = threading.Condition(self._lock)
+        self._server = socketserver.ThreadingTCPServer((host, port), self._handler_class(), bind_and_activate=False)
+        self._server.allow_reuse_address = True
+        self._server.daemon_threads = True
+        self._server.server_bind()
+        self._server.server_activate()
+        self._thread = None
+
+    @property
+    def address(self):
+        return self._server.server_address[:2]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='smtp-sink', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def wait_for(self, count, timeout):
+        """Block until at least `count` messages have arrived; returns whether they did"""
+        deadline = time.monotonic() + timeout
+        with self._arrived:
+            while len(self.messages) < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._arrived.wait(remaining)
+            return True
+
+    def _roll(self, rate):
+        with self._lock:
+            return self._random.random() < rate
+
+    def _delay(self):
+        with self._lock:
+            if self.jitter:
+                return max(0.0, self._random.gauss(self.latency, self.jitter))
+            return self.latency
+
+    def _record(self, mail_from, rcpt_tos, data):
+        with self._arrived:
+            self.messages.append(SinkMessage(mail_from, rcpt_tos, data, time.perf_counter()))
+            self._arrived.notify_all()
+
+    def _handler_class(self):
+        sink = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            disable_nagle_algorithm = True
+
+            def reply(self, line):
+                self.wfile.write(line.encode('ascii') + b'\r\n')
+
+            def handle(self):
+                with sink._lock:
+                    sink.connections += 1
+                if sink.connect_latency:
+                    time.sleep(sink.connect_latency)
+                self.reply('220 smtp-sink ESMTP ready')
+                mail_from, rcpt_tos = None, []
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    command = line.decode('utf-8', 'replace').strip()
+                    verb = command.split(' ', 1)[0].upper()
+                    if verb == 'EHLO':
+                        self.reply('250-smtp-sink')
+                        self.reply('250-8BITMIME')
+                        self.reply('250 SMTPUTF8')
+                    elif verb == 'HELO':
+                        self.reply('250 smtp-sink')
+                    elif verb == 'MAIL':
+                        if sink._roll(sink.disconnect_rate):
+                            with sink._lock:
+                                sink.injected_disconnects += 1
+                            return
+                        mail_from, rcpt_tos = command[10:].strip(), []
+                        self.reply('250 OK')
+                    elif verb == 'RCPT':
+                        rcpt_tos.append(command[8:].strip().strip('<>'))
+                        self.reply('250 OK')
+                    elif verb == 'DATA':
+                        self.reply('354 End data with <CR><LF>.<CR><LF>')
+                        data = self._read_data()
+                        if data is None:
+                            return
+                        time.sleep(sink._delay())
+                        if sink._roll(sink.failure_rate):
+                            with sink._lock:
+                                sink.injected_failures += 1
+                            self.reply('451 4.3.0 Injected temporary failure')
+                        else:
+                            sink._record(mail_from, rcpt_tos, data)
+                            self.reply('250 OK: queued')
+                        mail_from, rcpt_tos = None, []
+                    elif verb == 'RSET':
+                        mail_from, rcpt_tos = None, []
+                        self.reply('250 OK')
+                    elif verb == 'NOOP':
+                        self.reply('250 OK')
+                    elif verb == 'QUIT':
+                        self.reply('221 Bye')
+                        return
+                    else:
+                        self.reply('502 Command not implemented')
+
+            def _read_data(self):
+                lines = []
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return None
+                    if line in (b'.\r\n', b'.\n'):
+                        return b''.join(lines)
+                    lines.append(line[1:] if line.startswith(b'..') else line)
+
+        return Handler
@@ -0,0 +1,81 @@
+"""Measure how long importing the application modules takes.
+
+Each module is imported in a fresh interpreter with `-X importtime`, so the
+numbers include everything the import pulls in (and, for `app`, database
+initialisation). Usage:
+
+    python -m benchmarks.startup_time [--modules app main] [--runs 3] [--top 15] [--json out.json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr):
+    """Return {module: cumulative_microseconds} from `-X importtime` output"""
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split('|')
+        cumulative[name.strip()] = int(cumulative_us)
+    return cumulative
+
+
+def measure(module):
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        env={**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'}
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return wall, parse_importtime(result.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modules', nargs='+', default=['ai_classifier', 'app', 'main'])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--json', dest='json_path')
+    args = parser.parse_args(argv)
+
+    report = {'python': sys.version.split()[0], 'modules': {}}
+    for module in args.modules:
+        walls, imports = [], {}
+        for _ in range(args.runs):
+            wall, cumulative = measure(module)
+            walls.append(wall)
+            imports = cumulative
+        heaviest = sorted(imports.items(), key=lambda item: item[1], reverse=True)[:args.top]
+        report['modules'][module] = {
+            'wall_seconds_median': round(statistics.median(walls), 4),
+            'wall_seconds_min': round(min(walls), 4),
+            'import_seconds': round(imports.get(module, 0) / 1e6, 4),
+            'heaviest_imports': [{'module': name, 'cumulative_seconds': round(us / 1e6, 4)} for name, us in heaviest],
+        }
+
+        print(f"{module}: median {statistics.median(walls):.3f}s wall over {args.runs} run(s), "
+              f"import {imports.get(module, 0) / 1e6:.3f}s")
+        for name, us in heaviest:
+            print(f"    {us / 1e6:8.3f}s  {name}")
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.json_path}")
+
+
+if __name__ == '__main__':
+    main()
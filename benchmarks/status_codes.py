@@ -0,0 +1,166 @@
+"""String statuses vs. integer status codes (migration 4).
+
+Seeds synthetic tickets and approvals, rewrites the status columns to the
+layout they had before migration 4 (VARCHAR `status` with its composite
+indexes), and measures the size of the status indexes and the latency of
+the status filters the dashboards and the assignment code run. It then
+applies migrations.upgrade_database(), which converts the columns to
+SMALLINT `status_code`, and measures again.
+
+Index sizes come from the dbstat table on SQLite and pg_relation_size on
+Postgres.
+
+Usage:
+
+    python -m benchmarks.status_codes --tickets 200000 --json status_codes.json
+    python -m benchmarks.status_codes --database-url postgresql://localhost/tickets_bench
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import tempfile
+from datetime import datetime
+
+from benchmarks.harness import create_bench_app
+from benchmarks.query_plans import _seed
+
+# (name, SQL with {status} for the status column and {Name} for a status value)
+QUERIES = [
+    ('active ticket count per member',
+     "SELECT count(*) FROM tickets WHERE assigned_to = 3 AND {status} IN ({Assigned}, {In Progress})"),
+    ('admin dashboard: pending count',
+     "SELECT count(*) FROM tickets WHERE {status} = {Pending Approval}"),
+    ('admin dashboard: active count',
+     "SELECT count(*) FROM tickets WHERE {status} IN ({Approved}, {Assigned}, {In Progress})"),
+    ('admin: tickets by status',
+     "SELECT id FROM tickets WHERE {status} = {Completed} ORDER BY created_at DESC"),
+    ('user dashboard: pending approvals',
+     "SELECT ticket_id FROM approvals WHERE approver_email = 'approver7@example.com' AND {status} = {Pending}"),
+]
+
+STATUS_INDEXES = {
+    'tickets': [('ix_tickets_assigned_to_status', 'assigned_to, status'),
+                ('ix_tickets_status_created_at', 'status, created_at')],
+    'approvals': [('ix_approvals_approver_email_status', 'approver_email, status')],
+}
+
+
+def _downgrade(connection):
+    """Put tickets and approvals back to the VARCHAR status layout from before migration 4"""
+    from models import Ticket, Approval
+    from migrations import schema_migrations, MIGRATIONS
+    from ticket_status import TICKET_STATUS_CODES, APPROVAL_STATUS_CODES
+
+    for table, codes in ((Ticket.__table__, TICKET_STATUS_CODES), (Approval.__table__, APPROVAL_STATUS_CODES)):
+        for index in table.indexes:
+            if 'status_code' in index.columns:
+                index.drop(connection)
+        cases = ' '.join(f"WHEN {code} THEN '{name}'" for name, code in codes.items())
+        connection.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN status VARCHAR(50)')
+        connection.exec_driver_sql(f'UPDATE {table.name} SET status = CASE status_code {cases} END, status_code = NULL')
+        for name, columns in STATUS_INDEXES[table.name]:
+            connection.exec_driver_sql(f'CREATE INDEX {name} ON {table.name} ({columns})')
+    # Only migration 4 should run (and be timed) by upgrade_database()
+    schema_migrations.create(connection, checkfirst=True)
+    connection.execute(schema_migrations.delete())
+    connection.execute(schema_migrations.insert(), [
+        {'version': version, 'name': name, 'applied_at': datetime.utcnow()} for version, name, _ in MIGRATIONS if version != 4
+    ])
+
+
+def _index_bytes(connection):
+    from models import Ticket, Approval
+
+    names = {name for indexes in STATUS_INDEXES.values() for name, _ in indexes}
+    names |= {index.name for table in (Ticket.__table__, Approval.__table__)
+              for index in table.indexes if 'status_code' in index.columns}
+    if connection.dialect.name == 'sqlite':
+        rows = connection.exec_driver_sql('SELECT name, SUM(pgsize) FROM dbstat GROUP BY name').all()
+    else:
+        rows = connection.exec_driver_sql(
+            "SELECT indexname, pg_relation_size(indexname::regclass) FROM pg_indexes WHERE tablename IN ('tickets', 'approvals')"
+        ).all()
+    return {name: size for name, size in rows if name in names}
+
+
+def _measure(column, literal, repeat):
+    from models import db
+
+    results = {}
+    with db.engine.connect() as connection:
+        connection.exec_driver_sql('ANALYZE')
+        for name, template in QUERIES:
+            sql = template.replace('{status}', column)
+            for status in ('Pending Approval', 'In Progress', 'Approved', 'Assigned', 'Completed', 'Pending'):
+                sql = sql.replace('{' + status + '}', literal(status))
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                connection.exec_driver_sql(sql).fetchall()
+                timings.append(time.perf_counter() - started)
+            results[name] = round(statistics.median(timings) * 1000, 3)
+        indexes = _index_bytes(connection)
+    return results, indexes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Index size and filter latency of string vs. integer statuses')
+    parser.add_argument('--tickets', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--members', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=20, help='Runs per query; the median is reported')
+    parser.add_argument('--database-url', help='Database to run against (default: a throw-away SQLite file); its tables are dropped')
+    parser.add_argument('--json', dest='json_path', help='Write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='status-codes-'), 'status.db')}"
+    app = create_bench_app(database_url)
+    with app.app_context():
+        from models import db
+        from migrations import upgrade_database
+        from ticket_status import TICKET_STATUS_CODES, APPROVAL_STATUS_CODES
+
+        if args.database_url:
+            db.drop_all()
+            db.create_all()
+        _seed(args.tickets, args.users, args.members)
+        with db.engine.begin() as connection:
+            _downgrade(connection)
+
+        before, before_indexes = _measure('status', lambda status: f"'{status}'", args.repeat)
+        started = time.perf_counter()
+        applied = upgrade_database()
+        migration_seconds = time.perf_counter() - started
+        codes = {**APPROVAL_STATUS_CODES, **TICKET_STATUS_CODES}
+        after, after_indexes = _measure('status_code', lambda status: str(codes[status]), args.repeat)
+
+    results = {
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        'python': sys.version.split()[0],
+        'database': database_url.split(':', 1)[0],
+        'config': {k: v for k, v in vars(args).items() if k not in ('json_path', 'database_url')},
+        'migrations_applied': [f'{version}: {name}' for version, name in applied],
+        'migration_seconds': round(migration_seconds, 3),
+        'index_bytes': {'before': before_indexes, 'after': after_indexes},
+        'queries_ms': {name: {'before': before[name], 'after': after[name]} for name in before},
+    }
+    print(f"Migrated {args.tickets} tickets in {migration_seconds:.2f}s")
+    print(f"Status index bytes: {sum(before_indexes.values())} -> {sum(after_indexes.values())}")
+    for name, size in sorted({**before_indexes, **after_indexes}.items()):
+        print(f"  {name}: {size}")
+    for name, timings in results['queries_ms'].items():
+        speedup = timings['before'] / timings['after'] if timings['after'] else float('inf')
+        print(f"{name}: {timings['before']:.3f}ms -> {timings['after']:.3f}ms ({speedup:.1f}x)")
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote {args.json_path}")
+    return results
+
+
+if __name__ == '__main__':
+    main()
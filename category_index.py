@@ -0,0 +1,216 @@
+import os
+import re
+import time
+import pickle
+import hashlib
+import logging
+import threading
+from models import Category
+from session_hooks import register_commit_hook
+
+logger = logging.getLogger(__name__)
+
+CATEGORY_INDEX_PATH = os.getenv(
+    'CATEGORY_INDEX_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'category_index.pkl')
+)
+CATEGORY_INDEX_TTL = int(os.getenv('CATEGORY_INDEX_TTL', '300'))
+INDEX_FORMAT_VERSION = 2
+
+_index = None
+_index_checked_at = 0.0
+_index_dirty = False
+_index_lock = threading.Lock()
+
+
+def category_fingerprint(categories):
+    """Stable hash of the category fields the classifier depends on"""
+    digest = hashlib.sha256()
+    for cat in categories:
+        digest.update(f"{cat.id}\x1f{cat.name}\x1f{cat.description or ''}\x1f{cat.keywords or ''}\x1e".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class KeywordMatcher:
+    """Single compiled pattern over every category keyword, matched on word boundaries"""
+
+    def __init__(self, categories):
+        self.category_count = len(categories)
+        self.keyword_positions = {}
+        for position, cat in enumerate(categories):
+            for keyword in (cat.keywords or '').split(','):
+                keyword = ' '.join(keyword.lower().split())
+                if not keyword:
+                    continue
+                positions = self.keyword_positions.setdefault(keyword, [])
+                if position not in positions:
+                    positions.append(position)
+
+        self.pattern = None
+        if self.keyword_positions:
+            # Longest keywords first so "office 365" wins over "office" at the same offset
+            alternatives = sorted(self.keyword_positions, key=len, reverse=True)
+            alternation = '|'.join(r'\s+'.join(re.escape(part) for part in kw.split()) for kw in alternatives)
+            self.pattern = re.compile(rf'(?<!\w)(?:{alternation})(?!\w)')
+
+    def scores(self, description):
+        """Number of distinct keywords of each category found in one pass over the description"""
+        scores = [0] * self.category_count
+        if self.pattern is None:
+            return scores
+        matched = {' '.join(m.group(0).split()) for m in self.pattern.finditer(description.lower())}
+        for keyword in matched:
+            for position in self.keyword_positions[keyword]:
+                scores[position] += 1
+        return scores
+
+    def best_match(self, description):
+        """Position of the category with the most keyword hits, or None without any hit"""
+        best_position = None
+        max_matches = 0
+        for position, matches in enumerate(self.scores(description)):
+            if matches > max_matches:
+                max_matches = matches
+                best_position = position
+        return best_position
+
+
+class CategoryIndex:
+    """Keyword matcher and TF-IDF vectors for all categories, built once and reused for every ticket"""
+
+    def __init__(self, categories):
+        self.format_version = INDEX_FORMAT_VERSION
+        self.fingerprint = category_fingerprint(categories)
+        self.category_ids = [cat.id for cat in categories]
+        self.category_names = [cat.name for cat in categories]
+        self.keyword_matcher = KeywordMatcher(categories)
+        self.vectorizer = None
+        self.matrix = None
+
+        category_texts = [f"{cat.name} {cat.description} {cat.keywords or ''}" for cat in categories]
+        if category_texts:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            try:
+                self.vectorizer = TfidfVectorizer(stop_words='english')
+                self.matrix = self.vectorizer.fit_transform(category_texts)
+            except ValueError as e:
+                logger.warning(f"Could not fit TF-IDF category index: {e}")
+                self.vectorizer = None
+                self.matrix = None
+
+    def __len__(self):
+        return len(self.category_ids)
+
+    def similarities(self, description):
+        """Cosine similarity of the description against every category"""
+        if self.vectorizer is None:
+            return None
+        # Rows are L2-normalised by TfidfVectorizer, so the dot product is the cosine similarity
+        vector = self.vectorizer.transform([description])
+        return (vector @ self.matrix.T).toarray()[0]
+
+    def best_match(self, description, threshold=0.1):
+        """Return the id of the most similar category, or None below the threshold"""
+        similarities = self.similarities(description)
+        if similarities is None or not len(similarities):
+            return None
+        best_idx = similarities.argmax()
+        if similarities[best_idx] > threshold:
+            return self.category_ids[best_idx]
+        return None
+
+    def best_matches(self, descriptions, threshold=0.1):
+        """Vectorise a whole batch with one transform and one sparse matrix product"""
+        if self.vectorizer is None or not descriptions:
+            return [None] * len(descriptions)
+        similarities = (self.vectorizer.transform(descriptions) @ self.matrix.T).toarray()
+        best_indices = similarities.argmax(axis=1)
+        return [
+            self.category_ids[best_idx] if row[best_idx] > threshold else None
+            for row, best_idx in zip(similarities, best_indices)
+        ]
+
+    def keyword_match(self, description):
+        """Return the id of the category with the most keyword hits, or None"""
+        position = self.keyword_matcher.best_match(description)
+        return self.category_ids[position] if position is not None else None
+
+    def default_category_id(self):
+        return self.category_ids[0] if self.category_ids else None
+
+    def save(self, path=CATEGORY_INDEX_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=CATEGORY_INDEX_PATH):
+        with open(path, 'rb') as f:
+            index = pickle.load(f)
+        if not isinstance(index, cls) or getattr(index, 'format_version', None) != INDEX_FORMAT_VERSION:
+            raise ValueError(f"{path} does not contain a current CategoryIndex")
+        return index
+
+
+def _load_or_build(categories, path):
+    fingerprint = category_fingerprint(categories)
+    if path and os.path.exists(path):
+        try:
+            index = CategoryIndex.load(path)
+            if index.fingerprint == fingerprint:
+                logger.info(f"Loaded category index from {path}")
+                return index
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable category index at {path}: {e}")
+
+    index = CategoryIndex(categories)
+    logger.info(f"Fitted category index over {len(index)} categories")
+    if path:
+        try:
+            index.save(path)
+        except OSError as e:
+            logger.warning(f"Could not save category index to {path}: {e}")
+    return index
+
+
+def get_category_index(path=CATEGORY_INDEX_PATH):
+    """Return the fitted category index, rebuilding it only when categories changed"""
+    global _index, _index_checked_at, _index_dirty
+
+    with _index_lock:
+        now = time.monotonic()
+        if _index is not None and not _index_dirty and now - _index_checked_at < CATEGORY_INDEX_TTL:
+            return _index
+
+        categories = Category.query.order_by(Category.id).all()
+        if _index is None or _index.fingerprint != category_fingerprint(categories):
+            _index = _load_or_build(categories, path)
+        _index_checked_at = now
+        _index_dirty = False
+        return _index
+
+
+def rebuild_category_index(path=CATEGORY_INDEX_PATH):
+    """Refit the index from the current categories and save it to disk"""
+    global _index, _index_checked_at, _index_dirty
+
+    with _index_lock:
+        categories = Category.query.order_by(Category.id).all()
+        _index = CategoryIndex(categories)
+        if path:
+            _index.save(path)
+        _index_checked_at = time.monotonic()
+        _index_dirty = False
+        return _index
+
+
+def invalidate_category_index():
+    global _index_dirty
+    _index_dirty = True
+
+
+register_commit_hook('category_changed', invalidate_category_index, models=(Category,))
@@ -0,0 +1,96 @@
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+CLASSIFICATION_CACHE_SIZE = int(os.getenv('CLASSIFICATION_CACHE_SIZE', '1024'))
+CLASSIFICATION_CACHE_TTL = int(os.getenv('CLASSIFICATION_CACHE_TTL', '3600'))
+
+# Politeness and filler words that do not change what a ticket is about
+FILLER_WORDS = frozenset({
+    'please', 'pls', 'plz', 'kindly', 'hi', 'hello', 'hey', 'thanks', 'thank', 'thx',
+    'you', 'a', 'an', 'the', 'can', 'could', 'would', 'i', 'we', 'need', 'want', 'to',
+})
+
+_token_re = re.compile(r'\w+')
+
+
+def normalize_description(description):
+    """Lowercase word tokens without filler words, so near-identical tickets share a key"""
+    tokens = [t for t in _token_re.findall(description.lower()) if t not in FILLER_WORDS]
+    return ' '.join(tokens)
+
+
+def description_key(description):
+    return hashlib.sha1(normalize_description(description).encode('utf-8')).hexdigest()
+
+
+class ClassificationCache:
+    """Bounded LRU cache with per-entry TTL for (category_id, classification method) results"""
+
+    def __init__(self, maxsize=CLASSIFICATION_CACHE_SIZE, ttl=CLASSIFICATION_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.fingerprint = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _sync_fingerprint(self, fingerprint):
+        # Results classified against another category set are no longer valid
+        if fingerprint != self.fingerprint:
+            self._entries.clear()
+            self.fingerprint = fingerprint
+
+    def get(self, description, fingerprint):
+        if self.maxsize <= 0:
+            return None
+        key = description_key(description)
+        with self._lock:
+            self._sync_fingerprint(fingerprint)
+            entry = self._entries.get(key)
+            if entry is None or entry[2] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, description, fingerprint, category_id, method):
+        if self.maxsize <= 0:
+            return
+        key = description_key(description)
+        with self._lock:
+            self._sync_fingerprint(fingerprint)
+            self._entries[key] = (category_id, method, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, description):
+        with self._lock:
+            self._entries.pop(description_key(description), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,298 @@
+import os
+import json
+import uuid
+import random
+import logging
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from flask_mail import Message
+from sqlalchemy import func
+from models import db, OutboundEmail
+from session_hooks import register_commit_hook
+from smtp_pool import smtp_pool
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_WORKERS = int(os.getenv('EMAIL_OUTBOX_WORKERS', '1'))
+OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', '20'))
+OUTBOX_POLL_INTERVAL = float(os.getenv('EMAIL_OUTBOX_POLL_INTERVAL', '5'))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', '8'))
+OUTBOX_BACKOFF_BASE = float(os.getenv('EMAIL_OUTBOX_BACKOFF_BASE', '30'))
+OUTBOX_BACKOFF_MAX = float(os.getenv('EMAIL_OUTBOX_BACKOFF_MAX', '3600'))
+OUTBOX_LEASE_SECONDS = int(os.getenv('EMAIL_OUTBOX_LEASE', '300'))
+# Seconds to hold digest-eligible notifications so a recipient's messages go out as one; 0 sends each immediately
+EMAIL_DIGEST_WINDOW = int(os.getenv('EMAIL_DIGEST_WINDOW', '0'))
+
+STATUS_PENDING = 'Pending'
+STATUS_SENDING = 'Sending'
+STATUS_SENT = 'Sent'
+STATUS_DEAD = 'Dead'
+
+
+def enqueue_email(recipients, subject, html=None, body=None, kind=None, payload=None, digest=False):
+    """Stage a message in the caller's transaction; it is delivered once the caller commits.
+
+    With digest=True and EMAIL_DIGEST_WINDOW set, the message waits up to the
+    window and is merged with the recipient's other digest messages into a
+    single email built from each message's kind and payload.
+    """
+    if isinstance(recipients, str):
+        recipients = [recipients]
+    now = datetime.utcnow()
+    digest_key = None
+    if digest and EMAIL_DIGEST_WINDOW > 0 and len(recipients) == 1:
+        digest_key = recipients[0].strip().lower()
+        now += timedelta(seconds=EMAIL_DIGEST_WINDOW)
+    message = OutboundEmail(
+        recipients=','.join(recipients),
+        subject=subject,
+        html=html,
+        body=body,
+        kind=kind,
+        payload=json.dumps(payload) if payload is not None else None,
+        digest_key=digest_key,
+        status=STATUS_PENDING,
+        attempts=0,
+        next_attempt_at=now
+    )
+    db.session.add(message)
+    db.session.info['outbox_pending'] = True
+    return message
+
+
+def backoff_delay(attempts):
+    """Exponential delay before retry number `attempts`, with jitter so retries after a relay outage spread out"""
+    delay = min(OUTBOX_BACKOFF_MAX, OUTBOX_BACKOFF_BASE * 2 ** max(0, attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def claim_batch(limit=OUTBOX_BATCH_SIZE):
+    """Lease up to `limit` due messages to a new claim token and return (token, messages).
+
+    A single conditional UPDATE moves due rows to 'Sending' and pushes
+    next_attempt_at out by the lease, so concurrent workers (in this or other
+    processes) never claim the same row. Rows left in 'Sending' by a crashed
+    worker become due again when their lease runs out.
+    """
+    token = uuid.uuid4().hex
+    now = datetime.utcnow()
+    due = (
+        db.select(OutboundEmail.id)
+        .where(OutboundEmail.status.in_([STATUS_PENDING, STATUS_SENDING]), OutboundEmail.next_attempt_at <= now)
+        .order_by(OutboundEmail.next_attempt_at)
+        .limit(limit)
+    )
+    claimed = OutboundEmail.query.filter(
+        OutboundEmail.id.in_(due),
+        OutboundEmail.status.in_([STATUS_PENDING, STATUS_SENDING]),
+        OutboundEmail.next_attempt_at <= now
+    ).update({
+        'status': STATUS_SENDING,
+        'claimed_by': token,
+        'next_attempt_at': now + timedelta(seconds=OUTBOX_LEASE_SECONDS),
+        'attempts': OutboundEmail.attempts + 1,
+    }, synchronize_session=False)
+    db.session.commit()
+    if not claimed:
+        return token, []
+    messages = OutboundEmail.query.filter_by(claimed_by=token, status=STATUS_SENDING).order_by(OutboundEmail.id).all()
+
+    # A due digest message takes the recipient's other waiting digest messages with it
+    digest_keys = {m.digest_key for m in messages if m.digest_key}
+    if digest_keys:
+        joined = OutboundEmail.query.filter(
+            OutboundEmail.digest_key.in_(digest_keys),
+            OutboundEmail.status == STATUS_PENDING
+        ).update({
+            'status': STATUS_SENDING,
+            'claimed_by': token,
+            'next_attempt_at': now + timedelta(seconds=OUTBOX_LEASE_SECONDS),
+            'attempts': OutboundEmail.attempts + 1,
+        }, synchronize_session=False)
+        db.session.commit()
+        if joined:
+            messages = OutboundEmail.query.filter_by(claimed_by=token, status=STATUS_SENDING).order_by(OutboundEmail.id).all()
+    return token, messages
+
+
+def build_message(outbound):
+    return Message(
+        subject=outbound.subject,
+        recipients=outbound.recipients.split(','),
+        html=outbound.html,
+        body=outbound.body
+    )
+
+
+def build_digest_message(outbounds):
+    """One email listing every pending approval and update in a recipient's digest group"""
+    from email_service import render_digest_email
+
+    items = [{'kind': o.kind, **json.loads(o.payload or '{}')} for o in outbounds]
+    subject, html, text = render_digest_email(items)
+    return Message(subject=subject, recipients=outbounds[0].recipients.split(','), html=html, body=text)
+
+
+def group_messages(messages):
+    """Split claimed rows into send units: digest rows grouped per recipient, everything else alone"""
+    groups, digests = [], {}
+    for outbound in messages:
+        if outbound.digest_key and outbound.payload:
+            if outbound.digest_key not in digests:
+                digests[outbound.digest_key] = []
+                groups.append(digests[outbound.digest_key])
+            digests[outbound.digest_key].append(outbound)
+        else:
+            groups.append([outbound])
+    return groups
+
+
+def record_success(token, outbound):
+    OutboundEmail.query.filter_by(id=outbound.id, claimed_by=token).update({
+        'status': STATUS_SENT,
+        'sent_at': datetime.utcnow(),
+        'claimed_by': None,
+        'last_error': None,
+    }, synchronize_session=False)
+    db.session.commit()
+
+
+def record_failure(token, outbound, error):
+    """Schedule a retry with backoff, or dead-letter the message after OUTBOX_MAX_ATTEMPTS; returns the new status"""
+    dead = outbound.attempts >= OUTBOX_MAX_ATTEMPTS
+    status = STATUS_DEAD if dead else STATUS_PENDING
+    OutboundEmail.query.filter_by(id=outbound.id, claimed_by=token).update({
+        'status': status,
+        'claimed_by': None,
+        'last_error': str(error)[:2000],
+        'next_attempt_at': datetime.utcnow() + timedelta(seconds=0 if dead else backoff_delay(outbound.attempts)),
+    }, synchronize_session=False)
+    db.session.commit()
+    return status
+
+
+def deliver_batch(token, messages):
+    """Send claimed messages over one pooled SMTP connection, committing each outcome.
+
+    Returns (sent, retried, dead, coalesced), counted per outbox row;
+    coalesced is the number of rows that rode along in another row's digest.
+    """
+    built, errors = [], {}
+    groups = group_messages(messages)
+    for group in groups:
+        try:
+            built.append((group, build_message(group[0]) if len(group) == 1 else build_digest_message(group)))
+        except Exception as e:
+            errors[group[0].id] = e
+    results = smtp_pool.send_batch([message for _, message in built], current_app.extensions['mail'])
+    errors.update((group[0].id, error) for (group, _), error in zip(built, results))
+
+    sent = retried = dead = coalesced = 0
+    for group in groups:
+        error = errors.get(group[0].id)
+        if error is None:
+            coalesced += len(group) - 1
+        for outbound in group:
+            if error is None:
+                record_success(token, outbound)
+                sent += 1
+            elif record_failure(token, outbound, error) == STATUS_DEAD:
+                dead += 1
+                logger.error(f"Email #{outbound.id} to {outbound.recipients} dead-lettered after {outbound.attempts} attempts: {error}")
+            else:
+                retried += 1
+                logger.warning(f"Email #{outbound.id} to {outbound.recipients} failed (attempt {outbound.attempts}), will retry: {error}")
+    return sent, retried, dead, coalesced
+
+
+def retry_dead_emails():
+    """Move dead-lettered messages back to the queue with a fresh attempt budget"""
+    count = OutboundEmail.query.filter_by(status=STATUS_DEAD).update({
+        'status': STATUS_PENDING,
+        'attempts': 0,
+        'next_attempt_at': datetime.utcnow(),
+    }, synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+class OutboxDispatcher:
+    """Daemon threads draining the outbox, woken when new messages are committed and polling otherwise"""
+
+    def __init__(self, workers=OUTBOX_WORKERS, poll_interval=OUTBOX_POLL_INTERVAL, batch_size=OUTBOX_BATCH_SIZE):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.app = None
+        self.sent = 0
+        self.retried = 0
+        self.dead = 0
+        self.coalesced = 0
+        self._wakeup = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+
+    def start(self):
+        if self.app is None:
+            raise RuntimeError('Outbox dispatcher is not bound to an app')
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            for i in range(len(self._threads), self.workers):
+                thread = threading.Thread(target=self._run, name=f"email-outbox-{i + 1}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        self.wake()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def drain(self):
+        """Deliver due messages until none are left; returns (sent, retried, dead, coalesced) for this call"""
+        totals = [0, 0, 0, 0]
+        while True:
+            token, messages = claim_batch(self.batch_size)
+            if not messages:
+                break
+            for i, count in enumerate(deliver_batch(token, messages)):
+                totals[i] += count
+        with self._lock:
+            self.sent += totals[0]
+            self.retried += totals[1]
+            self.dead += totals[2]
+            self.coalesced += totals[3]
+        return tuple(totals)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            try:
+                with self.app.app_context():
+                    self.drain()
+                smtp_pool.keepalive()
+            except Exception:
+                logger.exception('Email outbox drain failed')
+
+    def stats(self):
+        counts = dict(db.session.query(OutboundEmail.status, func.count(OutboundEmail.id)).group_by(OutboundEmail.status).all())
+        with self._lock:
+            return {
+                'queued': {status: counts.get(status, 0) for status in (STATUS_PENDING, STATUS_SENDING, STATUS_SENT, STATUS_DEAD)},
+                'workers': len([t for t in self._threads if t.is_alive()]),
+                'sent': self.sent,
+                'retried': self.retried,
+                'dead_lettered': self.dead,
+                'coalesced_into_digests': self.coalesced,
+                'digest_window_seconds': EMAIL_DIGEST_WINDOW,
+                'smtp': smtp_pool.stats(),
+            }
+
+
+outbox_dispatcher = OutboxDispatcher()
+
+
+register_commit_hook('outbox_pending', outbox_dispatcher.wake)
@@ -1,9 +1,29 @@
 import os
-from flask import url_for
-from flask_mail import Mail, Message
+from flask import url_for, current_app
+from flask_mail import Mail
+from jinja2 import FileSystemBytecodeCache
+from email_outbox import enqueue_email
 
 mail = Mail()
 
+JINJA_BYTECODE_CACHE_DIR = os.getenv(
+    'JINJA_BYTECODE_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'jinja_cache')
+)
+
+def init_email_templates(app):
+    """Cache compiled templates on disk so new workers skip parsing and compiling them"""
+    if JINJA_BYTECODE_CACHE_DIR:
+        os.makedirs(JINJA_BYTECODE_CACHE_DIR, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(JINJA_BYTECODE_CACHE_DIR)
+
+def render_email(name, **context):
+    """Render templates/email/<name>.html and .txt with the app's Jinja environment; returns (html, text)"""
+    env = current_app.jinja_env
+    html = env.get_template(f'email/{name}.html').render(context)
+    text = env.get_template(f'email/{name}.txt').render(context)
+    return html, text
+
 def init_mail(app):
     """Initialize Flask-Mail with app configuration"""
     app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
@@ -15,131 +35,99 @@ def init_mail(app):
     app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER', os.getenv('MAIL_USERNAME'))
     
     mail.init_app(app)
+    init_email_templates(app)
     
     if app.config['MAIL_USERNAME']:
         print(f"✓ Email configured with {app.config['MAIL_USERNAME']}")
     else:
         print("✗ Email not configured - missing MAIL_USERNAME")
 
+def render_digest_email(items):
+    """Subject, HTML and text for a digest of approval_request / approval_update payloads"""
+    approvals = [item for item in items if item.get('kind') == 'approval_request']
+    updates = [item for item in items if item.get('kind') == 'approval_update']
+    parts = []
+    if approvals:
+        parts.append(f"{len(approvals)} approval{'s' if len(approvals) != 1 else ''} pending")
+    if updates:
+        parts.append(f"{len(updates)} ticket update{'s' if len(updates) != 1 else ''}")
+    html, text = render_email('digest', approvals=approvals, updates=updates)
+    return f"Ticket digest - {', '.join(parts)}", html, text
+
 def get_email_configured():
     """Check if email is configured"""
     return os.getenv('MAIL_USERNAME') is not None
 
 def send_approval_email(ticket_id, description, category_name, creator_name, approval_token, approver_email):
-    """Send approval request email via SMTP"""
+    """Queue an approval request email; it is sent after the caller commits"""
     try:
         if not get_email_configured():
             print(f"✗ Email not configured - skipping email to {approver_email}")
             return False
         
-        print(f"📧 Attempting to send approval email to {approver_email} for ticket #{ticket_id}")
-        
-        msg = Message(
-            subject=f'Ticket Approval Request - #{ticket_id}',
-            recipients=[approver_email]
-        )
-        
-        msg.html = f"""
-        <html>
-        <body>
-            <h2>Ticket Approval Request</h2>
-            <p>Hello,</p>
-            <p>A new ticket requires your approval.</p>
-            <table style="border-collapse: collapse; margin: 20px 0;">
-                <tr>
-                    <td style="padding: 8px; font-weight: bold;">Ticket ID:</td>
-                    <td style="padding: 8px;">#{ticket_id}</td>
-                </tr>
-                <tr>
-                    <td style="padding: 8px; font-weight: bold;">Description:</td>
-                    <td style="padding: 8px;">{description}</td>
-                </tr>
-                <tr>
-                    <td style="padding: 8px; font-weight: bold;">Category:</td>
-                    <td style="padding: 8px;">{category_name}</td>
-                </tr>
-                <tr>
-                    <td style="padding: 8px; font-weight: bold;">Created by:</td>
-                    <td style="padding: 8px;">{creator_name}</td>
-                </tr>
-            </table>
-            <p>
-                <a href="{url_for('approve_ticket', token=approval_token, action='approve', _external=True)}" 
-                   style="background-color: #28a745; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px; display: inline-block; margin-right: 10px;">
-                    Approve Ticket
-                </a>
-                <a href="{url_for('approve_ticket', token=approval_token, action='reject', _external=True)}" 
-                   style="background-color: #dc3545; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px; display: inline-block;">
-                    Reject Ticket
-                </a>
-            </p>
-            <p style="color: #666; font-size: 12px;">This link is valid for 7 days.</p>
-            <p>Thank you,<br>Ticketing System</p>
-        </body>
-        </html>
-        """
+        print(f"📧 Queueing approval email to {approver_email} for ticket #{ticket_id}")
         
-        print(f"📧 Sending email via {os.getenv('MAIL_SERVER', 'smtp.gmail.com')}:{os.getenv('MAIL_PORT', '587')}")
-        mail.send(msg)
-        print(f"✓ Approval email sent successfully to {approver_email}")
+        context = {
+            'ticket_id': ticket_id,
+            'description': description,
+            'category_name': category_name,
+            'creator_name': creator_name,
+            'approve_url': url_for('approve_ticket', token=approval_token, action='approve', _external=True),
+            'reject_url': url_for('approve_ticket', token=approval_token, action='reject', _external=True),
+        }
+        html, text = render_email('approval_request', **context)
+        enqueue_email([approver_email], f'Ticket Approval Request - #{ticket_id}', html, text,
+                      kind='approval_request', payload=context, digest=True)
+        print(f"✓ Approval email queued for {approver_email}")
         return True
     except Exception as e:
         import traceback
-        print(f"✗ Failed to send approval email to {approver_email}: {e}")
+        print(f"✗ Failed to queue approval email to {approver_email}: {e}")
         print(f"   Error details: {traceback.format_exc()}")
         return False
 
 def send_assignment_email(ticket_id, description, category_name, creator_name, team_member_name, team_member_email):
-    """Send ticket assignment email via SMTP"""
+    """Queue a ticket assignment email; it is sent after the caller commits"""
     try:
         if not get_email_configured():
             print(f"✗ Email not configured - skipping email to {team_member_email}")
             return False
         
-        msg = Message(
-            subject=f'New Ticket Assigned - #{ticket_id}',
-            recipients=[team_member_email]
+        html, text = render_email(
+            'assignment',
+            ticket_id=ticket_id,
+            description=description,
+            category_name=category_name,
+            creator_name=creator_name,
+            team_member_name=team_member_name
         )
+        enqueue_email([team_member_email], f'New Ticket Assigned - #{ticket_id}', html, text)
+        print(f"✓ Assignment email queued for {team_member_email}")
+        return True
+    except Exception as e:
+        print(f"✗ Failed to queue assignment email to {team_member_email}: {e}")
+        return False
+
+def send_bulk_assignment_email(team_member_name, team_member_email, category_name, tickets):
+    """Queue one email listing every ticket assigned to a member in a rebalance; tickets are dicts with ticket_id, description and creator_name"""
+    try:
+        if not get_email_configured():
+            print(f"✗ Email not configured - skipping email to {team_member_email}")
+            return False
         
-        msg.html = f"""
-        <html>
-        <body>
-            <h2>New Ticket Assigned</h2>
-            <p>Hello {team_member_name},</p>
-            <p>A new ticket has been assigned to you.</p>
-            <table style="border-collapse: collapse; margin: 20px 0;">
-                <tr>
-                    <td style="padding: 8px; font-weight: bold;">Ticket ID:</td>
-                    <td style="padding: 8px;">#{ticket_id}</td>
-                </tr>
-                <tr>
-                    <td style="padding: 8px; font-weight: bold;">Description:</td>
-                    <td style="padding: 8px;">{description}</td>
-                </tr>
-                <tr>
-                    <td style="padding: 8px; font-weight: bold;">Category:</td>
-                    <td style="padding: 8px;">{category_name}</td>
-                </tr>
-                <tr>
-                    <td style="padding: 8px; font-weight: bold;">Created by:</td>
-                    <td style="padding: 8px;">{creator_name}</td>
-                </tr>
-                <tr>
-                    <td style="padding: 8px; font-weight: bold;">Priority:</td>
-                    <td style="padding: 8px;">Normal</td>
-                </tr>
-            </table>
-            <p>Please log in to the ticketing system to view details and update the status.</p>
-            <p>Thank you,<br>Ticketing System</p>
-        </body>
-        </html>
-        """
-        
-        mail.send(msg)
-        print(f"✓ Assignment email sent to {team_member_email}")
+        html, text = render_email(
+            'bulk_assignment',
+            team_member_name=team_member_name,
+            category_name=category_name,
+            tickets=tickets
+        )
+        ids = ', '.join(f"#{item['ticket_id']}" for item in tickets[:5])
+        more = f' and {len(tickets) - 5} more' if len(tickets) > 5 else ''
+        enqueue_email([team_member_email], f'Tickets Assigned - {ids}{more}', html, text)
+        print(f"✓ Bulk assignment email for {len(tickets)} ticket(s) queued for {team_member_email}")
         return True
     except Exception as e:
-        print(f"✗ Failed to send assignment email to {team_member_email}: {e}")
+        print(f"✗ Failed to queue bulk assignment email to {team_member_email}: {e}")
         return False
 
 def send_ticket_creation_email(ticket_id, description, category_name, creator_email, creator_name):
@@ -149,46 +137,18 @@ def send_ticket_creation_email(ticket_id, description, category_name, creator_em
             print(f"✗ Email not configured - skipping ticket creation email to {creator_email}")
             return False
         
-        msg = Message(
-            subject=f'Ticket Created Successfully - #{ticket_id}',
-            recipients=[creator_email]
+        html, text = render_email(
+            'ticket_created',
+            ticket_id=ticket_id,
+            description=description,
+            category_name=category_name,
+            creator_name=creator_name
         )
-        
-        msg.html = f"""
-        <html>
-        <body>
-            <h2>Ticket Created Successfully</h2>
-            <p>Hello {creator_name},</p>
-            <p>Your ticket has been created and is awaiting approval.</p>
-            <table style="border-collapse: collapse; margin: 20px 0;">
-                <tr>
-                    <td style="padding: 8px; font-weight: bold;">Ticket ID:</td>
-                    <td style="padding: 8px;">#{ticket_id}</td>
-                </tr>
-                <tr>
-                    <td style="padding: 8px; font-weight: bold;">Description:</td>
-                    <td style="padding: 8px;">{description}</td>
-                </tr>
-                <tr>
-                    <td style="padding: 8px; font-weight: bold;">Category:</td>
-                    <td style="padding: 8px;">{category_name}</td>
-                </tr>
-                <tr>
-                    <td style="padding: 8px; font-weight: bold;">Status:</td>
-                    <td style="padding: 8px;">Pending Approval</td>
-                </tr>
-            </table>
-            <p>You will receive email updates as your ticket progresses through the approval process.</p>
-            <p>Thank you,<br>Ticketing System</p>
-        </body>
-        </html>
-        """
-        
-        mail.send(msg)
-        print(f"✓ Ticket creation email sent to {creator_email}")
+        enqueue_email([creator_email], f'Ticket Created Successfully - #{ticket_id}', html, text)
+        print(f"✓ Ticket creation email queued for {creator_email}")
         return True
     except Exception as e:
-        print(f"✗ Failed to send ticket creation email to {creator_email}: {e}")
+        print(f"✗ Failed to queue ticket creation email to {creator_email}: {e}")
         return False
 
 def send_approval_update_email(ticket_id, description, creator_email, creator_name, approver_name, approver_role, approval_level, total_levels, comment=None):
@@ -198,61 +158,21 @@ def send_approval_update_email(ticket_id, description, creator_email, creator_na
             print(f"✗ Email not configured - skipping approval update email to {creator_email}")
             return False
         
-        msg = Message(
-            subject=f'Ticket #{ticket_id} - Approval Update',
-            recipients=[creator_email]
-        )
-        
-        role_text = f" ({approver_role})" if approver_role else ""
-        next_level_text = ""
-        if approval_level < total_levels:
-            next_level_text = f"<p><strong>Next Step:</strong> Waiting for Level {approval_level + 1} approval.</p>"
-        else:
-            next_level_text = "<p><strong>Next Step:</strong> All approvals complete! Ticket will be assigned to a team member shortly.</p>"
-        
-        comment_html = ""
-        if comment:
-            comment_html = f"""
-            <div style="background-color: #f8f9fa; padding: 15px; border-left: 4px solid #0d6efd; margin: 20px 0;">
-                <strong>Approver Comment:</strong><br>
-                {comment}
-            </div>
-            """
-        
-        msg.html = f"""
-        <html>
-        <body>
-            <h2>Ticket Approval Update</h2>
-            <p>Hello {creator_name},</p>
-            <p>Your ticket has received an approval!</p>
-            <table style="border-collapse: collapse; margin: 20px 0;">
-                <tr>
-                    <td style="padding: 8px; font-weight: bold;">Ticket ID:</td>
-                    <td style="padding: 8px;">#{ticket_id}</td>
-                </tr>
-                <tr>
-                    <td style="padding: 8px; font-weight: bold;">Description:</td>
-                    <td style="padding: 8px;">{description}</td>
-                </tr>
-                <tr>
-                    <td style="padding: 8px; font-weight: bold;">Approved By:</td>
-                    <td style="padding: 8px;">{approver_name}{role_text}</td>
-                </tr>
-                <tr>
-                    <td style="padding: 8px; font-weight: bold;">Approval Level:</td>
-                    <td style="padding: 8px;">Level {approval_level} of {total_levels}</td>
-                </tr>
-            </table>
-            {comment_html}
-            {next_level_text}
-            <p>Thank you,<br>Ticketing System</p>
-        </body>
-        </html>
-        """
-        
-        mail.send(msg)
-        print(f"✓ Approval update email sent to {creator_email}")
+        context = {
+            'ticket_id': ticket_id,
+            'description': description,
+            'creator_name': creator_name,
+            'approver_name': approver_name,
+            'approver_role': approver_role,
+            'approval_level': approval_level,
+            'total_levels': total_levels,
+            'comment': comment,
+        }
+        html, text = render_email('approval_update', **context)
+        enqueue_email([creator_email], f'Ticket #{ticket_id} - Approval Update', html, text,
+                      kind='approval_update', payload=context, digest=True)
+        print(f"✓ Approval update email queued for {creator_email}")
         return True
     except Exception as e:
-        print(f"✗ Failed to send approval update email to {creator_email}: {e}")
+        print(f"✗ Failed to queue approval update email to {creator_email}: {e}")
         return False
@@ -0,0 +1,165 @@
+import os
+import time
+import pickle
+import random
+import logging
+import threading
+from models import db, Ticket, ArchivedTicket
+
+logger = logging.getLogger(__name__)
+
+LOCAL_MODEL_PATH = os.getenv(
+    'LOCAL_MODEL_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'ticket_classifier.pkl')
+)
+LOCAL_MODEL_CONFIDENCE = float(os.getenv('LOCAL_MODEL_CONFIDENCE', '0.75'))
+LOCAL_MODEL_SAVE_EVERY = int(os.getenv('LOCAL_MODEL_SAVE_EVERY', '25'))
+LOCAL_MODEL_RELOAD_INTERVAL = int(os.getenv('LOCAL_MODEL_RELOAD_INTERVAL', '60'))
+
+# Tickets that made it through the approval chain carry a human-confirmed category
+TRAINING_STATUSES = ['Approved', 'Assigned', 'In Progress', 'Completed']
+
+_model = None
+_model_mtime = None
+_model_checked_at = 0.0
+_unsaved_updates = 0
+_model_lock = threading.Lock()
+
+
+class LocalTicketClassifier:
+    """Linear SGD model over hashed word uni/bi-grams, trainable incrementally"""
+
+    def __init__(self, category_ids):
+        import numpy as np
+        from sklearn.feature_extraction.text import HashingVectorizer
+        from sklearn.linear_model import SGDClassifier
+
+        self.vectorizer = HashingVectorizer(
+            n_features=2 ** 18,
+            ngram_range=(1, 2),
+            alternate_sign=False,
+            norm='l2'
+        )
+        self.model = SGDClassifier(loss='log_loss', alpha=1e-5, random_state=42)
+        self.classes = np.array(sorted(category_ids))
+        self.examples_seen = 0
+        self.trained_at = None
+
+    def partial_fit(self, descriptions, category_ids):
+        known = [(d, c) for d, c in zip(descriptions, category_ids) if c in self.classes]
+        if len(known) < len(descriptions):
+            logger.warning(f"Skipped {len(descriptions) - len(known)} example(s) for categories unknown to the model - retrain to include them")
+        if not known:
+            return
+        texts, labels = zip(*known)
+        self.model.partial_fit(self.vectorizer.transform(texts), list(labels), classes=self.classes)
+        self.examples_seen += len(known)
+        self.trained_at = time.time()
+
+    def predict(self, descriptions):
+        """Return (category_id, confidence) for each description"""
+        if not self.examples_seen:
+            return [(None, 0.0)] * len(descriptions)
+        probabilities = self.model.predict_proba(self.vectorizer.transform(descriptions))
+        best = probabilities.argmax(axis=1)
+        return [
+            (int(self.model.classes_[idx]), float(row[idx]))
+            for row, idx in zip(probabilities, best)
+        ]
+
+    def save(self, path=LOCAL_MODEL_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=LOCAL_MODEL_PATH):
+        with open(path, 'rb') as f:
+            model = pickle.load(f)
+        if not isinstance(model, cls):
+            raise ValueError(f"{path} does not contain a LocalTicketClassifier")
+        return model
+
+
+def train_local_model(category_ids, epochs=5, chunk_size=5000, path=LOCAL_MODEL_PATH):
+    """Train a fresh model from labelled ticket history and save it"""
+    global _model, _model_mtime, _unsaved_updates
+
+    # Archived tickets are old Completed ones: still good training data
+    rows = db.session.execute(db.select(Ticket.description, Ticket.category_id).where(
+        Ticket.category_id.isnot(None),
+        Ticket.status.in_(TRAINING_STATUSES)
+    ).union_all(db.select(ArchivedTicket.description, ArchivedTicket.category_id).where(
+        ArchivedTicket.category_id.isnot(None),
+        ArchivedTicket.status.in_(TRAINING_STATUSES)
+    ))).all()
+
+    model = LocalTicketClassifier(category_ids)
+    examples = [(row.description, row.category_id) for row in rows]
+    rng = random.Random(42)
+    for _ in range(epochs):
+        rng.shuffle(examples)
+        for start in range(0, len(examples), chunk_size):
+            chunk = examples[start:start + chunk_size]
+            model.partial_fit([d for d, _ in chunk], [c for _, c in chunk])
+    model.examples_seen = len(examples)
+
+    if path:
+        model.save(path)
+    with _model_lock:
+        _model = model
+        _model_mtime = os.path.getmtime(path) if path and os.path.exists(path) else None
+        _unsaved_updates = 0
+    return model, len(examples)
+
+
+def get_local_model(path=LOCAL_MODEL_PATH):
+    """Return the trained model, reloading it when another process saved a newer file"""
+    global _model, _model_mtime, _model_checked_at
+
+    with _model_lock:
+        now = time.monotonic()
+        if _model_checked_at and now - _model_checked_at < LOCAL_MODEL_RELOAD_INTERVAL:
+            return _model
+        _model_checked_at = now
+
+        if not path or not os.path.exists(path):
+            return _model
+        mtime = os.path.getmtime(path)
+        if mtime != _model_mtime and _unsaved_updates == 0:
+            try:
+                _model = LocalTicketClassifier.load(path)
+                _model_mtime = mtime
+                logger.info(f"Loaded local ticket classifier from {path} ({_model.examples_seen} examples)")
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable local model at {path}: {e}")
+        return _model
+
+
+def predict_category(descriptions):
+    """(category_id, confidence) per description, or None when no model is trained"""
+    model = get_local_model()
+    if model is None:
+        return None
+    return model.predict(descriptions)
+
+
+def learn_from_ticket(description, category_id, path=LOCAL_MODEL_PATH):
+    """Incrementally update the model with one confirmed example"""
+    global _unsaved_updates, _model_mtime
+
+    model = get_local_model(path)
+    if model is None:
+        return False
+    with _model_lock:
+        model.partial_fit([description], [category_id])
+        _unsaved_updates += 1
+        if path and _unsaved_updates >= LOCAL_MODEL_SAVE_EVERY:
+            model.save(path)
+            _model_mtime = os.path.getmtime(path)
+            _unsaved_updates = 0
+    return True
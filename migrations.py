@@ -0,0 +1,163 @@
+import logging
+from datetime import datetime
+from sqlalchemy import inspect
+from sqlalchemy.exc import SQLAlchemyError
+from models import db, Category, ApprovalRule, Ticket, Approval, TicketHistory, TeamMember, OutboundEmail, TicketStatusCount
+from ticket_status import TICKET_STATUS_CODES, APPROVAL_STATUS_CODES
+
+logger = logging.getLogger(__name__)
+
+# One row per applied migration; created by db.create_all() like every other table
+schema_migrations = db.Table(
+    'schema_migrations',
+    db.Column('version', db.Integer, primary_key=True),
+    db.Column('name', db.String(200), nullable=False),
+    db.Column('applied_at', db.DateTime, nullable=False)
+)
+
+MIGRATIONS = []
+
+
+def migration(version, name):
+    """Register fn(connection) as schema version `version`.
+
+    db.create_all() already builds new databases at the latest schema, so
+    every migration checks what exists and only adds what is missing: on a
+    fresh database it does nothing and is just recorded as applied.
+    """
+    def register(fn):
+        MIGRATIONS.append((version, name, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+
+def add_missing_columns(connection, table, column_names):
+    existing = {column['name'] for column in inspect(connection).get_columns(table.name)}
+    preparer = connection.dialect.identifier_preparer
+    for name in column_names:
+        if name in existing:
+            continue
+        column = table.columns[name]
+        column_type = column.type.compile(dialect=connection.dialect)
+        connection.exec_driver_sql(
+            f'ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} {column_type}'
+        )
+
+
+def create_missing_indexes(connection, table):
+    """Create the table's declared indexes that are missing, skipping any on a column a later migration adds"""
+    existing = {column['name'] for column in inspect(connection).get_columns(table.name)}
+    for index in sorted(table.indexes, key=lambda i: i.name):
+        if all(column.name in existing for column in index.columns):
+            index.create(connection, checkfirst=True)
+
+
+@migration(1, 'Digest columns on email_outbox')
+def add_outbox_digest_columns(connection):
+    add_missing_columns(connection, OutboundEmail.__table__, ['kind', 'payload', 'digest_key'])
+    create_missing_indexes(connection, OutboundEmail.__table__)
+
+
+@migration(2, 'Composite indexes for dashboard, approval and history queries')
+def add_hot_path_indexes(connection):
+    for model in (Ticket, Approval, TicketHistory, TeamMember):
+        create_missing_indexes(connection, model.__table__)
+
+
+@migration(3, 'Approval rules from Category.approvers')
+def convert_approver_strings(connection):
+    from approval_rules import parse_approvers
+
+    ApprovalRule.__table__.create(connection, checkfirst=True)
+    categories = Category.__table__
+    rules = ApprovalRule.__table__
+    converted = {row.category_id for row in connection.execute(db.select(rules.c.category_id).distinct())}
+    rows = []
+    for category in connection.execute(db.select(categories.c.id, categories.c.approvers)):
+        if category.id in converted:
+            continue
+        for level, (email, role, name) in enumerate(parse_approvers(category.approvers), start=1):
+            rows.append({'category_id': category.id, 'level': level, 'approver_email': email,
+                         'approver_role': role, 'approver_name': name, 'created_at': datetime.utcnow()})
+    if rows:
+        connection.execute(rules.insert(), rows)
+
+
+@migration(4, 'Integer status codes on tickets and approvals')
+def convert_status_to_codes(connection):
+    """Copy the old string status into status_code, then drop the string column and its indexes.
+
+    The copy is one UPDATE ... CASE per table. SQLite before 3.35 cannot drop
+    columns; there the old column is left in place, unused.
+    """
+    preparer = connection.dialect.identifier_preparer
+    for table, codes in ((Ticket.__table__, TICKET_STATUS_CODES), (Approval.__table__, APPROVAL_STATUS_CODES)):
+        add_missing_columns(connection, table, ['status_code'])
+        inspector = inspect(connection)
+        if 'status' in {column['name'] for column in inspector.get_columns(table.name)}:
+            old_status = db.column('status')
+            connection.execute(
+                table.update()
+                .where(table.c.status_code.is_(None))
+                .values(status_code=db.case({name: code for name, code in codes.items()}, value=old_status))
+            )
+            for index in inspector.get_indexes(table.name):
+                if 'status' in index['column_names']:
+                    connection.exec_driver_sql(f"DROP INDEX {preparer.quote(index['name'])}")
+            if connection.dialect.name != 'sqlite' or connection.dialect.dbapi.sqlite_version_info >= (3, 35):
+                connection.exec_driver_sql(f'ALTER TABLE {preparer.format_table(table)} DROP COLUMN status')
+        create_missing_indexes(connection, table)
+
+
+@migration(5, 'Full-text search index on tickets and history')
+def add_search_index(connection):
+    from ticket_search import create_search_index
+
+    create_search_index(connection)
+
+
+@migration(6, 'Per-status ticket count rollup')
+def add_status_counts(connection):
+    from status_counts import create_status_counts
+
+    TicketStatusCount.__table__.create(connection, checkfirst=True)
+    create_status_counts(connection)
+
+
+def applied_versions(connection):
+    schema_migrations.create(connection, checkfirst=True)
+    return {row.version for row in connection.execute(db.select(schema_migrations.c.version))}
+
+
+def migration_status():
+    """[(version, name, applied)] for every known migration"""
+    with db.engine.begin() as connection:
+        applied = applied_versions(connection)
+    return [(version, name, version in applied) for version, name, _ in MIGRATIONS]
+
+
+def upgrade_database():
+    """Apply pending migrations in version order, each in its own transaction; returns [(version, name)] applied.
+
+    Safe to run from several workers at once: a worker that loses the race to
+    record a version rolls back and moves on.
+    """
+    applied_now = []
+    with db.engine.begin() as connection:
+        applied = applied_versions(connection)
+    for version, name, fn in MIGRATIONS:
+        if version in applied:
+            continue
+        try:
+            with db.engine.begin() as connection:
+                fn(connection)
+                connection.execute(schema_migrations.insert().values(version=version, name=name, applied_at=datetime.utcnow()))
+        except SQLAlchemyError:
+            with db.engine.begin() as connection:
+                if version in applied_versions(connection):
+                    logger.info(f"Migration {version} was applied by another process")
+                    continue
+            raise
+        applied_now.append((version, name))
+    return applied_now
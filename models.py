@@ -1,6 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from sqlalchemy.orm import validates
 from datetime import datetime
+from ticket_status import (StatusCode, TICKET_STATUS_CODES, APPROVAL_STATUS_CODES,
+                           TICKET_TRANSITIONS, APPROVAL_TRANSITIONS, check_transition)
 
 db = SQLAlchemy()
 
@@ -27,15 +30,37 @@ class Category(db.Model):
     name = db.Column(db.String(100), nullable=False, unique=True)
     description = db.Column(db.Text)
     keywords = db.Column(db.Text)
+    # The chain as the admin typed it ('email:Role:Name | ...'); approval_rules is what tickets use
     approvers = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     tickets = db.relationship('Ticket', backref='category', lazy=True)
     team_members = db.relationship('TeamMember', backref='category', lazy=True)
+    approval_rules = db.relationship('ApprovalRule', backref='category', lazy=True,
+                                     order_by='ApprovalRule.level', cascade='all, delete-orphan')
     
     def __repr__(self):
         return f'<Category {self.name}>'
 
+class ApprovalRule(db.Model):
+    __tablename__ = 'approval_rules'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
+    level = db.Column(db.Integer, nullable=False)
+    approver_email = db.Column(db.String(120), nullable=False)
+    approver_role = db.Column(db.String(100))
+    approver_name = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('category_id', 'level', name='uq_approval_rules_category_level'),
+        db.Index('ix_approval_rules_approver_email', 'approver_email'),
+    )
+    
+    def __repr__(self):
+        return f'<ApprovalRule {self.category_id} L{self.level} - {self.approver_email}>'
+
 class TeamMember(db.Model):
     __tablename__ = 'team_members'
     
@@ -48,9 +73,47 @@ class TeamMember(db.Model):
     
     assigned_tickets = db.relationship('Ticket', backref='assignee', lazy=True, foreign_keys='Ticket.assigned_to')
     
+    __table_args__ = (
+        db.Index('ix_team_members_email', 'email'),
+    )
+    
     def __repr__(self):
         return f'<TeamMember {self.name}>'
 
+class TeamMemberWorkload(db.Model):
+    """Running count of a member's Assigned/In Progress tickets, kept in step by ticket_assignment"""
+    __tablename__ = 'team_member_workloads'
+    
+    member_id = db.Column(db.Integer, db.ForeignKey('team_members.id'), primary_key=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
+    active_ticket_count = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    member = db.relationship('TeamMember', backref=db.backref('workload', uselist=False))
+    
+    __table_args__ = (
+        db.Index('ix_team_member_workloads_category_count', 'category_id', 'active_ticket_count', 'member_id'),
+    )
+    
+    def __repr__(self):
+        return f'<TeamMemberWorkload {self.member_id} - {self.active_ticket_count}>'
+
+class TicketStatusCount(db.Model):
+    """Running count of tickets (including archived ones) per status, kept in step by status_counts.
+
+    Each status is split over a few shard rows so concurrent status changes
+    rarely wait on the same row; a status's count is the sum of its shards.
+    """
+    __tablename__ = 'ticket_status_counts'
+    
+    status = db.Column('status_code', StatusCode(TICKET_STATUS_CODES), primary_key=True)
+    shard = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    ticket_count = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<TicketStatusCount {self.status}/{self.shard} - {self.ticket_count}>'
+
 class Ticket(db.Model):
     __tablename__ = 'tickets'
     
@@ -59,7 +122,8 @@ class Ticket(db.Model):
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'))
     created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     assigned_to = db.Column(db.Integer, db.ForeignKey('team_members.id'))
-    status = db.Column(db.String(50), default='Pending Approval')
+    # Stored as a small integer code (ticket_status.TICKET_STATUS_CODES), read and written as its name
+    status = db.Column('status_code', StatusCode(TICKET_STATUS_CODES), default='Pending Approval')
     resolution_comment = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -67,6 +131,17 @@ class Ticket(db.Model):
     approvals = db.relationship('Approval', backref='ticket', lazy=True, cascade='all, delete-orphan')
     history = db.relationship('TicketHistory', backref='ticket', lazy=True, cascade='all, delete-orphan')
     
+    __table_args__ = (
+        db.Index('ix_tickets_created_by_created_at', 'created_by', 'created_at'),
+        db.Index('ix_tickets_assigned_to_status_code', 'assigned_to', 'status_code'),
+        db.Index('ix_tickets_status_code_created_at', 'status_code', 'created_at'),
+    )
+    
+    @validates('status')
+    def validate_status(self, key, status):
+        check_transition(TICKET_TRANSITIONS, self.status, status)
+        return status
+    
     def __repr__(self):
         return f'<Ticket {self.id} - {self.status}>'
 
@@ -79,11 +154,21 @@ class Approval(db.Model):
     approver_name = db.Column(db.String(100))
     approver_role = db.Column(db.String(100))
     approval_level = db.Column(db.Integer, default=1)
-    status = db.Column(db.String(20), default='Pending')
+    status = db.Column('status_code', StatusCode(APPROVAL_STATUS_CODES), default='Pending')
     approved_at = db.Column(db.DateTime)
     comments = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_approvals_approver_email_status_code', 'approver_email', 'status_code'),
+        db.Index('ix_approvals_ticket_id_level', 'ticket_id', 'approval_level'),
+    )
+    
+    @validates('status')
+    def validate_status(self, key, status):
+        check_transition(APPROVAL_TRANSITIONS, self.status, status)
+        return status
+    
     def __repr__(self):
         return f'<Approval {self.id} - Level {self.approval_level} - {self.status}>'
 
@@ -96,5 +181,97 @@ class TicketHistory(db.Model):
     details = db.Column(db.Text)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_ticket_history_ticket_id_timestamp', 'ticket_id', 'timestamp'),
+    )
+    
     def __repr__(self):
         return f'<TicketHistory {self.id} - {self.action}>'
+
+class ArchivedTicket(db.Model):
+    """A closed ticket moved out of `tickets` by ticket_archive, under its original id"""
+    __tablename__ = 'archived_tickets'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    description = db.Column(db.Text, nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'))
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    assigned_to = db.Column(db.Integer, db.ForeignKey('team_members.id'))
+    status = db.Column('status_code', StatusCode(TICKET_STATUS_CODES))
+    resolution_comment = db.Column(db.Text)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, nullable=False)
+    
+    category = db.relationship('Category')
+    creator = db.relationship('User')
+    assignee = db.relationship('TeamMember')
+    
+    def __repr__(self):
+        return f'<ArchivedTicket {self.id} - {self.status}>'
+
+class ArchivedApproval(db.Model):
+    __tablename__ = 'archived_approvals'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    ticket_id = db.Column(db.Integer, db.ForeignKey('archived_tickets.id'), nullable=False)
+    approver_email = db.Column(db.String(120), nullable=False)
+    approver_name = db.Column(db.String(100))
+    approver_role = db.Column(db.String(100))
+    approval_level = db.Column(db.Integer)
+    status = db.Column('status_code', StatusCode(APPROVAL_STATUS_CODES))
+    approved_at = db.Column(db.DateTime)
+    comments = db.Column(db.Text)
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_archived_approvals_ticket_id_level', 'ticket_id', 'approval_level'),
+    )
+    
+    def __repr__(self):
+        return f'<ArchivedApproval {self.id} - Level {self.approval_level} - {self.status}>'
+
+class ArchivedTicketHistory(db.Model):
+    __tablename__ = 'archived_ticket_history'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    ticket_id = db.Column(db.Integer, db.ForeignKey('archived_tickets.id'), nullable=False)
+    action = db.Column(db.String(100), nullable=False)
+    details = db.Column(db.Text)
+    timestamp = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_archived_ticket_history_ticket_id_timestamp', 'ticket_id', 'timestamp'),
+    )
+    
+    def __repr__(self):
+        return f'<ArchivedTicketHistory {self.id} - {self.action}>'
+
+class OutboundEmail(db.Model):
+    __tablename__ = 'email_outbox'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    recipients = db.Column(db.Text, nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    html = db.Column(db.Text)
+    body = db.Column(db.Text)
+    kind = db.Column(db.String(50))
+    payload = db.Column(db.Text)
+    digest_key = db.Column(db.String(120))
+    status = db.Column(db.String(20), default='Pending', nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    claimed_by = db.Column(db.String(64))
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+        db.Index('ix_email_outbox_digest_key_status', 'digest_key', 'status'),
+    )
+    
+    def __repr__(self):
+        return f'<OutboundEmail {self.id} - {self.status}>'
@@ -1,5 +1,9 @@
 from app import app, db
-from models import User, Category, TeamMember, Ticket, Approval, TicketHistory
+from models import (User, Category, ApprovalRule, TeamMember, TeamMemberWorkload, Ticket, Approval, TicketHistory,
+                    ArchivedTicket, ArchivedApproval, ArchivedTicketHistory)
+from approval_rules import set_category_approvers, get_approval_chain, parse_approvers
+from ticket_assignment import ensure_workloads
+from status_counts import reconcile_status_counts
 from werkzeug.security import generate_password_hash
 from datetime import datetime
 
@@ -9,10 +13,15 @@ def seed_database():
         db.create_all()
         
         print("Clearing existing data...")
+        ArchivedTicketHistory.query.delete()
+        ArchivedApproval.query.delete()
+        ArchivedTicket.query.delete()
         TicketHistory.query.delete()
         Approval.query.delete()
         Ticket.query.delete()
+        TeamMemberWorkload.query.delete()
         TeamMember.query.delete()
+        ApprovalRule.query.delete()
         Category.query.delete()
         User.query.delete()
         db.session.commit()
@@ -81,21 +90,17 @@ def seed_database():
             category = Category(
                 name=cat_data['name'],
                 description=cat_data['description'],
-                keywords=cat_data['keywords'],
-                approvers=cat_data['approvers']
+                keywords=cat_data['keywords']
             )
             db.session.add(category)
+            set_category_approvers(category, cat_data['approvers'])
             categories[cat_data['name']] = category
             
-            approver_levels = cat_data['approvers'].split('|')
+            approver_levels = parse_approvers(cat_data['approvers'])
             print(f"\nCategory: {cat_data['name']}")
             print(f"  Approval hierarchy ({len(approver_levels)} levels):")
-            for idx, approver in enumerate(approver_levels, 1):
-                parts = approver.strip().split(':')
-                email = parts[0].strip()
-                role = parts[1].strip() if len(parts) > 1 else 'Approver'
-                name = parts[2].strip() if len(parts) > 2 else email
-                print(f"    Level {idx}: {name} ({role}) - {email}")
+            for idx, (email, role, name) in enumerate(approver_levels, 1):
+                print(f"    Level {idx}: {name or email} ({role}) - {email}")
         
         db.session.commit()
         
@@ -131,6 +136,7 @@ def seed_database():
             print(f"Created team member: {tm_data['name']} - {tm_data['email']} / {tm_data['password']} ({tm_data['category']})")
         
         db.session.commit()
+        ensure_workloads()
         
         print("\nCreating 11 dummy tickets to demonstrate load balancing...")
         
@@ -172,26 +178,21 @@ def seed_database():
             db.session.add(history)
             db.session.commit()
             
-            if category and category.approvers:
-                approvers_data = category.approvers.split('|')
-                
-                for level_idx, approver_info in enumerate(approvers_data, start=1):
-                    parts = approver_info.strip().split(':')
-                    approver_email = parts[0].strip()
-                    approver_role = parts[1].strip() if len(parts) > 1 else 'Approver'
-                    approver_name = parts[2].strip() if len(parts) > 2 else ''
-                    
+            chain = get_approval_chain(category.id) if category else ()
+            if chain:
+                for step in chain:
                     approval = Approval(
                         ticket_id=ticket.id,
-                        approver_email=approver_email,
-                        approver_name=approver_name,
-                        approver_role=approver_role,
-                        approval_level=level_idx,
+                        approver_email=step.email,
+                        approver_name=step.name,
+                        approver_role=step.role,
+                        approval_level=step.level,
                         status='Approved',
                         approved_at=datetime.utcnow()
                     )
                     db.session.add(approval)
                 
+                ticket.status = 'Approved'
                 db.session.commit()
                 
                 from ticket_assignment import assign_ticket_to_team_member
@@ -213,6 +214,9 @@ def seed_database():
                 else:
                     print(f"Ticket #{ticket.id}: '{description[:50]}...' → {category.name} → No team member available")
         
+        # The bulk deletes above bypass the counter hooks
+        reconcile_status_counts(fix=True)
+        
         print("\n" + "="*80)
         print("SEED DATA SUMMARY")
         print("="*80)
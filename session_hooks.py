@@ -0,0 +1,27 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+def register_commit_hook(flag, callback, models=()):
+    """Call callback() after a session commits with session.info[flag] set; a rollback discards the flag.
+
+    Code that changes something the callback reacts to sets the flag itself;
+    inserts, updates and deletes of any of `models` set it automatically.
+    """
+    def mark_changed(mapper, connection, target):
+        session = Session.object_session(target)
+        if session is not None:
+            session.info[flag] = True
+
+    def after_commit(session):
+        if session.info.pop(flag, False):
+            callback()
+
+    def after_soft_rollback(session, previous_transaction):
+        session.info.pop(flag, None)
+
+    for model in models:
+        for event_name in ('after_insert', 'after_update', 'after_delete'):
+            event.listen(model, event_name, mark_changed)
+    event.listen(Session, 'after_commit', after_commit)
+    event.listen(Session, 'after_soft_rollback', after_soft_rollback)
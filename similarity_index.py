@@ -0,0 +1,237 @@
+import os
+import time
+import logging
+import threading
+from flask import current_app
+from classification_cache import normalize_description
+from models import Ticket
+
+logger = logging.getLogger(__name__)
+
+# Tickets still moving through classification, approval or work
+OPEN_STATUSES = ['Classifying', 'Pending Approval', 'Approved', 'Assigned', 'In Progress']
+
+SIMILARITY_THRESHOLD = float(os.getenv('SIMILARITY_THRESHOLD', '0.6'))
+SIMILARITY_FEATURES = int(os.getenv('SIMILARITY_FEATURES', '4096'))
+SIMILARITY_INDEX_TTL = int(os.getenv('SIMILARITY_INDEX_TTL', '300'))
+SIMILARITY_MAX_RESULTS = int(os.getenv('SIMILARITY_MAX_RESULTS', '5'))
+
+_index = None
+_index_built_at = 0.0
+_index_lock = threading.Lock()
+# Changes made while a background rebuild runs, replayed onto the new index before it is swapped in
+_rebuild_journal = None
+
+
+class SimilarityIndex:
+    """Dense matrix of L2-normalised hashed word uni/bi-gram vectors, one row per open ticket.
+
+    Rows are added and removed in place (removal moves the last row into the
+    hole), so a query is a single matrix-vector product over the open tickets.
+    Memory is 4 * n_features bytes per ticket.
+    """
+
+    def __init__(self, n_features=SIMILARITY_FEATURES):
+        import numpy as np
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features,
+            preprocessor=normalize_description,
+            ngram_range=(1, 2),
+            alternate_sign=False,
+            norm='l2',
+            dtype=np.float32
+        )
+        self.matrix = np.zeros((64, n_features), dtype=np.float32)
+        self.ticket_ids = []
+        self._rows = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.ticket_ids)
+
+    def _vectorize(self, descriptions):
+        return self.vectorizer.transform(descriptions).toarray()
+
+    def _ensure_capacity(self, size):
+        import numpy as np
+
+        if size <= self.matrix.shape[0]:
+            return
+        capacity = self.matrix.shape[0]
+        while capacity < size:
+            capacity *= 2
+        grown = np.zeros((capacity, self.matrix.shape[1]), dtype=np.float32)
+        grown[:len(self.ticket_ids)] = self.matrix[:len(self.ticket_ids)]
+        self.matrix = grown
+
+    def add_many(self, tickets):
+        """Insert or replace rows for (ticket_id, description) pairs"""
+        tickets = list(tickets)
+        if not tickets:
+            return
+        vectors = self._vectorize([description for _, description in tickets])
+        with self._lock:
+            self._ensure_capacity(len(self.ticket_ids) + len(tickets))
+            for (ticket_id, _), vector in zip(tickets, vectors):
+                row = self._rows.get(ticket_id)
+                if row is None:
+                    row = len(self.ticket_ids)
+                    self.ticket_ids.append(ticket_id)
+                    self._rows[ticket_id] = row
+                self.matrix[row] = vector
+
+    def add(self, ticket_id, description):
+        self.add_many([(ticket_id, description)])
+
+    def remove(self, ticket_id):
+        with self._lock:
+            row = self._rows.pop(ticket_id, None)
+            if row is None:
+                return False
+            last = len(self.ticket_ids) - 1
+            if row != last:
+                moved_id = self.ticket_ids[last]
+                self.matrix[row] = self.matrix[last]
+                self.ticket_ids[row] = moved_id
+                self._rows[moved_id] = row
+            self.matrix[last] = 0
+            self.ticket_ids.pop()
+            return True
+
+    def query(self, description, limit=SIMILARITY_MAX_RESULTS, threshold=SIMILARITY_THRESHOLD, exclude_ids=()):
+        """Most similar open tickets as [(ticket_id, cosine similarity)], best first"""
+        import numpy as np
+
+        vector = self._vectorize([description])[0]
+        if not vector.any():
+            return []
+        with self._lock:
+            size = len(self.ticket_ids)
+            if not size:
+                return []
+            scores = self.matrix[:size] @ vector
+            candidates = np.flatnonzero(scores >= threshold)
+            ranked = candidates[np.argsort(-scores[candidates], kind='stable')]
+            results = []
+            for row in ranked:
+                ticket_id = self.ticket_ids[row]
+                if ticket_id in exclude_ids:
+                    continue
+                results.append((ticket_id, float(scores[row])))
+                if len(results) >= limit:
+                    break
+            return results
+
+    def clusters(self, threshold=SIMILARITY_THRESHOLD, block_size=1024):
+        """Groups of ticket ids connected by pairwise similarity >= threshold, largest first"""
+        import numpy as np
+
+        with self._lock:
+            size = len(self.ticket_ids)
+            parent = list(range(size))
+
+            def find(i):
+                while parent[i] != i:
+                    parent[i] = parent[parent[i]]
+                    i = parent[i]
+                return i
+
+            # Pairwise similarities in row blocks so memory stays at block_size * size
+            matrix = self.matrix[:size]
+            for start in range(0, size, block_size):
+                block = matrix[start:start + block_size] @ matrix.T
+                rows, cols = np.nonzero(block >= threshold)
+                for row, col in zip(rows + start, cols):
+                    if col > row:
+                        root_a, root_b = find(row), find(col)
+                        if root_a != root_b:
+                            parent[root_b] = root_a
+
+            groups = {}
+            for row in range(size):
+                groups.setdefault(find(row), []).append(self.ticket_ids[row])
+
+        clusters = [sorted(ids) for ids in groups.values() if len(ids) > 1]
+        clusters.sort(key=lambda ids: (-len(ids), ids[0]))
+        return clusters
+
+
+def _build_index():
+    index = SimilarityIndex()
+    rows = Ticket.query.with_entities(Ticket.id, Ticket.description).filter(Ticket.status.in_(OPEN_STATUSES)).all()
+    index.add_many((ticket_id, description) for ticket_id, description in rows)
+    logger.info(f"Built similarity index over {len(index)} open tickets")
+    return index
+
+
+def _rebuild(app):
+    global _index, _index_built_at, _rebuild_journal
+
+    try:
+        with app.app_context():
+            index = _build_index()
+    except Exception:
+        logger.exception('Similarity index rebuild failed')
+        with _index_lock:
+            _index_built_at, _rebuild_journal = time.monotonic(), None
+        return
+    with _index_lock:
+        for ticket_id, description in _rebuild_journal:
+            if description is None:
+                index.remove(ticket_id)
+            else:
+                index.add(ticket_id, description)
+        _index, _index_built_at, _rebuild_journal = index, time.monotonic(), None
+
+
+def get_similarity_index():
+    """Process-wide index, rebuilt from the database every SIMILARITY_INDEX_TTL seconds.
+
+    Only the first build runs in the caller. Later rebuilds run in a
+    background thread while the current index keeps serving, and are
+    swapped in when done; they pick up tickets opened or closed by other
+    workers. Between rebuilds it is kept current by index_ticket/remove_ticket.
+    """
+    global _index, _index_built_at, _rebuild_journal
+
+    with _index_lock:
+        if _index is None:
+            _index = _build_index()
+            _index_built_at = time.monotonic()
+        elif _rebuild_journal is None and time.monotonic() - _index_built_at >= SIMILARITY_INDEX_TTL:
+            _rebuild_journal = []
+            threading.Thread(target=_rebuild, args=(current_app._get_current_object(),),
+                             name='similarity-index-rebuild', daemon=True).start()
+        return _index
+
+
+def _apply_change(ticket_id, description):
+    """Add (description set) or drop (None) one ticket, journalling it for a rebuild in progress"""
+    get_similarity_index()
+    with _index_lock:
+        if _rebuild_journal is not None:
+            _rebuild_journal.append((ticket_id, description))
+        if description is None:
+            _index.remove(ticket_id)
+        else:
+            _index.add(ticket_id, description)
+
+
+def find_similar_tickets(description, exclude_id=None, limit=SIMILARITY_MAX_RESULTS, threshold=SIMILARITY_THRESHOLD):
+    exclude_ids = {exclude_id} if exclude_id is not None else ()
+    return get_similarity_index().query(description, limit=limit, threshold=threshold, exclude_ids=exclude_ids)
+
+
+def index_ticket(ticket):
+    """Add, refresh or drop a committed ticket depending on whether it is still open"""
+    _apply_change(ticket.id, ticket.description if ticket.status in OPEN_STATUSES else None)
+
+
+def remove_ticket(ticket_id):
+    _apply_change(ticket_id, None)
+
+
+def similar_ticket_clusters(threshold=SIMILARITY_THRESHOLD):
+    return get_similarity_index().clusters(threshold=threshold)
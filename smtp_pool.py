@@ -0,0 +1,204 @@
+import os
+import time
+import smtplib
+import logging
+import threading
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+SMTP_POOL_SIZE = int(os.getenv('SMTP_POOL_SIZE', '2'))
+SMTP_IDLE_TIMEOUT = float(os.getenv('SMTP_IDLE_TIMEOUT', '120'))
+SMTP_KEEPALIVE_INTERVAL = float(os.getenv('SMTP_KEEPALIVE_INTERVAL', '30'))
+SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.getenv('SMTP_MAX_MESSAGES_PER_CONNECTION', '500'))
+
+# The relay rejected this message but the session is still usable (smtplib resets it)
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+class PooledConnection:
+    """An open Flask-Mail connection plus the bookkeeping the pool needs to reuse it"""
+
+    def __init__(self, mail_state):
+        self.connection = mail_state.connect()
+        started = time.perf_counter()
+        self.connection.__enter__()
+        self.handshake_seconds = time.perf_counter() - started
+        self.messages = 0
+        self.last_used = self.last_checked = time.monotonic()
+
+    @property
+    def idle_seconds(self):
+        return time.monotonic() - self.last_used
+
+    def is_alive(self):
+        host = self.connection.host
+        self.last_checked = time.monotonic()
+        if host is None:
+            return True
+        try:
+            return host.noop()[0] == 250
+        except Exception:
+            return False
+
+    def send(self, message):
+        self.connection.send(message)
+        self.messages += 1
+        self.last_used = self.last_checked = time.monotonic()
+
+    def close(self):
+        host = self.connection.host
+        if host is None:
+            return
+        try:
+            host.quit()
+        except Exception:
+            host.close()
+
+
+class SMTPConnectionPool:
+    """Long-lived SMTP sessions shared by the email workers.
+
+    Each connection pays the TCP/TLS handshake and login once and is then
+    reused for many messages. Connections idle for longer than
+    keepalive_interval are checked with NOOP before reuse, connections idle
+    past idle_timeout or over max_messages are closed, and a connection that
+    drops mid-batch is replaced and the message retried once.
+    """
+
+    def __init__(self, size=SMTP_POOL_SIZE, idle_timeout=SMTP_IDLE_TIMEOUT,
+                 keepalive_interval=SMTP_KEEPALIVE_INTERVAL, max_messages=SMTP_MAX_MESSAGES_PER_CONNECTION):
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+        self.max_messages = max_messages
+        self._idle = []
+        self._lock = threading.Lock()
+        self._counters = {
+            'connections_opened': 0,
+            'connections_closed': 0,
+            'reconnects': 0,
+            'messages_sent': 0,
+            'messages_failed': 0,
+            'handshake_seconds_total': 0.0,
+            'handshake_seconds_max': 0.0,
+        }
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._counters[key] += amount
+
+    def _open(self, mail_state):
+        connection = PooledConnection(mail_state)
+        with self._lock:
+            self._counters['connections_opened'] += 1
+            self._counters['handshake_seconds_total'] += connection.handshake_seconds
+            self._counters['handshake_seconds_max'] = max(self._counters['handshake_seconds_max'], connection.handshake_seconds)
+        return connection
+
+    def _discard(self, connection):
+        connection.close()
+        self._count('connections_closed')
+
+    def _reusable(self, connection):
+        if connection.idle_seconds > self.idle_timeout or connection.messages >= self.max_messages:
+            return False
+        return time.monotonic() - connection.last_checked < self.keepalive_interval or connection.is_alive()
+
+    def _acquire(self, mail_state):
+        while True:
+            with self._lock:
+                connection = self._idle.pop() if self._idle else None
+            if connection is None:
+                return self._open(mail_state)
+            if self._reusable(connection):
+                return connection
+            self._discard(connection)
+
+    def _release(self, connection):
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(connection)
+                return
+        self._discard(connection)
+
+    def send_batch(self, messages, mail_state=None):
+        """Deliver messages over one pooled connection; returns an exception or None per message"""
+        mail_state = mail_state or current_app.extensions['mail']
+        results = []
+        connection = None
+        unreachable = None
+        try:
+            for message in messages:
+                if unreachable is not None:
+                    results.append(unreachable)
+                    self._count('messages_failed')
+                    continue
+                error = None
+                for attempt in range(2):
+                    if connection is None:
+                        try:
+                            connection = self._acquire(mail_state)
+                        except Exception as e:
+                            # The relay is down or refused the login; fail the rest of the batch without retrying each message
+                            error = unreachable = e
+                            break
+                    try:
+                        connection.send(message)
+                        error = None
+                        break
+                    except MESSAGE_ERRORS as e:
+                        error = e
+                        break
+                    except OSError as e:
+                        # Covers the remaining SMTP errors: the session is gone, retry once on a fresh connection
+                        error = e
+                        self._discard(connection)
+                        connection = None
+                        if attempt == 0:
+                            logger.warning(f"SMTP connection lost, reconnecting: {e}")
+                            self._count('reconnects')
+                    except Exception as e:
+                        error = e
+                        break
+                results.append(error)
+                self._count('messages_failed' if error else 'messages_sent')
+        finally:
+            if connection is not None:
+                self._release(connection)
+        return results
+
+    def send(self, message, mail_state=None):
+        error = self.send_batch([message], mail_state)[0]
+        if error is not None:
+            raise error
+
+    def keepalive(self):
+        """NOOP connections idle past the keepalive interval so the relay does not drop them, and close stale ones"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            if self._reusable(connection):
+                self._release(connection)
+            else:
+                self._discard(connection)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            self._discard(connection)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            idle = len(self._idle)
+        opened = counters['connections_opened']
+        counters['idle_connections'] = idle
+        counters['messages_per_connection'] = round(counters['messages_sent'] / opened, 2) if opened else 0.0
+        counters['handshake_ms_avg'] = round(counters.pop('handshake_seconds_total') / opened * 1000, 2) if opened else 0.0
+        counters['handshake_ms_max'] = round(counters.pop('handshake_seconds_max') * 1000, 2)
+        return counters
+
+
+smtp_pool = SMTPConnectionPool()
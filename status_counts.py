@@ -0,0 +1,164 @@
+import os
+import time
+import random
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session
+from models import db, Ticket, ArchivedTicket, TicketStatusCount
+from ticket_status import TICKET_STATUS_CODES
+
+logger = logging.getLogger(__name__)
+
+# Counter rows per status; more shards means fewer concurrent transactions waiting on the same row
+STATUS_COUNT_SHARDS = int(os.getenv('STATUS_COUNT_SHARDS', '8'))
+# Seconds between background recounts in each worker; 0 disables them
+STATUS_COUNT_RECONCILE_INTERVAL = int(os.getenv('STATUS_COUNT_RECONCILE_INTERVAL', '300'))
+
+_counts = TicketStatusCount.__table__
+
+
+def adjust_status_counts(deltas, connection=None):
+    """Add {status: delta} to the counters in the caller's transaction.
+
+    Each call picks one random shard; statuses are updated in code order so
+    two transactions never lock the same rows in opposite orders. A missing
+    shard row falls back to shard 0, and a missing status is left for the
+    reconciler.
+    """
+    target = connection if connection is not None else db.session
+    shard = random.randrange(STATUS_COUNT_SHARDS)
+    now = datetime.utcnow()
+    for status in sorted(deltas, key=TICKET_STATUS_CODES.get):
+        delta = deltas[status]
+        if not delta:
+            continue
+        for candidate in dict.fromkeys((shard, 0)):
+            result = target.execute(
+                _counts.update()
+                .where(_counts.c.status_code == status, _counts.c.shard == candidate)
+                .values(ticket_count=_counts.c.ticket_count + delta, updated_at=now)
+            )
+            if result.rowcount:
+                break
+        else:
+            logger.debug(f"No status counter row for {status}; the reconciler will create it")
+
+
+def actual_status_counts(connection):
+    """{status: count} over tickets and archived tickets"""
+    counts = Counter()
+    for model in (Ticket, ArchivedTicket):
+        counts.update(dict(connection.execute(
+            db.select(model.status, func.count()).where(model.status.isnot(None)).group_by(model.status)
+        ).all()))
+    return counts
+
+
+def create_status_counts(connection):
+    """Insert missing counter rows; shard 0 of a new status starts from the tickets already there"""
+    existing = {(row.status_code, row.shard) for row in connection.execute(db.select(_counts.c.status_code, _counts.c.shard))}
+    actual = actual_status_counts(connection)
+    rows = [{
+        'status_code': status,
+        'shard': shard,
+        'ticket_count': actual.get(status, 0) if shard == 0 else 0,
+        'updated_at': datetime.utcnow(),
+    } for status in TICKET_STATUS_CODES for shard in range(STATUS_COUNT_SHARDS) if (status, shard) not in existing]
+    if rows:
+        connection.execute(_counts.insert(), rows)
+    return len(rows)
+
+
+def dashboard_counts():
+    """{status: count} for every status, from one query over the counter rows"""
+    counts = dict.fromkeys(TICKET_STATUS_CODES, 0)
+    counts.update(db.session.query(
+        TicketStatusCount.status, func.sum(TicketStatusCount.ticket_count)
+    ).group_by(TicketStatusCount.status).all())
+    return counts
+
+
+def reconcile_status_counts(fix=True):
+    """Compare the counters with the tickets tables; returns [(status, recorded, actual)] for the ones that drifted.
+
+    With fix=True missing rows are created and drifted statuses corrected in
+    shard 0, with the recount inside the UPDATE so changes committed since
+    the comparison are not overwritten.
+    """
+    recorded = dict(db.session.query(
+        TicketStatusCount.status, func.sum(TicketStatusCount.ticket_count)
+    ).group_by(TicketStatusCount.status).all())
+    actual = actual_status_counts(db.session)
+    drifted = [(status, recorded.get(status), actual.get(status, 0)) for status in TICKET_STATUS_CODES
+               if recorded.get(status) != actual.get(status, 0)]
+
+    if fix and drifted:
+        create_status_counts(db.session.connection())
+        tickets, archived, others = Ticket.__table__, ArchivedTicket.__table__, _counts.alias('counted')
+        for status, recorded_count, _ in drifted:
+            if recorded_count is None:
+                continue
+            difference = (
+                db.select(func.count()).select_from(tickets).where(tickets.c.status_code == status).scalar_subquery()
+                + db.select(func.count()).select_from(archived).where(archived.c.status_code == status).scalar_subquery()
+                - db.select(func.coalesce(func.sum(others.c.ticket_count), 0)).where(others.c.status_code == status).scalar_subquery()
+            )
+            db.session.execute(
+                _counts.update()
+                .where(_counts.c.status_code == status, _counts.c.shard == 0)
+                .values(ticket_count=_counts.c.ticket_count + difference, updated_at=datetime.utcnow())
+            )
+    if fix:
+        db.session.commit()
+    else:
+        db.session.rollback()
+    return drifted
+
+
+def start_status_count_reconciler(app, interval=STATUS_COUNT_RECONCILE_INTERVAL):
+    """Daemon thread that runs reconcile_status_counts every `interval` seconds; returns it, or None when disabled"""
+    if interval <= 0:
+        return None
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                with app.app_context():
+                    drifted = reconcile_status_counts(fix=True)
+                if drifted:
+                    logger.warning('Fixed drifted status counters: ' + ', '.join(
+                        f'{status} {recorded} -> {actual}' for status, recorded, actual in drifted))
+            except Exception:
+                logger.exception('Status count reconcile failed')
+
+    thread = threading.Thread(target=run, name='status-count-reconciler', daemon=True)
+    thread.start()
+    return thread
+
+
+def _count_status_changes(session, flush_context, instances):
+    """Turn the Ticket inserts, status changes and deletes of this flush into counter updates in the same transaction"""
+    deltas = Counter()
+    for ticket in session.new:
+        if isinstance(ticket, Ticket):
+            deltas[ticket.status or Ticket.__table__.c.status_code.default.arg] += 1
+    for ticket in session.dirty:
+        if isinstance(ticket, Ticket):
+            history = inspect(ticket).attrs.status.history
+            if history.added and history.deleted:
+                deltas[history.deleted[0]] -= 1
+                deltas[history.added[0]] += 1
+    for ticket in session.deleted:
+        if isinstance(ticket, Ticket):
+            history = inspect(ticket).attrs.status.history
+            deltas[(history.deleted or history.unchanged or [ticket.status])[0]] -= 1
+    deltas = {status: delta for status, delta in deltas.items() if status and delta}
+    if deltas:
+        adjust_status_counts(deltas, session.connection())
+
+
+event.listen(Session, 'before_flush', _count_status_changes)
@@ -0,0 +1,52 @@
+import queue
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundTaskQueue:
+    """In-process work queue drained by daemon threads, each task run inside an app context"""
+
+    def __init__(self, name, workers=2):
+        self.name = name
+        self.workers = workers
+        self.app = None
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+
+    def _ensure_started(self):
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            for i in range(len(self._threads), self.workers):
+                thread = threading.Thread(target=self._run, name=f"{self.name}-{i + 1}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, func, *args, **kwargs):
+        if self.app is None:
+            raise RuntimeError(f"Task queue '{self.name}' is not bound to an app")
+        self._ensure_started()
+        self._queue.put((func, args, kwargs))
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def join(self):
+        """Block until every submitted task has finished"""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            func, args, kwargs = self._queue.get()
+            try:
+                with self.app.app_context():
+                    func(*args, **kwargs)
+            except Exception:
+                logger.exception(f"Background task {getattr(func, '__name__', func)} failed")
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,97 @@
+import os
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, delete, literal
+from models import (db, Ticket, Approval, TicketHistory,
+                    ArchivedTicket, ArchivedApproval, ArchivedTicketHistory)
+from ticket_status import CLOSED_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# Closed tickets untouched for this long are moved to the archive tables
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '180'))
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '1000'))
+
+# (hot table, archive table, column holding the ticket id), parents first
+ARCHIVED_TABLES = (
+    (Ticket.__table__, ArchivedTicket.__table__, 'id'),
+    (Approval.__table__, ArchivedApproval.__table__, 'ticket_id'),
+    (TicketHistory.__table__, ArchivedTicketHistory.__table__, 'ticket_id'),
+)
+
+
+def _tickets_holding_max_ids():
+    """Tickets that own the highest ticket, approval or history id.
+
+    SQLite hands out max(id) + 1 for new rows, so moving the row with the
+    highest id away would let the next insert reuse an id that is already in
+    the archive. Those tickets wait until a newer row exists.
+    """
+    held = {db.session.scalar(db.select(func.max(Ticket.id)))}
+    for model in (Approval, TicketHistory):
+        newest = db.select(func.max(model.id)).scalar_subquery()
+        held.add(db.session.scalar(db.select(model.ticket_id).where(model.id == newest)))
+    held.discard(None)
+    return held
+
+
+def archivable_tickets(cutoff):
+    """Query for closed tickets last updated before cutoff"""
+    return Ticket.query.filter(
+        Ticket.status.in_(CLOSED_STATUSES),
+        Ticket.updated_at < cutoff,
+        Ticket.id.notin_(sorted(_tickets_holding_max_ids()))
+    )
+
+
+def archive_batch(cutoff, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move up to batch_size archivable tickets with their approvals and history in one transaction; returns how many moved.
+
+    Each table is copied with a single INSERT ... SELECT and emptied with a
+    single DELETE. On Postgres the picked tickets are locked FOR UPDATE SKIP
+    LOCKED, so a ticket being reopened is left for the next run.
+    """
+    ticket_ids = [row.id for row in archivable_tickets(cutoff).with_entities(Ticket.id)
+                  .order_by(Ticket.id).limit(batch_size).with_for_update(skip_locked=True)]
+    if not ticket_ids:
+        db.session.rollback()
+        return 0
+
+    archived_at = literal(datetime.utcnow(), db.DateTime)
+    for table, archive, ticket_column in ARCHIVED_TABLES:
+        columns = list(table.columns)
+        db.session.execute(insert(archive).from_select(
+            [archive.c[column.name] for column in columns] + [archive.c.archived_at],
+            db.select(*columns, archived_at).where(table.c[ticket_column].in_(ticket_ids))
+        ))
+    for table, _, ticket_column in reversed(ARCHIVED_TABLES):
+        db.session.execute(delete(table).where(table.c[ticket_column].in_(ticket_ids)))
+    db.session.commit()
+    return len(ticket_ids)
+
+
+def archive_closed_tickets(older_than_days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH_SIZE, dry_run=False):
+    """Archive every closed ticket older than older_than_days, batch by batch; returns how many (would have) moved"""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    if dry_run:
+        count = archivable_tickets(cutoff).count()
+        db.session.rollback()
+        return count
+
+    total = 0
+    while True:
+        moved = archive_batch(cutoff, batch_size)
+        if not moved:
+            return total
+        total += moved
+        logger.info(f"Archived {total} ticket(s) so far")
+
+
+def get_archived_ticket(ticket_id):
+    """(ticket, approvals, history) from the archive, or None when the ticket was never archived"""
+    ticket = db.session.get(ArchivedTicket, ticket_id)
+    if ticket is None:
+        return None
+    approvals = ArchivedApproval.query.filter_by(ticket_id=ticket_id).order_by(ArchivedApproval.approval_level).all()
+    history = ArchivedTicketHistory.query.filter_by(ticket_id=ticket_id).order_by(ArchivedTicketHistory.timestamp.desc()).all()
+    return ticket, approvals, history
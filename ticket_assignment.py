@@ -1,25 +1,139 @@
-from models import TeamMember, Ticket
+from datetime import datetime
+from sqlalchemy import func
+from models import db, TeamMember, TeamMemberWorkload, Ticket
+
+ACTIVE_STATUSES = ['Assigned', 'In Progress']
 
 def assign_ticket_to_team_member(ticket):
+    """Pick the least loaded available member of the ticket's category and count the ticket against them.
+    
+    The pick and the counter increment are a single UPDATE ... RETURNING, so two
+    workers can never read the same counts and choose the same member. On
+    Postgres the subquery locks the chosen workload row FOR UPDATE SKIP LOCKED:
+    an assignment racing for the least loaded member takes the next one instead
+    of waiting, and only assignments within one category contend. SQLite drops
+    the locking clause and serializes the statement behind its write lock.
+    
+    The caller sets ticket.assigned_to and commits, which releases the row.
+    """
     if not ticket.category_id:
         return None
     
-    team_members = TeamMember.query.filter_by(
-        category_id=ticket.category_id,
-        is_available=True
-    ).all()
+    # Blocking pass only when every candidate row is locked by a concurrent assignment
+    for skip_locked in (True, False):
+        # Walks ix_team_member_workloads_category_count in order and stops at the first
+        # available member: least loaded first, lowest id on ties
+        least_loaded = db.select(
+            TeamMemberWorkload.member_id
+        ).join(
+            TeamMember,
+            TeamMember.id == TeamMemberWorkload.member_id
+        ).where(
+            TeamMemberWorkload.category_id == ticket.category_id,
+            TeamMember.is_available == True
+        ).order_by(
+            TeamMemberWorkload.active_ticket_count,
+            TeamMemberWorkload.member_id
+        ).limit(1).with_for_update(of=TeamMemberWorkload, skip_locked=skip_locked).scalar_subquery()
+        
+        member_id = db.session.execute(
+            db.update(TeamMemberWorkload)
+            .where(TeamMemberWorkload.member_id == least_loaded)
+            .values(active_ticket_count=TeamMemberWorkload.active_ticket_count + 1, updated_at=datetime.utcnow())
+            .returning(TeamMemberWorkload.member_id)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        if member_id:
+            return db.session.get(TeamMember, member_id)
     
-    if not team_members:
-        return None
+    return None
+
+def count_active_tickets(member_id):
+    return Ticket.query.filter(Ticket.assigned_to == member_id, Ticket.status.in_(ACTIVE_STATUSES)).count()
+
+def adjust_workload(member_id, delta):
+    """Add delta to a member's active ticket counter in the caller's transaction"""
+    result = db.session.execute(
+        db.update(TeamMemberWorkload)
+        .where(TeamMemberWorkload.member_id == member_id)
+        .values(active_ticket_count=TeamMemberWorkload.active_ticket_count + delta, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        # No counter yet: start it from the tickets table, which already holds the caller's change
+        member = db.session.get(TeamMember, member_id)
+        if member:
+            db.session.add(TeamMemberWorkload(
+                member_id=member_id,
+                category_id=member.category_id,
+                active_ticket_count=count_active_tickets(member_id)
+            ))
+
+def track_workload_change(ticket, old_status, old_assignee_id):
+    """Move the workload counters after ticket's status or assignee changed from (old_status, old_assignee_id)"""
+    was_counted = old_assignee_id if old_status in ACTIVE_STATUSES else None
+    now_counted = ticket.assigned_to if ticket.status in ACTIVE_STATUSES else None
+    if was_counted == now_counted:
+        return
+    if was_counted:
+        adjust_workload(was_counted, -1)
+    if now_counted:
+        adjust_workload(now_counted, 1)
+
+def reconcile_workloads(fix=True):
+    """Compare every counter with the tickets table; returns [(member, recorded, actual)] for the ones that drifted.
     
-    member_ticket_counts = {}
-    for member in team_members:
-        active_tickets = Ticket.query.filter(
-            Ticket.assigned_to == member.id,
-            Ticket.status.in_(['Assigned', 'In Progress'])
-        ).count()
-        member_ticket_counts[member.id] = active_tickets
+    With fix=True drifted counters are recomputed in place and missing ones are created.
+    """
+    actual_counts = dict(db.session.query(
+        Ticket.assigned_to, func.count(Ticket.id)
+    ).filter(
+        Ticket.assigned_to.isnot(None),
+        Ticket.status.in_(ACTIVE_STATUSES)
+    ).group_by(Ticket.assigned_to).all())
+    workloads = {w.member_id: w for w in TeamMemberWorkload.query.all()}
     
-    least_loaded_member = min(team_members, key=lambda m: member_ticket_counts[m.id])
+    drifted = []
+    for member in TeamMember.query.order_by(TeamMember.id).all():
+        actual = actual_counts.get(member.id, 0)
+        workload = workloads.get(member.id)
+        if workload is None:
+            drifted.append((member, None, actual))
+            if fix:
+                db.session.add(TeamMemberWorkload(member_id=member.id, category_id=member.category_id, active_ticket_count=actual))
+        elif workload.active_ticket_count != actual or workload.category_id != member.category_id:
+            drifted.append((member, workload.active_ticket_count, actual))
+            if fix:
+                # Recount inside the UPDATE so assignments committed since the scan are not overwritten
+                recount = db.select(func.count(Ticket.id)).where(
+                    Ticket.assigned_to == member.id,
+                    Ticket.status.in_(ACTIVE_STATUSES)
+                ).scalar_subquery()
+                db.session.execute(
+                    db.update(TeamMemberWorkload)
+                    .where(TeamMemberWorkload.member_id == member.id)
+                    .values(active_ticket_count=recount, category_id=member.category_id, updated_at=datetime.utcnow())
+                    .execution_options(synchronize_session=False)
+                )
     
-    return least_loaded_member
+    if fix:
+        db.session.commit()
+    else:
+        db.session.rollback()
+    return drifted
+
+def ensure_workloads():
+    """Create counters for members that have none yet; returns how many were created"""
+    missing = TeamMember.query.outerjoin(
+        TeamMemberWorkload,
+        TeamMemberWorkload.member_id == TeamMember.id
+    ).filter(TeamMemberWorkload.member_id.is_(None)).all()
+    for member in missing:
+        db.session.add(TeamMemberWorkload(
+            member_id=member.id,
+            category_id=member.category_id,
+            active_ticket_count=count_active_tickets(member.id)
+        ))
+    if missing:
+        db.session.commit()
+    return len(missing)
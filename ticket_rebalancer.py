@@ -0,0 +1,181 @@
+import os
+import heapq
+import logging
+from datetime import datetime
+from collections import defaultdict
+from sqlalchemy import and_, or_, insert
+from sqlalchemy.orm import joinedload
+from models import db, Category, TeamMember, TeamMemberWorkload, Ticket, TicketHistory
+from ticket_assignment import ACTIVE_STATUSES, adjust_workload
+from status_counts import adjust_status_counts
+from email_service import send_bulk_assignment_email
+
+logger = logging.getLogger(__name__)
+
+# Most active (Assigned + In Progress) tickets a rebalance will give one member
+TEAM_MEMBER_CAPACITY = int(os.getenv('TEAM_MEMBER_CAPACITY', '10'))
+REBALANCE_ATTEMPTS = 3
+
+
+class RebalanceConflict(Exception):
+    """A ticket changed between planning and applying a rebalance"""
+
+
+def plan_rebalance(category_id, capacity=TEAM_MEMBER_CAPACITY):
+    """Work out a balanced assignment for one category without changing anything.
+    
+    Movable tickets are the category's unassigned 'Approved' backlog and its
+    'Assigned' tickets; 'In Progress' work stays where it is. Each available
+    member is filled up to an even share (capped at `capacity`) with a min-heap
+    over their current load, keeping tickets with their current assignee where
+    the share allows so only the surplus moves. Oldest tickets are placed first.
+    
+    Returns (moves, unplaced, loads): moves are (ticket, member) pairs,
+    unplaced are tickets that need a member but found no room, and loads
+    maps each available member id to its load after the moves.
+    """
+    members = {m.id: m for m in TeamMember.query.filter_by(category_id=category_id, is_available=True).all()}
+    counters = dict(db.session.query(
+        TeamMemberWorkload.member_id, TeamMemberWorkload.active_ticket_count
+    ).filter(TeamMemberWorkload.member_id.in_(list(members))).all())
+    tickets = Ticket.query.options(joinedload(Ticket.creator)).filter(
+        Ticket.category_id == category_id,
+        or_(Ticket.status == 'Assigned', and_(Ticket.status == 'Approved', Ticket.assigned_to.is_(None)))
+    ).order_by(Ticket.created_at, Ticket.id).all()
+    
+    held = defaultdict(list)
+    homeless = []
+    for ticket in tickets:
+        if ticket.assigned_to in members:
+            held[ticket.assigned_to].append(ticket)
+        else:
+            homeless.append(ticket)
+    # Load nothing here can move: In Progress work and tickets from other categories
+    fixed = {member_id: counters.get(member_id, 0) - len(held[member_id]) for member_id in members}
+    
+    # Water-fill the movable tickets; on equal load the member already holding more keeps them
+    share = dict.fromkeys(members, 0)
+    heap = [(fixed[member_id], -len(held[member_id]), member_id) for member_id in members]
+    heapq.heapify(heap)
+    for _ in range(len(tickets)):
+        if not heap or heap[0][0] >= capacity:
+            break
+        load, holding, member_id = heapq.heappop(heap)
+        share[member_id] += 1
+        heapq.heappush(heap, (load + 1, holding, member_id))
+    
+    surplus = []
+    for member_id, own in held.items():
+        surplus.extend(own[share[member_id]:])
+        share[member_id] = max(0, share[member_id] - len(own))
+    loads = {member_id: counters.get(member_id, 0) for member_id in members}
+    
+    # Tickets without a usable assignee go first, then the surplus of overloaded members
+    moves, unplaced = [], []
+    homeless_ids = {ticket.id for ticket in homeless}
+    openings = [(loads[member_id], member_id) for member_id in members if share[member_id]]
+    heapq.heapify(openings)
+    for ticket in homeless + sorted(surplus, key=lambda t: (t.created_at, t.id)):
+        if not openings:
+            if ticket.id in homeless_ids:
+                unplaced.append(ticket)
+            continue
+        load, member_id = heapq.heappop(openings)
+        moves.append((ticket, members[member_id]))
+        loads[member_id] = load + 1
+        if ticket.assigned_to in loads:
+            loads[ticket.assigned_to] -= 1
+        share[member_id] -= 1
+        if share[member_id]:
+            heapq.heappush(openings, (load + 1, member_id))
+    return moves, unplaced, loads
+
+
+def apply_rebalance(category, moves):
+    """Write a plan in the current transaction: bulk ticket updates, counters, history and one email per member.
+    
+    Raises RebalanceConflict if any ticket no longer matches the state it
+    was planned from; the caller rolls back and plans again.
+    """
+    now = datetime.utcnow()
+    groups = defaultdict(list)
+    for ticket, member in moves:
+        groups[(ticket.status, ticket.assigned_to, member.id)].append(ticket.id)
+    
+    deltas = defaultdict(int)
+    status_deltas = defaultdict(int)
+    for (old_status, old_member_id, new_member_id), ticket_ids in groups.items():
+        current_assignee = Ticket.assigned_to == old_member_id if old_member_id else Ticket.assigned_to.is_(None)
+        result = db.session.execute(
+            db.update(Ticket)
+            .where(Ticket.id.in_(ticket_ids), Ticket.status == old_status, current_assignee)
+            .values(assigned_to=new_member_id, status='Assigned', updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != len(ticket_ids):
+            raise RebalanceConflict(f'{len(ticket_ids) - result.rowcount} ticket(s) changed while rebalancing')
+        if old_member_id and old_status in ACTIVE_STATUSES:
+            deltas[old_member_id] -= len(ticket_ids)
+        deltas[new_member_id] += len(ticket_ids)
+        status_deltas[old_status] -= len(ticket_ids)
+        status_deltas['Assigned'] += len(ticket_ids)
+    
+    for member_id, delta in deltas.items():
+        if delta:
+            adjust_workload(member_id, delta)
+    adjust_status_counts(status_deltas)
+    
+    db.session.execute(insert(TicketHistory), [{
+        'ticket_id': ticket.id,
+        'action': 'Ticket Assigned' if ticket.assigned_to is None else 'Ticket Reassigned',
+        'details': f'Assigned to {member.name}' if ticket.assigned_to is None else f'Reassigned from {ticket.assignee.name} to {member.name} by rebalancing',
+        'timestamp': now,
+    } for ticket, member in moves])
+    
+    by_member = defaultdict(list)
+    for ticket, member in moves:
+        by_member[member.id].append((ticket, member))
+    for assigned in by_member.values():
+        member = assigned[0][1]
+        send_bulk_assignment_email(
+            team_member_name=member.name,
+            team_member_email=member.email,
+            category_name=category.name,
+            tickets=[{'ticket_id': t.id, 'description': t.description, 'creator_name': t.creator.name} for t, _ in assigned]
+        )
+
+
+def rebalance_category(category, capacity=TEAM_MEMBER_CAPACITY, dry_run=False):
+    """Plan and apply a rebalance for one category, re-planning if tickets change underneath; returns a summary dict"""
+    for attempt in range(1, REBALANCE_ATTEMPTS + 1):
+        moves, unplaced, loads = plan_rebalance(category.id, capacity)
+        summary = {
+            'category': category.name,
+            'assigned': sum(1 for ticket, _ in moves if ticket.assigned_to is None),
+            'reassigned': sum(1 for ticket, _ in moves if ticket.assigned_to is not None),
+            'unplaced': [ticket.id for ticket in unplaced],
+            'moves': [{'ticket_id': ticket.id, 'from': ticket.assignee.name if ticket.assignee else None, 'to': member.name}
+                      for ticket, member in moves],
+            'loads': {db.session.get(TeamMember, member_id).name: load for member_id, load in sorted(loads.items())},
+            'applied': False,
+        }
+        if dry_run or not moves:
+            return summary
+        try:
+            apply_rebalance(category, moves)
+            db.session.commit()
+        except RebalanceConflict as e:
+            db.session.rollback()
+            logger.warning(f"Rebalance of {category.name} attempt {attempt} conflicted: {e}")
+            continue
+        summary['applied'] = True
+        return summary
+    raise RebalanceConflict(f'Tickets in {category.name} kept changing; gave up after {REBALANCE_ATTEMPTS} attempts')
+
+
+def rebalance_tickets(category_ids=None, capacity=TEAM_MEMBER_CAPACITY, dry_run=False):
+    """Rebalance the given categories (all when None); returns one summary per category"""
+    query = Category.query.order_by(Category.id)
+    if category_ids:
+        query = query.filter(Category.id.in_(category_ids))
+    return [rebalance_category(category, capacity, dry_run) for category in query.all()]
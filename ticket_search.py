@@ -0,0 +1,269 @@
+import os
+import re
+import logging
+from collections import namedtuple
+from markupsafe import Markup, escape
+from sqlalchemy import inspect, or_
+from sqlalchemy.orm import selectinload
+from models import db, Ticket, TicketHistory
+from ticket_status import TICKET_STATUS_CODES
+
+logger = logging.getLogger(__name__)
+
+SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', '20'))
+# Only the newest this-many matches are ranked, so a term found in most tickets stays fast
+SEARCH_RANK_WINDOW = int(os.getenv('SEARCH_RANK_WINDOW', '10000'))
+
+SearchHit = namedtuple('SearchHit', ['ticket', 'snippet'])
+
+# One document per ticket: description, resolution and every history entry.
+# Triggers keep it in step with every write, including bulk SQL.
+SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS ticket_search USING fts5(description, resolution, history, tokenize='porter unicode61')",
+    """CREATE TRIGGER IF NOT EXISTS ticket_search_insert AFTER INSERT ON tickets BEGIN
+        INSERT INTO ticket_search (rowid, description, resolution, history)
+        VALUES (new.id, new.description, coalesce(new.resolution_comment, ''), '');
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS ticket_search_update AFTER UPDATE OF description, resolution_comment ON tickets BEGIN
+        UPDATE ticket_search SET description = new.description, resolution = coalesce(new.resolution_comment, '')
+        WHERE rowid = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS ticket_search_delete AFTER DELETE ON tickets BEGIN
+        DELETE FROM ticket_search WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS ticket_search_history AFTER INSERT ON ticket_history BEGIN
+        UPDATE ticket_search SET history = history || ' ' || coalesce(new.details, '') WHERE rowid = new.ticket_id;
+    END""",
+]
+
+SQLITE_SEARCH_FILL = """
+    INSERT INTO ticket_search (rowid, description, resolution, history)
+    SELECT t.id, t.description, coalesce(t.resolution_comment, ''),
+           coalesce((SELECT group_concat(h.details, ' ') FROM ticket_history h WHERE h.ticket_id = t.id), '')
+    FROM tickets t
+"""
+
+POSTGRES_SEARCH_DDL = [
+    "CREATE TABLE IF NOT EXISTS ticket_search (ticket_id INTEGER PRIMARY KEY, document TSVECTOR NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS ix_ticket_search_document ON ticket_search USING GIN (document)",
+    """CREATE OR REPLACE FUNCTION ticket_search_document(ticket_id INTEGER) RETURNS TSVECTOR AS $$
+        SELECT setweight(to_tsvector('english', coalesce(t.description, '')), 'A')
+            || setweight(to_tsvector('english', coalesce(t.resolution_comment, '')), 'B')
+            || setweight(to_tsvector('english', coalesce(
+                   (SELECT string_agg(h.details, ' ') FROM ticket_history h WHERE h.ticket_id = t.id), '')), 'C')
+        FROM tickets t WHERE t.id = $1
+    $$ LANGUAGE sql STABLE""",
+    """CREATE OR REPLACE FUNCTION ticket_search_refresh() RETURNS TRIGGER AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            DELETE FROM ticket_search WHERE ticket_id = OLD.id;
+        ELSE
+            INSERT INTO ticket_search (ticket_id, document) VALUES (NEW.id, ticket_search_document(NEW.id))
+            ON CONFLICT (ticket_id) DO UPDATE SET document = EXCLUDED.document;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION ticket_search_append_history() RETURNS TRIGGER AS $$
+    BEGIN
+        UPDATE ticket_search SET document = document || setweight(to_tsvector('english', coalesce(NEW.details, '')), 'C')
+        WHERE ticket_id = NEW.ticket_id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""",
+    "DROP TRIGGER IF EXISTS ticket_search_refresh ON tickets",
+    """CREATE TRIGGER ticket_search_refresh AFTER INSERT OR DELETE OR UPDATE OF description, resolution_comment ON tickets
+       FOR EACH ROW EXECUTE FUNCTION ticket_search_refresh()""",
+    "DROP TRIGGER IF EXISTS ticket_search_history ON ticket_history",
+    """CREATE TRIGGER ticket_search_history AFTER INSERT ON ticket_history
+       FOR EACH ROW EXECUTE FUNCTION ticket_search_append_history()""",
+]
+
+POSTGRES_SEARCH_FILL = "INSERT INTO ticket_search (ticket_id, document) SELECT id, ticket_search_document(id) FROM tickets"
+
+_backend = None
+
+
+def fts5_available(connection):
+    return bool(connection.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar())
+
+
+def create_search_index(connection):
+    """Create the full-text table and its triggers if missing, then (re)fill it from tickets and history.
+
+    Returns the backend in use: 'fts5', 'tsvector', or 'like' when the
+    database has no full-text support and search falls back to LIKE.
+    """
+    global _backend
+
+    dialect = connection.dialect.name
+    if dialect == 'sqlite' and fts5_available(connection):
+        statements, fill, backend = SQLITE_SEARCH_DDL, SQLITE_SEARCH_FILL, 'fts5'
+    elif dialect == 'postgresql':
+        statements, fill, backend = POSTGRES_SEARCH_DDL, POSTGRES_SEARCH_FILL, 'tsvector'
+    else:
+        logger.warning(f"No full-text index for {dialect}; ticket search will use LIKE")
+        return 'like'
+
+    for statement in statements:
+        connection.exec_driver_sql(statement)
+    connection.exec_driver_sql('DELETE FROM ticket_search')
+    connection.exec_driver_sql(fill)
+    _backend = None
+    return backend
+
+
+def search_backend():
+    """'fts5', 'tsvector' or 'like', depending on the database and whether the search migration has run"""
+    global _backend
+
+    if _backend is None:
+        dialect = db.engine.dialect.name
+        has_index = inspect(db.engine).has_table('ticket_search')
+        if has_index and dialect == 'sqlite':
+            _backend = 'fts5'
+        elif has_index and dialect == 'postgresql':
+            _backend = 'tsvector'
+        else:
+            _backend = 'like'
+    return _backend
+
+
+def _search_terms(query):
+    return re.findall(r'\w+', query or '')
+
+
+def _marked(text):
+    """Escape a snippet whose matches are wrapped in \\x02 ... \\x03 and turn those into <mark> tags"""
+    return Markup(str(escape(text)).replace('\x02', '<mark>').replace('\x03', '</mark>'))
+
+
+def _highlight(text, terms, length=200):
+    text = text[:length] + ('…' if len(text) > length else '')
+    pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+    return _marked(pattern.sub(lambda m: f'\x02{m.group(0)}\x03', text))
+
+
+def _ranked_then_older(sql, params, limit, offset):
+    """One page of the newest SEARCH_RANK_WINDOW matches by rank, followed by every older match newest first.
+
+    `sql` holds three queries: 'window' returns the lowest ticket id in the
+    window and how many matches it holds; 'ranked' and 'older' return
+    (ticket_id, snippet) rows on either side of that :floor.
+    """
+    window = db.session.execute(db.text(sql['window']), params).one()
+    if not window.matches:
+        return []
+    rows = []
+    if offset < window.matches:
+        rows = db.session.execute(db.text(sql['ranked']), dict(params, floor=window.floor, limit=limit, offset=offset)).all()
+    if len(rows) < limit and window.matches >= SEARCH_RANK_WINDOW:
+        rows += db.session.execute(db.text(sql['older']), dict(
+            params, floor=window.floor, limit=limit - len(rows), offset=max(0, offset - window.matches))).all()
+    return [(row.ticket_id, _marked(row.snippet)) for row in rows]
+
+
+def _fts5_page(terms, status, limit, offset):
+    # Every term quoted so user input is never read as FTS5 syntax; the last one matches as a prefix
+    match = ' '.join(f'"{term}"' for term in terms) + '*'
+    params = {'match': match, 'window': SEARCH_RANK_WINDOW}
+    status_filter = ''
+    if status:
+        status_filter = 'AND rowid IN (SELECT id FROM tickets WHERE status_code = :status)'
+        params['status'] = TICKET_STATUS_CODES[status]
+    page = """
+        SELECT rowid AS ticket_id, snippet(ticket_search, -1, char(2), char(3), '…', 24) AS snippet
+        FROM ticket_search
+        WHERE ticket_search MATCH :match {status_filter} AND {bound}
+        ORDER BY {order}
+        LIMIT :limit OFFSET :offset
+    """
+    sql = {
+        'window': f"""
+            SELECT min(rowid) AS floor, count(*) AS matches FROM (
+                SELECT rowid FROM ticket_search WHERE ticket_search MATCH :match {status_filter}
+                ORDER BY rowid DESC LIMIT :window
+            )
+        """,
+        'ranked': page.format(status_filter=status_filter, bound='rowid >= :floor', order='bm25(ticket_search, 3.0, 2.0, 1.0)'),
+        'older': page.format(status_filter=status_filter, bound='rowid < :floor', order='rowid DESC'),
+    }
+    return _ranked_then_older(sql, params, limit, offset)
+
+
+def _tsvector_page(query, status, limit, offset):
+    params = {'query': query, 'window': SEARCH_RANK_WINDOW}
+    status_filter = ''
+    if status:
+        status_filter = 'AND ticket_id IN (SELECT id FROM tickets WHERE status_code = :status)'
+        params['status'] = TICKET_STATUS_CODES[status]
+    # Rank and page inside the subquery; ts_headline only runs on the rows of the page
+    page = """
+        SELECT s.ticket_id,
+               ts_headline('english', t.description || ' ' || coalesce(t.resolution_comment, ''), s.q,
+                           'StartSel=' || chr(2) || ', StopSel=' || chr(3) || ', MaxWords=40, MinWords=15') AS snippet
+        FROM (
+            SELECT ticket_id, {rank} AS rank, q
+            FROM ticket_search, websearch_to_tsquery('english', :query) AS q
+            WHERE document @@ q {status_filter} AND {bound}
+            ORDER BY rank DESC
+            LIMIT :limit OFFSET :offset
+        ) s
+        JOIN tickets t ON t.id = s.ticket_id
+        ORDER BY s.rank DESC
+    """
+    sql = {
+        'window': f"""
+            SELECT min(ticket_id) AS floor, count(*) AS matches FROM (
+                SELECT ticket_id FROM ticket_search WHERE document @@ websearch_to_tsquery('english', :query) {status_filter}
+                ORDER BY ticket_id DESC LIMIT :window
+            ) newest
+        """,
+        'ranked': page.format(status_filter=status_filter, bound='ticket_id >= :floor', rank='ts_rank_cd(document, q)'),
+        'older': page.format(status_filter=status_filter, bound='ticket_id < :floor', rank='ticket_id'),
+    }
+    return _ranked_then_older(sql, params, limit, offset)
+
+
+def _like_page(terms, status, limit, offset):
+    tickets = Ticket.query
+    for term in terms:
+        pattern = f'%{term}%'
+        tickets = tickets.filter(or_(
+            Ticket.description.ilike(pattern),
+            Ticket.resolution_comment.ilike(pattern),
+            Ticket.history.any(TicketHistory.details.ilike(pattern))
+        ))
+    if status:
+        tickets = tickets.filter(Ticket.status == status)
+    rows = tickets.with_entities(Ticket.id, Ticket.description).order_by(Ticket.created_at.desc()).limit(limit).offset(offset)
+    return [(row.id, _highlight(row.description, terms)) for row in rows]
+
+
+def search_tickets(query, page=1, per_page=SEARCH_PAGE_SIZE, status=None):
+    """Ranked matches for `query` in ticket descriptions, resolutions and history; returns ([SearchHit], has_next).
+
+    Pages are fetched with LIMIT/OFFSET plus one extra row to tell whether a
+    next page exists, so no query ever counts every match. The full-text
+    backends rank only the newest SEARCH_RANK_WINDOW matches; older matches
+    follow them, newest first, so every match is still returned.
+    """
+    terms = _search_terms(query)
+    if not terms:
+        return [], False
+
+    limit, offset = per_page + 1, (max(page, 1) - 1) * per_page
+    backend = search_backend()
+    if backend == 'fts5':
+        rows = _fts5_page(terms, status, limit, offset)
+    elif backend == 'tsvector':
+        rows = _tsvector_page(query, status, limit, offset)
+    else:
+        rows = _like_page(terms, status, limit, offset)
+
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    tickets = {ticket.id: ticket for ticket in Ticket.query.options(
+        selectinload(Ticket.category), selectinload(Ticket.creator), selectinload(Ticket.assignee)
+    ).filter(Ticket.id.in_([ticket_id for ticket_id, _ in rows]))} if rows else {}
+    return [SearchHit(tickets[ticket_id], snippet) for ticket_id, snippet in rows if ticket_id in tickets], has_next
@@ -0,0 +1,81 @@
+from sqlalchemy import SmallInteger
+from sqlalchemy.types import TypeDecorator
+
+# Codes are what the database stores; never renumber one, only add new ones.
+# Ordered along the lifecycle so ORDER BY status follows it.
+TICKET_STATUS_CODES = {
+    'Classifying': 1,
+    'Pending Approval': 2,
+    'Approved': 3,
+    'Assigned': 4,
+    'In Progress': 5,
+    'Completed': 6,
+    'Rejected': 7,
+    'Cancelled': 8,
+}
+
+# Statuses a ticket can be archived in (see ticket_archive)
+CLOSED_STATUSES = ['Completed', 'Rejected', 'Cancelled']
+
+APPROVAL_STATUS_CODES = {
+    'Waiting': 1,
+    'Pending': 2,
+    'Approved': 3,
+    'Rejected': 4,
+    'Cancelled': 5,
+}
+
+# Where each status may go next; a status missing here is final
+TICKET_TRANSITIONS = {
+    'Classifying': ('Pending Approval', 'Cancelled'),
+    'Pending Approval': ('Approved', 'Rejected', 'Cancelled'),
+    'Approved': ('Assigned', 'In Progress', 'Completed', 'Cancelled'),
+    'Assigned': ('In Progress', 'Completed', 'Cancelled'),
+    'In Progress': ('Completed', 'Cancelled'),
+    'Completed': ('In Progress',),
+}
+
+APPROVAL_TRANSITIONS = {
+    'Waiting': ('Pending', 'Cancelled'),
+    'Pending': ('Approved', 'Rejected', 'Cancelled'),
+}
+
+
+class InvalidStatusTransition(ValueError):
+    pass
+
+
+def check_transition(transitions, old_status, new_status):
+    """Raise InvalidStatusTransition unless old_status may become new_status (None is a new row)"""
+    if old_status is None or old_status == new_status:
+        return
+    if new_status not in transitions.get(old_status, ()):
+        raise InvalidStatusTransition(f'Cannot change status from {old_status} to {new_status}')
+
+
+class StatusCode(TypeDecorator):
+    """A status name in Python and in templates, a SMALLINT code in the database"""
+    impl = SmallInteger
+    cache_ok = True
+
+    def __init__(self, codes):
+        super().__init__()
+        self.codes = tuple(codes.items())
+        self._code_by_name = dict(self.codes)
+        self._name_by_code = {code: name for name, code in self.codes}
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, int):
+            return value
+        try:
+            return self._code_by_name[value]
+        except KeyError:
+            raise ValueError(f'Unknown status {value!r}')
+
+    def process_literal_param(self, value, dialect):
+        return str(self.process_bind_param(value, dialect))
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return self._name_by_code.get(value, value)